@@ -0,0 +1,159 @@
+"""Shared HTTP access to the ERP endpoints used by the fetch_* functions."""
+
+import time
+
+from leavebot.config import settings
+from ..core import cassette, rate_limit
+from ..core.cache_utils import note_stale, recall_last_known, remember_last_known
+from ..core.circuit_breaker import CircuitOpenError, get_breaker
+from ..core.deadline import DeadlineExceeded, remaining, timeout_for
+from ..core.log_utils import get_logger
+from ..core.metrics import ERP_ERRORS, ERP_SECONDS
+from ..core.tracing import span
+
+logger = get_logger(__name__)
+
+# Statuses worth retrying: throttling and transient gateway/server errors.
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def erp_headers():
+    return {
+        "Authorization": f"Bearer {settings.ERP_BEARER_TOKEN}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
+
+def classify_erp_error(exc):
+    """Return (retryable, retry_after) for an exception raised by an ERP call."""
+    import requests
+
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True, None
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status in RETRYABLE_STATUS, rate_limit.parse_retry_after(exc.response.headers)
+    return False, None
+
+
+def _is_endpoint_failure(exc):
+    """True for errors that say the endpoint is unhealthy: transient ones, 5xx and undecodable bodies."""
+    import requests
+
+    if classify_erp_error(exc)[0]:
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500
+    # requests.JSONDecodeError is a ValueError.
+    return isinstance(exc, ValueError)
+
+
+def _send(method, url, endpoint, timeout):
+    import requests
+
+    breaker = get_breaker(endpoint)
+    with span("erp.http", **{"erp.endpoint": endpoint, "http.method": method}) as sp:
+        breaker.before_call()
+        # Every admitted call ends in record_success, record_failure or release;
+        # otherwise a half-open breaker would keep its probe slot forever.
+        resolved = False
+        try:
+            with rate_limit.concurrency_slot("erp", remaining()) as slot:
+                rate_limit.acquire("erp", timeout=remaining())
+                capped = timeout_for(timeout)
+                sp.set_attribute("http.timeout_s", round(capped, 3))
+                start = time.perf_counter()
+                try:
+                    response = requests.request(method, url, headers=erp_headers(), timeout=capped)
+                    sp.set_attribute("http.status_code", response.status_code)
+                    response.raise_for_status()
+                    data = response.json()
+                except Exception as e:
+                    ERP_ERRORS.inc(endpoint=endpoint)
+                    if capped < timeout and isinstance(e, requests.Timeout):
+                        # Cut short by the turn deadline, not a sign the endpoint is failing.
+                        raise DeadlineExceeded(f"ERP {endpoint} request hit the turn deadline") from e
+                    if _is_endpoint_failure(e):
+                        breaker.record_failure()
+                        resolved = True
+                    slot.throttled = getattr(getattr(e, "response", None), "status_code", None) in (429, 503)
+                    slot.retry_after = classify_erp_error(e)[1]
+                    raise
+                finally:
+                    slot.latency = time.perf_counter() - start
+                    ERP_SECONDS.observe(slot.latency, endpoint=endpoint)
+                breaker.record_success(slot.latency)
+                resolved = True
+                return data
+        finally:
+            if not resolved:
+                breaker.release()
+
+
+def erp_request(method, url, endpoint, timeout=None):
+    """
+    Call an ERP endpoint and return the decoded JSON body.
+
+    Requests pass through the shared "erp" limiters and transient failures
+    (connection errors, 429/502/503/504) are retried with jittered backoff.
+
+    Args:
+        method (str): "GET" or "POST".
+        url (str): Full URL including the query string.
+        endpoint (str): Short endpoint name used for tracing, e.g. "leave_types".
+        timeout (float|None): Request timeout in seconds (default ERP_TIMEOUT_S),
+            shortened to the time left when a turn deadline is in force.
+
+    Under a recording or replaying cassette (see core.cassette) the call is
+    recorded or answered from it.
+
+    Raises:
+        requests.RequestException: On connection errors or non-2xx responses.
+        rate_limit.QueueFullError: When too many ERP requests are already waiting.
+        CircuitOpenError: When the endpoint's circuit breaker is open.
+        DeadlineExceeded: When the turn deadline passed before the request could start.
+    """
+    if timeout is None:
+        timeout = settings.ERP_TIMEOUT_S
+
+    def on_retry(exc, attempt, delay):
+        logger.warning("ERP %s attempt %d failed (%s); retrying in %.2fs", endpoint, attempt, exc, delay)
+
+    return cassette.exchange(
+        "erp",
+        {"method": method, "url": url},
+        lambda: rate_limit.call_with_retries(
+            lambda: _send(method, url, endpoint, timeout),
+            classify_erp_error,
+            attempts=settings.ERP_MAX_RETRIES + 1,
+            on_retry=on_retry,
+        ),
+    )
+
+
+def fetch_with_fallback(source, key, fetch):
+    """
+    Run `fetch()` and remember its result as the last-known copy.
+
+    If the ERP is unavailable (open circuit, full queue, a request error or
+    the turn deadline passing) and a last-known copy exists, return that instead and note it as stale
+    for this thread; otherwise re-raise.
+
+    Returns:
+        tuple: (data, is_stale). Callers should not put stale data in their TTL cache.
+    """
+    import requests
+
+    try:
+        data = fetch()
+    except (CircuitOpenError, rate_limit.QueueFullError, DeadlineExceeded, requests.RequestException) as e:
+        saved = recall_last_known(source, key)
+        if saved is None:
+            raise
+        saved_at, data = saved
+        logger.warning("Serving last-known %s for %s: %s", source, key, e)
+        note_stale(source, saved_at)
+        return data, True
+    remember_last_known(source, key, data)
+    return data, False
@@ -1,23 +1,27 @@
-import requests
-from leavebot.config.settings import EMPLOYEE_DETAILS_API, ERP_BEARER_TOKEN  # type: ignore
+from leavebot.config import settings
 from ..core.cache_utils import EMPLOYEE_CACHE
+from ..core.metrics import record_cache_lookup
+from ..core.schema import Employee, project
+from ..core.tracing import span
+from .erp_client import erp_request, fetch_with_fallback
 
 def fetch_employee_details(emp_id):
     """
     Fetch employee profile/details for the given emp_id.
-    Returns: List of dicts (API format), or raises Exception on error.
+    Returns: List of Employee records (dict-style access on the API keys), or raises Exception on error.
     """
-    if emp_id in EMPLOYEE_CACHE:
-        return EMPLOYEE_CACHE[emp_id]
+    with span("erp.fetch_employee_details", emp_id=emp_id) as sp:
+        if emp_id in EMPLOYEE_CACHE:
+            sp.set_attribute("cache.hit", True)
+            record_cache_lookup("employee", True)
+            return EMPLOYEE_CACHE[emp_id]
+        sp.set_attribute("cache.hit", False)
+        record_cache_lookup("employee", False)
 
-    headers = {
-        "Authorization": f"Bearer {ERP_BEARER_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    url = f"{EMPLOYEE_DETAILS_API}?strEmp_ID_N={emp_id}"
-    response = requests.post(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    EMPLOYEE_CACHE[emp_id] = data
-    return data
+        url = f"{settings.EMPLOYEE_DETAILS_API}?strEmp_ID_N={emp_id}"
+        data, stale = fetch_with_fallback(
+            "employee", emp_id, lambda: project(Employee, erp_request("POST", url, "employee_details"))
+        )
+        if not stale:
+            EMPLOYEE_CACHE[emp_id] = data
+        return data
@@ -1,8 +1,56 @@
-import requests
-from leavebot.config.settings import LEAVE_SUMMARY_API, ERP_BEARER_TOKEN
+from datetime import date, datetime
+from leavebot.config import settings
 from ..core.cache_utils import LEAVE_BALANCE_CACHE
+from ..core.log_utils import get_logger
+from ..core.metrics import record_cache_lookup
+from ..core.schema import LeaveBalance, project
+from ..core.tracing import span
+from .erp_client import erp_request, fetch_with_fallback
 
-def fetch_leave_balance(emp_id, lpd_id, from_date, to_date):
+logger = get_logger(__name__)
+
+_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%d-%b-%Y", "%d/%m/%Y")
+
+
+def current_leave_year(today=None):
+    """
+    Return the (from_date, to_date) ISO strings of the leave year containing `today`.
+    """
+    today = today or date.today()
+    return f"{today.year}-01-01", f"{today.year}-12-31"
+
+
+def normalize_date(value):
+    """
+    Normalize a date, datetime or date string to 'YYYY-MM-DD'.
+    Unparseable strings are returned unchanged.
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:19], fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+def resolve_date_range(from_date=None, to_date=None):
+    """
+    Fill missing bounds from the current leave year and normalize both dates,
+    so equivalent ranges share one cache key.
+    """
+    default_from, default_to = current_leave_year()
+    return (
+        normalize_date(from_date) if from_date else default_from,
+        normalize_date(to_date) if to_date else default_to,
+    )
+
+
+def fetch_leave_balance(emp_id, lpd_id, from_date=None, to_date=None):
     """
     Fetch leave balance for a specific leave type (lpd_id) and date range.
     Caches results per (emp_id, lpd_id, from_date, to_date).
@@ -10,32 +58,64 @@ def fetch_leave_balance(emp_id, lpd_id, from_date, to_date):
     Args:
         emp_id (int): Employee ID.
         lpd_id (int): Leave policy detail ID (leave type ID).
-        from_date (str): Start date in 'YYYY-MM-DD' format.
-        to_date (str): End date in 'YYYY-MM-DD' format.
+        from_date (str|date): Start date; defaults to the start of the current leave year.
+        to_date (str|date): End date; defaults to the end of the current leave year.
 
     Returns:
-        dict or None: The first record of leave balance data from API, or None if empty.
+        LeaveBalance or None: The first leave balance record from the API, or None if empty.
     """
+    import requests
+
+    from_date, to_date = resolve_date_range(from_date, to_date)
     cache_key = (emp_id, lpd_id, from_date, to_date)
-    if cache_key in LEAVE_BALANCE_CACHE:
-        return LEAVE_BALANCE_CACHE[cache_key]
-
-    headers = {
-        "Authorization": f"Bearer {ERP_BEARER_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-
-    strsql = f"{emp_id},{lpd_id},'{from_date}','{to_date}',0,0,1,0"
-    url = f"{LEAVE_SUMMARY_API}?StrSql={strsql}"
-
-    try:
-        response = requests.post(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        result = data[0] if isinstance(data, list) and data else None
-        LEAVE_BALANCE_CACHE[cache_key] = result
-        return result
-    except requests.RequestException as e:
-        print(f"Failed to fetch leave balance for Emp_ID {emp_id}, Lpd_ID {lpd_id}: {e}")
-        return None
+    with span("erp.fetch_leave_balance", emp_id=emp_id, lpd_id=lpd_id) as sp:
+        if cache_key in LEAVE_BALANCE_CACHE:
+            sp.set_attribute("cache.hit", True)
+            record_cache_lookup("leave_balance", True)
+            return LEAVE_BALANCE_CACHE[cache_key]
+        sp.set_attribute("cache.hit", False)
+        record_cache_lookup("leave_balance", False)
+
+        strsql = f"{emp_id},{lpd_id},'{from_date}','{to_date}',0,0,1,0"
+        url = f"{settings.LEAVE_SUMMARY_API}?StrSql={strsql}"
+
+        try:
+            data, stale = fetch_with_fallback(
+                "leave_balance", cache_key, lambda: project(LeaveBalance, erp_request("POST", url, "leave_balance", timeout=10))
+            )
+            result = data[0] if isinstance(data, list) and data else None
+            if not stale:
+                LEAVE_BALANCE_CACHE[cache_key] = result
+            return result
+        except requests.RequestException as e:
+            logger.warning("Failed to fetch leave balance for Emp_ID %s, Lpd_ID %s: %s", emp_id, lpd_id, e)
+            return None
+
+
+def fetch_leave_balances(emp_id, leave_types, from_date=None, to_date=None, lpd_ids=None):
+    """
+    Fetch balances for a subset of the employee's leave types.
+
+    Args:
+        emp_id (int): Employee ID.
+        leave_types (list[dict]): Leave types as returned by fetch_leave_types.
+        from_date, to_date: Date range, see fetch_leave_balance.
+        lpd_ids (iterable|None): Lpd_ID_N values to fetch; None fetches every type.
+
+    Returns:
+        dict: {Lpd_ID_N: balance_data} in leave-type order, each record tagged
+        with its `Lvm_Code_V`. Types without a balance are omitted.
+    """
+    wanted = None if lpd_ids is None else set(lpd_ids)
+    balances = {}
+    for lt in leave_types:
+        lpd_id = lt["Lpd_ID_N"]
+        if wanted is not None and lpd_id not in wanted:
+            continue
+        bal = fetch_leave_balance(emp_id, lpd_id, from_date, to_date)
+        if isinstance(bal, list) and bal:
+            bal = bal[0]
+        if bal:
+            bal["Lvm_Code_V"] = lt.get("Lvm_Code_V", "")
+            balances[lpd_id] = bal
+    return balances
@@ -1,36 +1,49 @@
-import requests
-from leavebot.config.settings import LEAVE_HISTORY_API, ERP_BEARER_TOKEN
+from leavebot.config import settings
 from ..core.cache_utils import LEAVE_HISTORY_CACHE
+from ..core.metrics import record_cache_lookup
+from ..core.schema import LeaveRecord, project
+from ..core.tracing import span
+from .erp_client import erp_request, fetch_with_fallback
 
 # We assume `leave_types` (fetched via fetch_leave_types) is passed in to map Lvm_ID_N → code
 
+def leave_history_url(emp_filter):
+    """
+    Leave history request URL for the employees matched by `emp_filter`,
+    an `A.Emp_ID_N` predicate such as "A.Emp_ID_N=5469" or "A.Emp_ID_N IN (1,2)".
+    Applications with status 0 or 6 are left out, the rest ordered by reference number.
+    """
+    str_filter = f"{emp_filter} AND A.Ela_Status_N NOT IN (0,6) ORDER BY Ela_RefferNo_V"
+    return f"{settings.LEAVE_HISTORY_API}?StrFilter={str_filter}"
+
 def fetch_leave_history(emp_id, leave_types):
     """
     Fetch leave history/applications for the given employee.
-    Returns a list of leave application dicts, each enriched with `LeaveGrid_Lvm_Code_V`.
+    Returns a list of LeaveRecord, each enriched with `LeaveGrid_Lvm_Code_V`.
     """
     cache_key = emp_id
-    if cache_key in LEAVE_HISTORY_CACHE:
-        return LEAVE_HISTORY_CACHE[cache_key]
+    with span("erp.fetch_leave_history", emp_id=emp_id) as sp:
+        if cache_key in LEAVE_HISTORY_CACHE:
+            sp.set_attribute("cache.hit", True)
+            record_cache_lookup("leave_history", True)
+            return LEAVE_HISTORY_CACHE[cache_key]
+        sp.set_attribute("cache.hit", False)
+        record_cache_lookup("leave_history", False)
+
+        url = leave_history_url(f"A.Emp_ID_N={emp_id}")
+        data, stale = fetch_with_fallback(
+            "leave_history", cache_key, lambda: project(LeaveRecord, erp_request("POST", url, "leave_history"))
+        )
 
-    headers = {
-        "Authorization": f"Bearer {ERP_BEARER_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    str_filter = f"A.Emp_ID_N={emp_id} AND A.Ela_Status_N NOT IN (0,6) ORDER BY Ela_RefferNo_V"
-    url = f"{LEAVE_HISTORY_API}?StrFilter={str_filter}"
-    response = requests.post(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
+        # Build mapping from Lvm_ID_N → Lvm_Code_V
+        code_by_id = {lt["Lvm_ID_N"]: lt.get("Lvm_Code_V") for lt in leave_types}
 
-    # Build mapping from Lvm_ID_N → Lvm_Code_V
-    code_by_id = {lt["Lvm_ID_N"]: lt.get("Lvm_Code_V") for lt in leave_types}
-    
-    # Enrich each record with its leave code
-    for rec in data:
-        lvm_id = rec.get("LeaveGrid_Lvm_ID_N")
-        rec["LeaveGrid_Lvm_Code_V"] = code_by_id.get(lvm_id)
+        # Enrich each record with its leave code
+        for rec in data:
+            lvm_id = rec.get("LeaveGrid_Lvm_ID_N")
+            rec["LeaveGrid_Lvm_Code_V"] = code_by_id.get(lvm_id)
 
-    LEAVE_HISTORY_CACHE[cache_key] = data
-    return data
+        sp.set_attribute("records", len(data))
+        if not stale:
+            LEAVE_HISTORY_CACHE[cache_key] = data
+        return data
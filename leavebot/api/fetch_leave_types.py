@@ -1,6 +1,11 @@
-import requests
-from leavebot.config.settings import LEAVE_TYPE_API, ERP_BEARER_TOKEN
+from leavebot.config import settings
 from ..core.cache_utils import LEAVE_TYPES_CACHE
+from ..core.log_utils import get_logger
+from ..core.metrics import record_cache_lookup
+from ..core.tracing import span
+from .erp_client import erp_request, fetch_with_fallback
+
+logger = get_logger(__name__)
 
 def fetch_leave_types(emp_id, cgm_id=1):
     """
@@ -15,26 +20,27 @@ def fetch_leave_types(emp_id, cgm_id=1):
     Returns:
         list[dict]: List of leave type dictionaries.
     """
+    import requests
+
     cache_key = (emp_id, cgm_id)
-    if cache_key in LEAVE_TYPES_CACHE:
-        return LEAVE_TYPES_CACHE[cache_key]
-
-    headers = {
-        "Authorization": f"Bearer {ERP_BEARER_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    url = f"{LEAVE_TYPE_API}?Emp_ID_N={emp_id}&Cgm_ID_N={cgm_id}"
-
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        # Cache the data for subsequent calls
-        LEAVE_TYPES_CACHE[cache_key] = data
-        return data
-    except requests.RequestException as e:
-        # Log error appropriately; here we just print
-        print(f"Failed to fetch leave types for Emp_ID {emp_id}: {e}")
-        # Optionally return empty list or raise exception
-        return []
+    with span("erp.fetch_leave_types", emp_id=emp_id) as sp:
+        if cache_key in LEAVE_TYPES_CACHE:
+            sp.set_attribute("cache.hit", True)
+            record_cache_lookup("leave_types", True)
+            return LEAVE_TYPES_CACHE[cache_key]
+        sp.set_attribute("cache.hit", False)
+        record_cache_lookup("leave_types", False)
+
+        url = f"{settings.LEAVE_TYPE_API}?Emp_ID_N={emp_id}&Cgm_ID_N={cgm_id}"
+
+        try:
+            data, stale = fetch_with_fallback(
+                "leave_types", cache_key, lambda: erp_request("GET", url, "leave_types", timeout=10)
+            )
+            # Cache the data for subsequent calls
+            if not stale:
+                LEAVE_TYPES_CACHE[cache_key] = data
+            return data
+        except requests.RequestException as e:
+            logger.warning("Failed to fetch leave types for Emp_ID %s: %s", emp_id, e)
+            return []
@@ -1,24 +1,22 @@
-import requests
-from leavebot.config.settings import EMPLOYEE_DETAILS_API, ERP_BEARER_TOKEN
+from leavebot.config import settings
+from ..core.schema import Employee, project
+from ..core.tracing import span
+from .erp_client import erp_request, fetch_with_fallback
 
 def fetch_manager_details(manager_emp_id):
     """
     Fetches manager details using the employee details API.
-    Returns the first record as dict, or None if not found.
+    Returns the first record as an Employee, or None if not found.
     """
-    headers = {
-        "Authorization": f"Bearer {ERP_BEARER_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-    url = f"{EMPLOYEE_DETAILS_API}?strEmp_ID_N={manager_emp_id}"
-    response = requests.post(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    # Return the first record, or None if no data
-    if isinstance(data, list) and len(data) > 0:
-        return data[0]
-    return None
+    with span("erp.fetch_manager_details", emp_id=manager_emp_id):
+        url = f"{settings.EMPLOYEE_DETAILS_API}?strEmp_ID_N={manager_emp_id}"
+        data, _ = fetch_with_fallback(
+            "employee", manager_emp_id, lambda: project(Employee, erp_request("POST", url, "employee_details"))
+        )
+        # Return the first record, or None if no data
+        if isinstance(data, list) and len(data) > 0:
+            return data[0]
+        return None
 
 def get_manager_contact(manager_emp_id):
     """
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from leavebot.config import settings
+from ..core import deadline
+from ..core.cache_utils import EMPLOYEE_CACHE, LEAVE_HISTORY_CACHE, TEAM_CACHE, TEAM_HISTORY_CACHE
+from ..core.leave_utils import resolve_lpd_id
+from ..core.log_utils import get_logger
+from ..core.metrics import record_cache_lookup
+from ..core.schema import Employee, LeaveRecord, project
+from ..core.tracing import span
+from .erp_client import erp_request, fetch_with_fallback
+from .fetch_leave_balance import fetch_leave_balance
+from .fetch_leave_history import leave_history_url
+from .fetch_leave_types import fetch_leave_types
+
+logger = get_logger(__name__)
+
+
+def _emp_key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def fetch_direct_reports(manager_id):
+    """
+    Fetch the employees reporting to `manager_id`.
+    Returns a list of Employee records; each is also stored in EMPLOYEE_CACHE
+    so later per-employee lookups need no request.
+    """
+    with span("erp.fetch_direct_reports", emp_id=manager_id) as sp:
+        if manager_id in TEAM_CACHE:
+            sp.set_attribute("cache.hit", True)
+            record_cache_lookup("team", True)
+            return TEAM_CACHE[manager_id]
+        sp.set_attribute("cache.hit", False)
+        record_cache_lookup("team", False)
+
+        url = settings.DIRECT_REPORTS_API.format(manager_id=manager_id)
+        data, stale = fetch_with_fallback(
+            "team", manager_id, lambda: project(Employee, erp_request("POST", url, "direct_reports"))
+        )
+        reports = [rec for rec in data or [] if _emp_key(rec.get("Emp_ID_N")) != _emp_key(manager_id)]
+        for rec in reports:
+            emp_id = _emp_key(rec.get("Emp_ID_N"))
+            if emp_id not in EMPLOYEE_CACHE:
+                EMPLOYEE_CACHE[emp_id] = [rec]
+        sp.set_attribute("reports", len(reports))
+        if not stale:
+            TEAM_CACHE[manager_id] = reports
+        return reports
+
+
+def _batches(items, size):
+    for i in range(0, len(items), max(1, size)):
+        yield items[i:i + size]
+
+
+def fetch_team_leave_history(emp_ids, leave_types, batch_size=None, max_workers=None):
+    """
+    Fetch leave histories for many employees at once.
+
+    Histories already in LEAVE_HISTORY_CACHE (loaded by the employee's own
+    session) or TEAM_HISTORY_CACHE are reused. The rest are requested with one
+    `A.Emp_ID_N IN (...)` filter per `batch_size` employees, with up to
+    `max_workers` batches in flight. Their leave codes are mapped with
+    `leave_types` (the manager's), so they are cached in TEAM_HISTORY_CACHE
+    and never seen by the employees' own sessions.
+
+    Returns:
+        dict: {emp_id: [LeaveRecord]} for every id in `emp_ids`.
+    """
+    batch_size = batch_size or settings.TEAM_BULK_SIZE
+    max_workers = max_workers or settings.TEAM_MAX_CONCURRENCY
+    code_by_id = {lt["Lvm_ID_N"]: lt.get("Lvm_Code_V") for lt in leave_types}
+
+    histories, missing = {}, []
+    for emp_id in map(_emp_key, emp_ids):
+        cached = LEAVE_HISTORY_CACHE.get(emp_id)
+        if cached is None:
+            cached = TEAM_HISTORY_CACHE.get(emp_id)
+        if cached is not None:
+            record_cache_lookup("leave_history", True)
+            histories[emp_id] = cached
+        else:
+            record_cache_lookup("leave_history", False)
+            missing.append(emp_id)
+
+    turn_deadline = deadline.current()
+
+    def fetch_batch(batch):
+        ids = ",".join(str(emp_id) for emp_id in batch)
+        url = leave_history_url(f"A.Emp_ID_N IN ({ids})")
+        with deadline.deadline_scope(at=turn_deadline):
+            return project(LeaveRecord, erp_request("POST", url, "leave_history"))
+
+    batches = list(_batches(missing, batch_size))
+    with span("erp.fetch_team_leave_history", employees=len(histories) + len(missing), batches=len(batches)):
+        if not batches:
+            return histories
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            for batch, data in zip(batches, pool.map(fetch_batch, batches)):
+                grouped = {emp_id: [] for emp_id in batch}
+                for rec in data or []:
+                    rec["LeaveGrid_Lvm_Code_V"] = code_by_id.get(rec.get("LeaveGrid_Lvm_ID_N"))
+                    emp_id = _emp_key(rec.get("Emp_ID_N"))
+                    if emp_id is None and len(batch) == 1:
+                        emp_id = batch[0]
+                    if emp_id in grouped:
+                        grouped[emp_id].append(rec)
+                    else:
+                        logger.warning("Dropping leave record for unexpected employee %r", emp_id)
+                for emp_id, records in grouped.items():
+                    TEAM_HISTORY_CACHE[emp_id] = records
+                    histories[emp_id] = records
+        return histories
+
+
+def fetch_team_balances(emp_ids, leave_code, from_date=None, to_date=None, cgm_id=1, max_workers=None):
+    """
+    Fetch each employee's balance for `leave_code` (code or description),
+    up to `max_workers` employees at a time. Leave types and balances go
+    through the shared per-employee caches.
+
+    Unlike histories these are not bulk requests: the balance endpoint is a
+    stored procedure taking one employee and one leave type, and Lpd_ID_N
+    depends on each employee's leave policy. A cold call therefore costs two
+    requests per employee, spread over `max_workers`.
+
+    Returns:
+        dict: {emp_id: LeaveBalance or None}.
+    """
+    max_workers = max_workers or settings.TEAM_MAX_CONCURRENCY
+    emp_ids = [_emp_key(emp_id) for emp_id in emp_ids]
+
+    turn_deadline = deadline.current()
+
+    def fetch_one(emp_id):
+        with deadline.deadline_scope(at=turn_deadline):
+            lpd_id = resolve_lpd_id(fetch_leave_types(emp_id, cgm_id), leave_code)
+            return None if lpd_id is None else fetch_leave_balance(emp_id, lpd_id, from_date, to_date)
+
+    with span("erp.fetch_team_balances", employees=len(emp_ids), leave_code=leave_code):
+        if not emp_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(emp_ids))) as pool:
+            return dict(zip(emp_ids, pool.map(fetch_one, emp_ids)))
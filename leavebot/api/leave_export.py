@@ -0,0 +1,321 @@
+# leave_export.py
+"""
+Month-end leave report for many employees, streamed to CSV or Parquet.
+
+Employee IDs are read lazily and fetched through the usual per-employee
+fetch layer by a small thread pool, with at most a few employees in flight.
+Each employee becomes one row per leave type: balance, approved days taken
+(leaves_by_type) and outstanding applications (unapproved_leaves), plus the
+overview fields (name, anniversary, air ticket eligibility). Rows are
+written in chunks (appended to a CSV file, or one Parquet part file per
+chunk), so memory does not grow with headcount.
+
+After every chunk a checkpoint next to the output records how many
+employees are complete and how much of the file is theirs. A rerun with the
+same arguments truncates anything written after it and carries on from
+the next employee.
+
+    python -m leavebot.api.leave_export --emp-ids-file ids.txt --output leave_report.csv [--format parquet]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from leavebot.config import settings
+from ..core.leave_utils import (
+    build_leave_mappings,
+    get_air_ticket_eligibility,
+    get_employee_anniversary,
+    get_employee_full_name,
+    leaves_by_type,
+    unapproved_leaves,
+)
+from ..core.log_utils import configure_logging, get_logger, log_event
+from ..core.schema import parse_number, value_of
+from ..core.tracing import span
+from .fetch_employee import fetch_employee_details
+from .fetch_leave_balance import fetch_leave_balances
+from .fetch_leave_history import fetch_leave_history
+from .fetch_leave_types import fetch_leave_types
+
+logger = get_logger(__name__)
+
+EXPORT_COLUMNS = [
+    "emp_id", "name", "anniversary", "air_ticket", "leave_code", "leave",
+    "balance", "days_taken", "pending_applications", "pending_days",
+]
+FORMATS = ("csv", "parquet")
+
+
+def iter_emp_ids(emp_ids=(), path=None):
+    """Yield employee IDs from `emp_ids`, then one per line of `path` (blank lines and #comments skipped)."""
+    yield from emp_ids
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    yield int(line) if line.isdigit() else line
+
+
+def fetch_employee_data(emp_id, from_date=None, to_date=None, cgm_id=1):
+    """(employee record, leave types, {Lpd_ID_N: balance}, leave history) of one employee."""
+    employee = fetch_employee_details(emp_id)
+    leave_types = fetch_leave_types(emp_id, cgm_id)
+    history = fetch_leave_history(emp_id, leave_types)
+    balances = fetch_leave_balances(emp_id, leave_types, from_date, to_date)
+    return (employee[0] if employee else {}), leave_types, balances, history
+
+
+def summary_rows(emp_id, employee, leave_types, balances, history):
+    """Yield one export row per leave type of the employee (one blank-leave row if they have none)."""
+    first_balance = next(iter(balances.values()), None)
+    base = {
+        "emp_id": emp_id,
+        "name": get_employee_full_name(employee),
+        "anniversary": get_employee_anniversary(employee),
+        "air_ticket": get_air_ticket_eligibility(first_balance) if first_balance and "Airticket" in first_balance else "",
+    }
+    code_to_desc, _, _ = build_leave_mappings(leave_types)
+    taken = leaves_by_type(history, leave_types)
+    pending = {}
+    for rec in unapproved_leaves(history):
+        code = rec.get("LeaveGrid_Lvm_Code_V")
+        days = value_of(rec, "LeaveGrid_Ela_Tot", parse_number)
+        count, total = pending.get(code, (0, 0.0))
+        pending[code] = (count + 1, total + (days if isinstance(days, float) else 0.0))
+
+    if not leave_types:
+        yield {**base, **dict.fromkeys(EXPORT_COLUMNS[4:])}
+        return
+    for lt in leave_types:
+        code = lt.get("Lvm_Code_V")
+        desc = code_to_desc.get(code, lt.get("Lvm_Description_V") or code)
+        bal = balances.get(lt["Lpd_ID_N"])
+        balance = value_of(bal, "Balance", parse_number) if bal else None
+        count, days = pending.get(code, (0, 0.0))
+        yield {
+            **base,
+            "leave_code": code,
+            "leave": desc,
+            "balance": balance if isinstance(balance, float) else None,
+            "days_taken": taken.get(desc, 0.0),
+            "pending_applications": count,
+            "pending_days": days,
+        }
+
+
+def bounded_map(fn, items, workers):
+    """
+    Like `pool.map(fn, items)` but pulls `items` lazily, keeping at most
+    2 * `workers` calls in flight. Yields (item, result, error) in input order.
+    """
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        window = deque()
+        for item in items:
+            window.append((item, pool.submit(call, item)))
+            if len(window) >= 2 * max(1, workers):
+                done_item, future = window.popleft()
+                yield (done_item, *future.result())
+        while window:
+            done_item, future = window.popleft()
+            yield (done_item, *future.result())
+
+
+class CsvSink:
+    """Append rows to a CSV file; the position is the file size in bytes."""
+
+    def __init__(self, path, position=0):
+        exists = position > 0 and os.path.exists(path)
+        self._file = open(path, "r+" if exists else "w", newline="", encoding="utf-8")
+        self._file.truncate(position if exists else 0)
+        self._file.seek(0, os.SEEK_END)
+        self._writer = csv.DictWriter(self._file, fieldnames=EXPORT_COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """
+    Write each chunk as one part file of a Parquet dataset directory
+    (read back with `pandas.read_parquet(path)`); the position is the number
+    of parts. A single Parquet file cannot be appended to or resumed, so parts
+    are written atomically and parts past the checkpoint are removed.
+    """
+
+    def __init__(self, path, position=0):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Install pyarrow to export Parquet") from e
+        self._pa, self._pq = pa, pq
+        self._schema = pa.schema([
+            ("emp_id", pa.string()), ("name", pa.string()), ("anniversary", pa.string()),
+            ("air_ticket", pa.string()), ("leave_code", pa.string()), ("leave", pa.string()),
+            ("balance", pa.float64()), ("days_taken", pa.float64()),
+            ("pending_applications", pa.int64()), ("pending_days", pa.float64()),
+        ])
+        self._path = path
+        self._parts = position
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:11]) >= position:
+                os.remove(os.path.join(path, name))
+
+    def write(self, rows):
+        columns = {name: [row[name] for row in rows] for name in self._schema.names}
+        columns["emp_id"] = [str(v) for v in columns["emp_id"]]
+        part = os.path.join(self._path, f"part-{self._parts:06d}.parquet")
+        self._pq.write_table(self._pa.Table.from_pydict(columns, schema=self._schema), f"{part}.tmp")
+        os.replace(f"{part}.tmp", part)
+        self._parts += 1
+        return self._parts
+
+    def close(self):
+        pass
+
+
+SINKS = {"csv": CsvSink, "parquet": ParquetSink}
+
+
+def load_checkpoint(path):
+    """The saved checkpoint, or None when there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def export_leave_report(emp_ids, output, fmt="csv", workers=None, chunk_rows=5000,
+                        from_date=None, to_date=None, cgm_id=1, resume=True):
+    """
+    Stream the leave report of `emp_ids` (any iterable, read lazily) to `output`.
+
+    With `resume` and a checkpoint left by an interrupted run with the same
+    format, the employees it covers are skipped and writing continues where
+    it stopped. The checkpoint is removed once the export completes.
+
+    Returns:
+        dict: employees, rows, failed (IDs whose data could not be fetched),
+        resumed_from, seconds and rows_per_s (for this run).
+    """
+    if fmt not in SINKS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    workers = workers or settings.TEAM_MAX_CONCURRENCY
+    checkpoint_path = f"{output}.checkpoint.json"
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state and (state.get("format") != fmt or not os.path.exists(output)):
+        state = None
+    state = state or {"format": fmt, "employees": 0, "rows": 0, "position": 0, "failed": []}
+    resumed_from = state["employees"]
+    if resumed_from:
+        logger.info("Resuming %s export after %d employees", output, resumed_from)
+
+    emp_ids = iter(emp_ids)
+    for _ in range(resumed_from):
+        next(emp_ids, None)
+
+    def load(emp_id):
+        return fetch_employee_data(emp_id, from_date, to_date, cgm_id)
+
+    start = time.perf_counter()
+    rows_written = 0
+    sink = SINKS[fmt](output, state["position"])
+    buffer = []
+
+    def flush():
+        nonlocal rows_written
+        if buffer:
+            state["position"] = sink.write(buffer)
+            state["rows"] += len(buffer)
+            rows_written += len(buffer)
+            buffer.clear()
+        save_checkpoint(checkpoint_path, state)
+        elapsed = time.perf_counter() - start
+        log_event(logger, "export.progress", output=output, employees=state["employees"], rows=state["rows"],
+                  rows_per_s=round(rows_written / elapsed, 1) if elapsed else 0.0)
+
+    try:
+        with span("export.leave_report", output=output, format=fmt) as sp:
+            for emp_id, data, error in bounded_map(load, emp_ids, workers):
+                if error is not None:
+                    logger.warning("Skipping employee %s in export: %s", emp_id, error)
+                    state["failed"].append(emp_id)
+                else:
+                    buffer.extend(summary_rows(emp_id, *data))
+                state["employees"] += 1
+                if len(buffer) >= chunk_rows:
+                    flush()
+            flush()
+            sp.set_attribute("export.rows", state["rows"])
+    finally:
+        sink.close()
+    os.remove(checkpoint_path)
+
+    seconds = time.perf_counter() - start
+    return {
+        "employees": state["employees"],
+        "rows": state["rows"],
+        "failed": state["failed"],
+        "resumed_from": resumed_from,
+        "seconds": seconds,
+        "rows_per_s": rows_written / seconds if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the leave report of many employees.")
+    parser.add_argument("emp_ids", nargs="*", help="Employee IDs (also see --emp-ids-file)")
+    parser.add_argument("--emp-ids-file", default=None, help="File with one employee ID per line")
+    parser.add_argument("--output", required=True, help="CSV file, or directory of Parquet parts")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Default: from the output extension")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Employees fetched concurrently (default: TEAM_MAX_CONCURRENCY)")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="Rows per CSV flush / Parquet part")
+    parser.add_argument("--from-date", default=None, help="Balance period start (default: leave year)")
+    parser.add_argument("--to-date", default=None, help="Balance period end (default: leave year)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.rstrip("/").endswith(".parquet") else "csv")
+    configure_logging()
+    stats = export_leave_report(
+        iter_emp_ids(args.emp_ids, args.emp_ids_file), args.output, fmt, args.workers, args.chunk_rows,
+        args.from_date, args.to_date, resume=not args.no_resume,
+    )
+    resumed = f", resumed after {stats['resumed_from']}" if stats["resumed_from"] else ""
+    print(
+        f"{stats['rows']} rows for {stats['employees']} employees written to {args.output}{resumed} "
+        f"({stats['seconds']:.1f}s, {stats['rows_per_s']:.0f} rows/s, {len(stats['failed'])} failed)"
+    )
+
+
+if __name__ == "__main__":
+    main()
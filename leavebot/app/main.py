@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import sys
+import uuid
 
 # Ensure correct package import
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
@@ -9,6 +10,16 @@ from leavebot.chatbot.chat_engine import ChatEngine
 from leavebot.api.fetch_employee import fetch_employee_details
 from leavebot.config.settings import EMPLOYEE_DETAILS_API
 from leavebot.core.search_embeddings import search_embeddings
+from leavebot.core.metrics import start_metrics_server
+from leavebot.core.invalidation import start_invalidation
+from leavebot.core.circuit_breaker import CircuitOpenError
+from leavebot.core.rate_limit import QueueFullError
+from leavebot.core.snapshot_store import SnapshotStore
+
+# Expose /metrics when METRICS_PORT is set; a no-op on Streamlit reruns.
+start_metrics_server()
+# Evict cached leave data when leave-change events arrive (INVALIDATION_ENABLED).
+start_invalidation()
 
 # --- Page config ---
 st.set_page_config(page_title="LeaveBot HR Assistant")
@@ -24,8 +35,27 @@ else:
 
 api_url = f"{EMPLOYEE_DETAILS_API}?strEmp_ID_N={emp_id}"
 
+# --- Session id: kept in the URL so a reload resumes the same snapshot ---
+session_id = query_params.get("session")
+if not session_id:
+    session_id = uuid.uuid4().hex
+    st.query_params["session"] = session_id
+
+
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore()
+
+
+snapshot_store = get_snapshot_store()
+
 # --- Validate Employee ID ---
-emp_data = fetch_employee_details(emp_id)
+try:
+    emp_data = fetch_employee_details(emp_id)
+except (CircuitOpenError, QueueFullError):
+    # ERP is down: keep going so policy questions can still be answered.
+    st.warning("⚠️ The HR system is currently unavailable. Only policy questions can be answered right now.")
+    emp_data = [{"Emp_ID_N": emp_id}]
 if not emp_data:
     st.error(f"❌ No employee found with ID {emp_id}. Please check the emp_id in the URL.")
     st.stop()
@@ -33,8 +63,14 @@ if not emp_data:
 # --- Initialize Chat Engine and history ---
 if "chat_engine" not in st.session_state:
     st.session_state.chat_engine = ChatEngine()
-    st.session_state.chat_history = []
-    st.session_state.chat_engine.preload_data(emp_id=emp_id, from_date="2024-01-01", to_date="2024-12-31")
+    # Resume from a recent snapshot (no ERP round-trips); otherwise load lazily.
+    history = st.session_state.chat_engine.resume_from_snapshot(
+        snapshot_store, emp_id, session_id, prefetch=True
+    )
+    if history is None:
+        st.session_state.chat_engine.preload_data(emp_id=emp_id, lazy=True, prefetch=True)
+        history = []
+    st.session_state.chat_history = history
 
 chat_engine = st.session_state.chat_engine
 
@@ -73,10 +109,13 @@ if user_input:
     answer_lower = (response or "").lower()
     if any(phrase in answer_lower for phrase in fallback_phrases):
         doc_results = search_embeddings(user_input, top_k=1)
-        if doc_results and doc_results[0]["similarity"] > 0.72:  # Adjust threshold as needed
+        # Lexical-only hits carry no cosine similarity and are not used here.
+        if doc_results and (doc_results[0]["similarity"] or 0) > 0.72:  # Adjust threshold as needed
             policy_answer = doc_results[0]['chunk']
             st.session_state.chat_history.append({"role": "assistant", "content": policy_answer})
             with st.chat_message("assistant"):
                 st.markdown(f"**Policy Reference:**\n{policy_answer}")
 
+    chat_engine.save_snapshot(snapshot_store, session_id, st.session_state.chat_history)
+
  
\ No newline at end of file
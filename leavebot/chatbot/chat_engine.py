@@ -1,12 +1,16 @@
-import openai
-import os
 import json
+import re
+import threading
+import time
+from datetime import date, datetime
+from functools import partial
 
 from ..core.leave_utils import (
     total_leave_taken,
     leaves_by_type,
     available_leave_types,
     leave_type_balance,
+    resolve_lpd_id,
     is_on_leave_today,
     recent_leaves,
     unapproved_leaves,
@@ -18,12 +22,37 @@ from ..core.employee_utils import (
 )
 from ..api.fetch_employee import fetch_employee_details
 from ..api.fetch_leave_types import fetch_leave_types
-from ..api.fetch_leave_balance import fetch_leave_balance
+from ..api.fetch_leave_balance import fetch_leave_balances, resolve_date_range
 from ..api.fetch_leave_history import fetch_leave_history
+from ..api.fetch_team import fetch_direct_reports, fetch_team_balances, fetch_team_leave_history
 from ..core.search_embeddings import search_embeddings
-from ..core.air_ticket_utils import air_ticket_info
+from ..core.accrual import AccrualModel
+from ..core.air_ticket_utils import air_ticket_info, is_air_ticket_eligible
+from ..core.fact_sheet import build_fact_sheet, format_days
+from ..core.model_cascade import step_problem
+from ..core.speculation import Speculation, worth_speculating
+from ..core.tool_selector import ToolSelector
+from ..core.team_utils import (
+    team_balance_totals,
+    team_frame,
+    team_leave_summary,
+    team_members,
+    team_on_leave,
+    team_pending_leaves,
+)
+from ..core.cache_utils import LEAVE_BALANCE_CACHE, pop_stale_notes
+from ..core.circuit_breaker import CircuitOpenError, open_endpoints
+from ..core.deadline import DeadlineExceeded, deadline_scope, remaining
+from ..core.invalidation import EVENT_KINDS as INVALIDATION_KINDS, invalidated_since, version as invalidation_version
+from ..core.rate_limit import QueueFullError
+from ..config import settings
+from ..core.llm_client import create_chat_completion
+from ..core.log_utils import configure_logging, get_logger, log_event
+from ..core.metrics import ACCRUAL_RECONCILIATIONS, TOOL_CALLS, TURNS, TURN_SECONDS
+from ..core.profiling import default_profiler, maybe_profile
+from ..core.tracing import span
 
-openai.api_key = os.getenv("OPENAI_API_KEY", "")
+logger = get_logger(__name__)
 
 tools = [
     {
@@ -69,6 +98,21 @@ tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "projected_leave_balance",
+            "description": "Projects the leave balance for a leave code on a past or future date, including accrual and booked leave.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "leave_code": {"type": "string", "description": "Leave code or description"},
+                    "on_date": {"type": "string", "description": "Date in YYYY-MM-DD format (default today)"}
+                },
+                "required": ["leave_code"]
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -158,8 +202,128 @@ tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "team_members",
+            "description": "For managers: lists the employee's direct reports with contact details.",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "team_pending_leaves",
+            "description": "For managers: lists leave applications of direct reports that are not approved yet.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "status": {"type": "string", "description": "Optional: only this status (e.g. 'Pending')"}
+                }
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "team_leave_summary",
+            "description": "For managers: approved leave days per direct report and leave type, with team totals.",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "team_on_leave_today",
+            "description": "For managers: which direct reports are on leave today.",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "team_balance_totals",
+            "description": "For managers: each direct report's balance for a leave type and the team total.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "leave_code": {"type": "string", "description": "Leave code or description (e.g. 'AL')"}
+                },
+                "required": ["leave_code"]
+            },
+        },
+    },
 ]
 
+# Words users say for each tool that its description does not contain.
+TOOL_KEYWORDS = {
+    "total_leave_taken": ["how many days taken used this year so far sick annual"],
+    "leaves_by_type": ["breakdown per type each kind taken used"],
+    "available_leave_types": ["what kinds types of leave can entitled eligible"],
+    "leave_type_balance": ["balance remaining left remain available days enough annual sick AL SL"],
+    "projected_leave_balance": ["will be balance next month year future projected accrue accrual by end of on date"],
+    "years_of_service": ["joined joining date tenure how long worked service probation"],
+    "employee_contact": ["my details profile designation department email phone"],
+    "manager_contact": ["manager supervisor reporting boss line approver"],
+    "is_on_leave_today": ["today currently now am off"],
+    "recent_leaves": ["last latest recent previous applied applications requests history dates"],
+    "air_ticket_info": ["air ticket flight fare travel airfare claim eligibility"],
+    "unapproved_leaves": ["pending rejected status waiting not approved application"],
+    "team_members": ["my team direct reports subordinates staff"],
+    "team_pending_leaves": ["team direct reports pending approve approval requests awaiting"],
+    "team_leave_summary": ["team direct reports taken used summary"],
+    "team_on_leave_today": ["team direct reports out off away today"],
+    "team_balance_totals": ["team direct reports balance remaining left"],
+}
+
+# search_policy is always offered so policy questions keep working on a subset.
+TOOL_SELECTOR = ToolSelector(tools, TOOL_KEYWORDS, always=("search_policy",))
+
+# Tools cheap enough to start before the model asks for them, with the
+# arguments they need; "leave_code" is read from the question when the
+# employee's leave types are already loaded, "question" is the question itself.
+SPECULATIVE_TOOLS = {
+    "leave_type_balance": ("leave_code",),
+    "air_ticket_info": ("leave_code",),
+    "recent_leaves": (),
+    "leaves_by_type": (),
+    "available_leave_types": (),
+    "unapproved_leaves": (),
+    "is_on_leave_today": (),
+    "years_of_service": (),
+    "employee_contact": (),
+    "manager_contact": (),
+    "search_policy": ("question",),
+}
+
+NO_TEAM_MESSAGE = "No direct reports were found for this employee."
+
+DEGRADED_MODE_PROMPT = {
+    "role": "system",
+    "content": (
+        "The HR data system is currently unavailable. Employee data tools may fail; "
+        "if they do, say that personal leave data cannot be retrieved right now and "
+        "answer general leave and policy questions with the search_policy tool."
+    )
+}
+
+ERP_UNAVAILABLE_MESSAGE = (
+    "The HR data system is temporarily unavailable, so this information cannot be "
+    "retrieved right now. Policy questions can still be answered with search_policy."
+)
+
+MODEL_BUSY_MESSAGE = (
+    "Not retrieved: the language model service is busy right now, so this lookup "
+    "could not run. Answer from the data already available or ask the user to try again shortly."
+)
+
+DEADLINE_TOOL_MESSAGE = "Not retrieved: the time available for this answer ran out."
+
+DEADLINE_MESSAGE = (
+    "Sorry, this is taking longer than expected and I could not finish the answer. "
+    "Please try again in a moment."
+)
+
 SYSTEM_PROMPT = {
     "role": "system",
     "content": (
@@ -176,17 +340,52 @@ SYSTEM_PROMPT = {
 class ChatEngine:
     """Encapsulates chatbot state and interactions."""
 
+    # Datasets fetched by the background prefetch, most likely first.
+    PREFETCH_ORDER = ("employee", "leave_types", "leave_history", "leave_balances", "manager")
+
     def __init__(self):
+        configure_logging()
         self.employee = None
         self.leave_types = None
         self.leave_history = None
         self.leave_balances = None
         self.manager = None
+        self.team = None
+        self._team_frame = None
+        # (budget, text) of the rendered fact sheet; cleared whenever data is reloaded.
+        self._fact_sheet = None
+        # Local accrual model and when it was last checked against the ERP (monotonic).
+        self._accrual = None
+        self._accrual_checked = 0.0
+        # (leave, employee) invalidation versions of the loaded data; see apply_invalidations.
+        self._loaded_versions = (0, 0)
+        # Inline the fact sheet into the system prompt (FACT_SHEET_ENABLED).
+        self.use_fact_sheet = settings.FACT_SHEET_ENABLED
+        # Its token budget; None uses FACT_SHEET_TOKEN_BUDGET.
+        self.fact_sheet_budget = None
+        # Send only the tools relevant to each question (TOOL_SELECTION_ENABLED).
+        self.use_tool_selection = settings.TOOL_SELECTION_ENABLED
+        # Run the likely tools alongside the first completion (SPECULATION_ENABLED).
+        self.use_speculation = settings.SPECULATION_ENABLED
+        # Small model first, large model for policy turns and failed checks (CASCADE_ENABLED).
+        self.use_cascade = settings.CASCADE_ENABLED
+        self.emp_id = None
+        self.cgm_id = 1
+        self.from_date = None
+        self.to_date = None
+        self.lazy = False
+        self.prefetch = False
+        self._fetched_lpd_ids = set()
+        self._load_lock = threading.RLock()
+        self._prefetch_thread = None
+        # Set to a profiling.Profiler to profile each turn and tool call.
+        self.profiler = default_profiler()
         self.TOOL_MAP = {
             "total_leave_taken": self.tool_total_leave_taken,
             "leaves_by_type": self.tool_leaves_by_type,
             "available_leave_types": self.tool_available_leave_types,
             "leave_type_balance": self.tool_leave_type_balance,
+            "projected_leave_balance": self.tool_projected_leave_balance,
             "years_of_service": self.tool_years_of_service,
             "employee_contact": self.tool_employee_contact,
             "manager_contact": self.tool_manager_contact,
@@ -195,62 +394,443 @@ class ChatEngine:
             "air_ticket_info": self.tool_air_ticket_info,
             "search_policy": self.tool_search_policy,
             "unapproved_leaves": self.tool_unapproved_leaves,
+            "team_members": self.tool_team_members,
+            "team_pending_leaves": self.tool_team_pending_leaves,
+            "team_leave_summary": self.tool_team_leave_summary,
+            "team_on_leave_today": self.tool_team_on_leave_today,
+            "team_balance_totals": self.tool_team_balance_totals,
         }
 
-    def preload_data(self, emp_id, from_date, to_date, cgm_id=1):
-        """Fetch and cache employee-related data for the session."""
-        self.employee = fetch_employee_details(emp_id)
-        self.leave_types = fetch_leave_types(emp_id, cgm_id)
-        self.leave_history = fetch_leave_history(emp_id, self.leave_types)
-        self.leave_balances = {}
-        for lt in self.leave_types:
-            bal = fetch_leave_balance(emp_id, lt["Lpd_ID_N"], from_date, to_date)
-            if isinstance(bal, list) and bal:
-                bal = bal[0]
-            if bal:
-                bal["Lvm_Code_V"] = lt.get("Lvm_Code_V", "")
-                self.leave_balances[lt["Lpd_ID_N"]] = bal
-        self.manager = get_manager_details(self.employee, fetch_employee_details)
-        return (
-            self.employee,
-            self.leave_types,
-            self.leave_history,
-            self.leave_balances,
-            self.manager,
-        )
+    def preload_data(self, emp_id, from_date=None, to_date=None, cgm_id=1, lazy=False, prefetch=False):
+        """
+        Fetch and cache employee-related data for the session.
+        The balance date range defaults to the current leave year.
+
+        With ``lazy=True`` nothing is fetched here: each dataset is loaded and
+        memoized on the first tool call that needs it, and ``prefetch=True``
+        starts a background load of the remaining datasets after the first answer.
+        """
+        with self._load_lock:
+            self.emp_id = emp_id
+            self.cgm_id = cgm_id
+            self.from_date, self.to_date = resolve_date_range(from_date, to_date)
+            self.lazy = lazy
+            self.prefetch = prefetch
+            self.employee = None
+            self.leave_types = None
+            self.leave_history = None
+            self.leave_balances = None
+            self.manager = None
+            self.team = None
+            self._team_frame = None
+            self._fact_sheet = None
+            self._accrual = None
+            self._fetched_lpd_ids = set()
+            self._prefetch_thread = None
+            self._loaded_versions = self._invalidation_versions()
+        if lazy:
+            return None
+        with span("chat.preload_data", emp_id=emp_id):
+            return (
+                self.get_employee(),
+                self.get_leave_types(),
+                self.get_leave_history(),
+                self.get_leave_balances(),
+                self.get_manager(),
+            )
+
+    # --- DATA LOADERS (memoized on the engine) ---
+    def get_employee(self):
+        with self._load_lock:
+            if self.employee is None:
+                self.employee = fetch_employee_details(self.emp_id)
+            return self.employee
+
+    def get_leave_types(self):
+        with self._load_lock:
+            if self.leave_types is None:
+                self.leave_types = fetch_leave_types(self.emp_id, self.cgm_id)
+            return self.leave_types
+
+    def get_leave_history(self):
+        with self._load_lock:
+            if self.leave_history is None:
+                self.leave_history = fetch_leave_history(self.emp_id, self.get_leave_types())
+            return self.leave_history
+
+    def get_leave_balances(self, lpd_ids=None):
+        """
+        Return the balance map, fetching any of ``lpd_ids`` not loaded yet.
+        ``lpd_ids=None`` loads every leave type.
+        """
+        with self._load_lock:
+            if self.leave_balances is None:
+                self.leave_balances = {}
+            if lpd_ids is None:
+                lpd_ids = [lt["Lpd_ID_N"] for lt in self.get_leave_types()]
+            missing = [lpd_id for lpd_id in lpd_ids if lpd_id not in self._fetched_lpd_ids]
+            if missing:
+                self.leave_balances.update(fetch_leave_balances(
+                    self.emp_id, self.get_leave_types(), self.from_date, self.to_date, lpd_ids=missing
+                ))
+                self._fetched_lpd_ids.update(missing)
+            return self.leave_balances
+
+    def get_air_ticket_balances(self, leave_code=None):
+        """
+        Return balances in leave-type order up to the first air-ticket-eligible
+        type, fetching one type at a time so later types are never requested.
+        """
+        leave_types = self.get_leave_types()
+        if leave_code:
+            lpd_id = resolve_lpd_id(leave_types, leave_code)
+            candidates = [lpd_id] if lpd_id is not None else []
+        else:
+            candidates = [lt["Lpd_ID_N"] for lt in leave_types]
+        ordered = {}
+        for lpd_id in candidates:
+            bal = self.get_leave_balances([lpd_id]).get(lpd_id)
+            if bal is None:
+                continue
+            ordered[lpd_id] = bal
+            if is_air_ticket_eligible(bal):
+                break
+        return ordered
+
+    def get_manager(self):
+        with self._load_lock:
+            if self.manager is None:
+                self.manager = get_manager_details(self.get_employee(), fetch_employee_details)
+            return self.manager
+
+    def get_team(self):
+        """Direct reports of the session employee (empty for non-managers)."""
+        with self._load_lock:
+            if self.team is None:
+                self.team = fetch_direct_reports(self.emp_id)
+            return self.team
+
+    def get_team_frame(self):
+        """One DataFrame with every direct report's leave history, fetched in bulk."""
+        with self._load_lock:
+            if self._team_frame is None:
+                team = self.get_team()
+                histories = fetch_team_leave_history(
+                    [rec.get("Emp_ID_N") for rec in team], self.get_leave_types()
+                )
+                self._team_frame = team_frame(team, histories)
+            return self._team_frame
+
+    def fact_sheet(self, budget=None):
+        """
+        Render the employee's data as a compact fact sheet of at most `budget`
+        tokens (default FACT_SHEET_TOKEN_BUDGET). Loads every dataset it needs.
+        """
+        budget = settings.FACT_SHEET_TOKEN_BUDGET if budget is None else budget
+        with self._load_lock:
+            if self._fact_sheet is None or self._fact_sheet[0] != budget:
+                with span("chat.fact_sheet", budget=budget) as sp:
+                    text = build_fact_sheet(self._fact_sections(), budget)
+                    sp.set_attribute("fact_sheet.chars", len(text))
+                self._fact_sheet = (budget, text)
+            return self._fact_sheet[1]
+
+    def _fact_sections(self):
+        employee = self.get_employee()
+        emp = (employee[0] if isinstance(employee, list) and employee else employee) or {}
+        leave_types = self.get_leave_types()
+        history = self.get_leave_history()
+        balances = self.get_leave_balances()
+        air = air_ticket_info(balances, history)
+        manager = self.get_manager()
+        return [
+            ("Employee", [
+                emp.get("Emp_EFullName_V") or emp.get("Emp_EDisplayName_V") or str(self.emp_id),
+                f"{years_of_service(emp)} years of service",
+            ]),
+            ("Leave balance (days)", [
+                f"{bal.get('Lvm_Code_V') or lpd_id}={format_days(bal.get('Balance'))}"
+                for lpd_id, bal in balances.items()
+            ]),
+            ("Approved days taken", [
+                f"{desc}={format_days(days)}" for desc, days in leaves_by_type(history, leave_types).items()
+            ]),
+            ("Recent approved leaves", [
+                f"{rec['code']} {rec['from']} to {rec['to']}" for rec in recent_leaves(history, count=5)
+            ]),
+            ("Not approved", [
+                f"{rec.get('LeaveGrid_Lvm_Code_V') or rec.get('LeaveGrid_Lvm_Description_V')} "
+                f"{(rec.get('LeaveGrid_Ela_FromDate_D') or '')[:10]} ({rec.get('LeaveGrid_Status', 'Unknown')})"
+                for rec in unapproved_leaves(history)
+            ]),
+            ("Air ticket", (
+                [f"eligible {format_days(air.get('percent'))}%",
+                 f"next eligible {air.get('next_eligible_date') or 'unknown'}",
+                 f"last claim {air.get('last_claim_date') or 'none'}"]
+                if air.get("eligible") else ["not eligible"]
+            )),
+            ("Manager", [v for v in (manager.get("name"), manager.get("email"), manager.get("mobile")) if v]),
+        ]
+
+    def _fact_sheet_message(self):
+        """The fact sheet as a system message, or None if it cannot be built right now."""
+        try:
+            text = self.fact_sheet(self.fact_sheet_budget)
+        except Exception as e:
+            logger.warning("Fact sheet unavailable, falling back to tools only: %s", e)
+            return None
+        return {"role": "system", "content": text} if text else None
+
+    def get_accrual_model(self):
+        """Local accrual model seeded from the loaded balances, leave types, history and anniversary."""
+        with self._load_lock:
+            if self._accrual is None:
+                employee = self.get_employee()
+                emp = (employee[0] if isinstance(employee, list) and employee else employee) or {}
+                self._accrual = AccrualModel(
+                    date.today(),
+                    self.get_leave_balances(),
+                    self.get_leave_types(),
+                    self.get_leave_history(),
+                    anniversary=emp.get("Emp_AnnivDate_D"),
+                    accrual_days=settings.LEAVE_ACCRUAL_DAYS,
+                    carry_forward_max=settings.LEAVE_CARRY_FORWARD_MAX,
+                )
+                self._accrual_checked = time.monotonic()
+            return self._accrual
+
+    def reconcile_accrual(self, force=False):
+        """
+        Every ACCRUAL_RECONCILE_S (or when forced), fetch today's balances from
+        the ERP and compare them with the model. When any type is off by more
+        than ACCRUAL_DRIFT_TOLERANCE days the fresh balances replace the loaded
+        ones and the model is reseeded. Returns {Lpd_ID_N: drift in days}.
+        """
+        model = self.get_accrual_model()
+        if not force and time.monotonic() - self._accrual_checked < settings.ACCRUAL_RECONCILE_S:
+            return {}
+        lpd_ids = list(self.get_leave_balances())
+        for key in [key for key in list(LEAVE_BALANCE_CACHE) if key[0] == self.emp_id and key[1] in lpd_ids]:
+            LEAVE_BALANCE_CACHE.pop(key, None)
+        fresh = fetch_leave_balances(self.emp_id, self.get_leave_types(), self.from_date, self.to_date, lpd_ids=lpd_ids)
+        drift = model.drift(fresh)
+        with self._load_lock:
+            self._accrual_checked = time.monotonic()
+            if any(abs(days) > settings.ACCRUAL_DRIFT_TOLERANCE for days in drift.values()):
+                logger.warning("Accrual model for %s drifted from the ERP by %s days; reseeding", self.emp_id, drift)
+                self.leave_balances.update(fresh)
+                self._accrual = None
+                self._fact_sheet = None
+                ACCRUAL_RECONCILIATIONS.inc(result="reseeded")
+            else:
+                ACCRUAL_RECONCILIATIONS.inc(result="ok")
+        return drift
+
+    def _prefetch_remaining(self):
+        for name in self.PREFETCH_ORDER:
+            try:
+                getattr(self, f"get_{name}")()
+            except Exception as e:
+                logger.warning("Background prefetch of %s failed: %s", name, e)
+
+    def start_prefetch(self):
+        """Start loading the remaining datasets in a background thread (once)."""
+        if self._prefetch_thread is not None or self.emp_id is None:
+            return
+        self._prefetch_thread = threading.Thread(target=self._prefetch_remaining, daemon=True)
+        self._prefetch_thread.start()
+
+    # --- SNAPSHOTS ---
+    SNAPSHOT_VERSION = 1
+
+    def snapshot_state(self, conversation=None):
+        """Return the loaded session data plus `conversation` as a picklable dict."""
+        with self._load_lock:
+            return {
+                "version": self.SNAPSHOT_VERSION,
+                "emp_id": self.emp_id,
+                "cgm_id": self.cgm_id,
+                "from_date": self.from_date,
+                "to_date": self.to_date,
+                "employee": self.employee,
+                "leave_types": self.leave_types,
+                "leave_history": self.leave_history,
+                "leave_balances": self.leave_balances,
+                "fetched_lpd_ids": set(self._fetched_lpd_ids),
+                "manager": self.manager,
+                "conversation": list(conversation or []),
+            }
+
+    def restore_state(self, state, prefetch=False):
+        """
+        Load a snapshot_state() dict. Datasets missing from it are fetched
+        lazily. Returns the stored conversation.
+        """
+        with self._load_lock:
+            self.emp_id = state["emp_id"]
+            self.cgm_id = state["cgm_id"]
+            self.from_date = state["from_date"]
+            self.to_date = state["to_date"]
+            self.employee = state["employee"]
+            self.leave_types = state["leave_types"]
+            self.leave_history = state["leave_history"]
+            self.leave_balances = state["leave_balances"]
+            self._fetched_lpd_ids = set(state["fetched_lpd_ids"])
+            self.manager = state["manager"]
+            self._fact_sheet = None
+            self._accrual = None
+            self.lazy = True
+            self.prefetch = prefetch
+            self._prefetch_thread = None
+            self._loaded_versions = self._invalidation_versions()
+        return list(state.get("conversation") or [])
+
+    def save_snapshot(self, store, session_id, conversation=None):
+        """Persist this session to a SnapshotStore; returns the snapshot size in bytes."""
+        with span("chat.save_snapshot", emp_id=self.emp_id):
+            return store.save(self.emp_id, session_id, self.snapshot_state(conversation))
+
+    def resume_from_snapshot(self, store, emp_id, session_id, max_age=None, refresh=True, prefetch=False):
+        """
+        Restore a session saved less than `max_age` seconds ago (default
+        SNAPSHOT_MAX_AGE_S). Returns its conversation, or None if there is no
+        fresh snapshot. With `refresh=True` the restored datasets are re-checked
+        against the ERP on a background thread and replaced if they changed.
+        """
+        max_age = settings.SNAPSHOT_MAX_AGE_S if max_age is None else max_age
+        with span("chat.resume_snapshot", emp_id=emp_id) as sp:
+            loaded = store.load(emp_id, session_id, max_age)
+            sp.set_attribute("hit", loaded is not None)
+            if loaded is None or loaded[1].get("version") != self.SNAPSHOT_VERSION:
+                return None
+            saved_at, state = loaded
+            conversation = self.restore_state(state, prefetch=prefetch)
+            # Leave changes published after the snapshot was saved: reload those datasets.
+            stale = [kind for kind in INVALIDATION_KINDS if invalidated_since(emp_id, saved_at, kind)]
+            if stale:
+                sp.set_attribute("invalidated", ",".join(stale))
+                with self._load_lock:
+                    self._drop_datasets(stale)
+        if refresh:
+            threading.Thread(target=self.refresh_loaded, daemon=True).start()
+        return conversation
+
+    # --- INVALIDATION ---
+    def _invalidation_versions(self):
+        return tuple(invalidation_version(self.emp_id, kind) for kind in INVALIDATION_KINDS)
+
+    def _drop_datasets(self, kinds):
+        """Forget loaded datasets of the given invalidation kinds (caller holds _load_lock)."""
+        if "leave" in kinds:
+            self.leave_history = None
+            self.leave_balances = None
+            self._fetched_lpd_ids = set()
+        if "employee" in kinds:
+            self.employee = None
+            self.leave_types = None
+            self.manager = None
+        self._fact_sheet = None
+        self._accrual = None
+
+    def apply_invalidations(self):
+        """
+        Drop datasets whose employee had a leave-change event applied since
+        they were loaded (see core.invalidation); they are fetched again on
+        next use. Returns the kinds dropped.
+        """
+        with self._load_lock:
+            current = self._invalidation_versions()
+            kinds = [kind for kind, old, new in zip(INVALIDATION_KINDS, self._loaded_versions, current) if old != new]
+            if kinds:
+                self._drop_datasets(kinds)
+            self._loaded_versions = current
+        if kinds:
+            logger.info("Reloading %s data for %s after invalidation", ", ".join(kinds), self.emp_id)
+        return kinds
+
+    def refresh_loaded(self):
+        """
+        Re-fetch every dataset that is currently loaded and swap in any that
+        changed. Returns the names of the changed datasets.
+        """
+        try:
+            fresh = {}
+            if self.employee is not None:
+                fresh["employee"] = fetch_employee_details(self.emp_id)
+            if self.leave_types is not None:
+                fresh["leave_types"] = fetch_leave_types(self.emp_id, self.cgm_id)
+            leave_types = fresh.get("leave_types", self.leave_types)
+            if self.leave_history is not None:
+                fresh["leave_history"] = fetch_leave_history(self.emp_id, leave_types)
+            if self._fetched_lpd_ids:
+                fresh["leave_balances"] = fetch_leave_balances(
+                    self.emp_id, leave_types, self.from_date, self.to_date, lpd_ids=self._fetched_lpd_ids
+                )
+            if self.manager is not None:
+                fresh["manager"] = get_manager_details(
+                    fresh.get("employee", self.employee), fetch_employee_details
+                )
+        except Exception as e:
+            logger.warning("Snapshot freshness check for %s failed: %s", self.emp_id, e)
+            return []
+        with self._load_lock:
+            changed = [name for name, value in fresh.items() if getattr(self, name) != value]
+            for name in changed:
+                setattr(self, name, fresh[name])
+            if changed:
+                self._fact_sheet = None
+                self._accrual = None
+        if changed:
+            logger.info("Refreshed stale snapshot data for %s: %s", self.emp_id, ", ".join(changed))
+        return changed
 
     # --- TOOL DEFINITIONS ---
     def tool_total_leave_taken(self, leave_code=None, **kwargs):
-        return total_leave_taken(self.leave_history, self.leave_types, code_or_group=leave_code)
+        return total_leave_taken(self.get_leave_history(), self.get_leave_types(), code_or_group=leave_code)
 
     def tool_leaves_by_type(self, **kwargs):
-        return leaves_by_type(self.leave_history, self.leave_types)
+        return leaves_by_type(self.get_leave_history(), self.get_leave_types())
 
     def tool_available_leave_types(self, **kwargs):
-        return available_leave_types(self.leave_types)
+        return available_leave_types(self.get_leave_types())
 
     def tool_leave_type_balance(self, leave_code=None, **kwargs):
         if leave_code is None:
             return None
-        return leave_type_balance(self.leave_balances, self.leave_types, code_or_desc=leave_code)
+        leave_types = self.get_leave_types()
+        lpd_id = resolve_lpd_id(leave_types, leave_code)
+        if lpd_id is None:
+            return None
+        return leave_type_balance(self.get_leave_balances([lpd_id]), leave_types, code_or_desc=leave_code)
+
+    def tool_projected_leave_balance(self, leave_code=None, on_date=None, **kwargs):
+        if leave_code is None:
+            return None
+        self.reconcile_accrual()
+        projection = self.get_accrual_model().projection(leave_code, on_date or date.today())
+        if projection is None:
+            return f"No balance projection is available for {leave_code!r} on {on_date or 'today'}."
+        return projection
 
     def tool_years_of_service(self, **kwargs):
-        return years_of_service(self.employee)
+        return years_of_service(self.get_employee())
 
     def tool_employee_contact(self, **kwargs):
-        return employee_contact_summary(self.employee)
+        return employee_contact_summary(self.get_employee())
 
     def tool_manager_contact(self, **kwargs):
-        return self.manager
+        return self.get_manager()
 
     def tool_is_on_leave_today(self, **kwargs):
-        return is_on_leave_today(self.leave_history)
+        return is_on_leave_today(self.get_leave_history())
 
     def tool_recent_leaves(self, count=5, **kwargs):
-        return recent_leaves(self.leave_history, count=count)
+        return recent_leaves(self.get_leave_history(), count=count)
 
     def tool_air_ticket_info(self, leave_code=None, **kwargs):
-        return air_ticket_info(self.leave_balances, self.leave_history, leave_code=leave_code)
+        return air_ticket_info(
+            self.get_air_ticket_balances(leave_code), self.get_leave_history(), leave_code=leave_code
+        )
 
     def tool_search_policy(self, question=None, **kwargs):
         results = search_embeddings(question, top_k=2)
@@ -262,7 +842,7 @@ class ChatEngine:
         return answer.strip()
 
     def tool_unapproved_leaves(self, status=None, **kwargs):
-        unapproved = unapproved_leaves(self.leave_history)
+        unapproved = unapproved_leaves(self.get_leave_history())
         if status:
             status_lower = status.strip().lower()
             unapproved = [
@@ -281,16 +861,60 @@ class ChatEngine:
             )
         return result.strip()
 
+    def tool_team_members(self, **kwargs):
+        return team_members(self.get_team()) or NO_TEAM_MESSAGE
+
+    def tool_team_pending_leaves(self, status=None, **kwargs):
+        if not self.get_team():
+            return NO_TEAM_MESSAGE
+        return team_pending_leaves(self.get_team_frame(), status) or "No pending leave applications in your team."
+
+    def tool_team_leave_summary(self, **kwargs):
+        if not self.get_team():
+            return NO_TEAM_MESSAGE
+        return team_leave_summary(self.get_team_frame())
+
+    def tool_team_on_leave_today(self, **kwargs):
+        if not self.get_team():
+            return NO_TEAM_MESSAGE
+        return team_on_leave(self.get_team_frame()) or "Nobody in your team is on leave today."
+
+    def tool_team_balance_totals(self, leave_code=None, **kwargs):
+        team = self.get_team()
+        if not team:
+            return NO_TEAM_MESSAGE
+        if not leave_code:
+            return None
+        balances = fetch_team_balances(
+            [rec.get("Emp_ID_N") for rec in team], leave_code, self.from_date, self.to_date, self.cgm_id
+        )
+        return team_balance_totals(balances, team)
+
     def route_tool(self, tool_name, args=None):
         if tool_name not in self.TOOL_MAP:
             return "Tool not implemented."
-        return self.TOOL_MAP[tool_name](**(args or {}))
+        TOOL_CALLS.inc(tool=tool_name)
+        with span("chat.route_tool", **{"tool.name": tool_name}) as sp, \
+                maybe_profile(self.profiler, f"tool-{tool_name}"):
+            try:
+                return self.TOOL_MAP[tool_name](**(args or {}))
+            except (CircuitOpenError, QueueFullError) as e:
+                sp.set_attribute("degraded", True)
+                logger.warning("Tool %s degraded: %s", tool_name, e)
+                if isinstance(e, QueueFullError) and e.limiter == "openai":
+                    # e.g. search_policy embedding the query; the ERP itself is fine.
+                    return MODEL_BUSY_MESSAGE
+                return ERP_UNAVAILABLE_MESSAGE
+            except DeadlineExceeded:
+                sp.set_attribute("deadline_exceeded", True)
+                logger.warning("Tool %s skipped: turn deadline exceeded", tool_name)
+                return DEADLINE_TOOL_MESSAGE
 
     def fallback_with_policy_search(self, user_question, response):
         # Always run policy search for demo/verification!
-        print(f"DEBUG: Running policy search for: {user_question}")
+        logger.debug("Running policy search for: %s", user_question)
         policy_snippet = self.tool_search_policy(question=user_question)
-        print(f"DEBUG: Policy search result: {policy_snippet}")
+        logger.debug("Policy search result: %s", policy_snippet)
         if policy_snippet and "No relevant policy" not in policy_snippet:
             response = (
                 response.strip() +
@@ -299,43 +923,229 @@ class ChatEngine:
         return response
 
     def stream_completion(self, messages, user_input=None):
+        TURNS.inc()
+        start = time.perf_counter()
+        self.apply_invalidations()
+        try:
+            with span("chat.turn", emp_id=self.emp_id), maybe_profile(self.profiler, "turn"), \
+                    deadline_scope(settings.TURN_DEADLINE_S):
+                return self._run_turn(messages, user_input)
+        finally:
+            TURN_SECONDS.observe(time.perf_counter() - start)
+
+    @staticmethod
+    def staleness_notice(notes):
+        """Build the notice appended to answers served from last-known ERP data."""
+        if not notes:
+            return ""
+        oldest = datetime.fromtimestamp(min(notes.values())).strftime("%Y-%m-%d %H:%M")
+        sources = ", ".join(sorted(name.replace("_", " ") for name in notes))
+        return (
+            f"\n\n_Note: the HR system is currently unreachable, so {sources} data is "
+            f"from {oldest} and may be out of date._"
+        )
+
+    @staticmethod
+    def _latest_question(messages):
+        return next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), None)
+
+    def select_tools(self, messages):
+        """
+        Tool schemas for this turn: the subset matching the latest user message
+        when tool selection is on, otherwise (or when nothing matches) all tools.
+        The follow-up calls of the turn reuse the same list.
+        """
+        if not self.use_tool_selection:
+            return tools
+        question = self._latest_question(messages)
+        with span("chat.select_tools") as sp:
+            selected = TOOL_SELECTOR.select(question or "")
+            sp.set_attribute("tools.count", len(selected))
+            sp.set_attribute("tools.saved_tokens", TOOL_SELECTOR.schema_tokens() - TOOL_SELECTOR.schema_tokens(selected))
+        return selected
+
+    def _leave_code_in(self, question):
+        """Leave code named (by code or description) in `question`, from already loaded leave types."""
+        words = set(re.findall(r"[a-z0-9]+", question.lower()))
+        text = question.lower()
+        for lt in self.leave_types or []:
+            code = lt.get("Lvm_Code_V")
+            desc = (lt.get("Lvm_Description_V") or "").lower()
+            if code and (code.lower() in words or (desc and desc in text)):
+                return code
+        return None
+
+    @staticmethod
+    def _tool_key(tool_name, args):
+        return tool_name, json.dumps(args or {}, sort_keys=True)
+
+    def start_speculation(self, question, turn_tools):
+        """
+        Start up to SPECULATION_MAX_TOOLS likely tools for `question` in the
+        background. Only tools offered this turn, listed in SPECULATIVE_TOOLS,
+        whose arguments can be filled and whose hit rate is acceptable are
+        started. Returns a Speculation, or None when nothing was started.
+        """
+        if not self.use_speculation or self.emp_id is None or not question:
+            return None
+        offered = {t["function"]["name"] for t in turn_tools}
+        known = {"question": question, "leave_code": self._leave_code_in(question)}
+        calls = []
+        for name in TOOL_SELECTOR.match(question):
+            if len(calls) >= settings.SPECULATION_MAX_TOOLS:
+                break
+            params = SPECULATIVE_TOOLS.get(name)
+            if params is None or name not in offered or any(known[p] is None for p in params):
+                continue
+            if not worth_speculating(name, settings.SPECULATION_MIN_HIT_RATE, settings.SPECULATION_MIN_SAMPLES):
+                continue
+            args = {p: known[p] for p in params}
+            calls.append((self._tool_key(name, args), name, partial(self.TOOL_MAP[name], **args)))
+        if not calls:
+            return None
+        with span("chat.start_speculation", tools=",".join(call[1] for call in calls)):
+            return Speculation(calls)
+
+    def call_tool(self, tool_name, args, speculation=None):
+        """Run a tool the model asked for, using its speculative result when there is one."""
+        if speculation is not None:
+            hit, result = speculation.take(self._tool_key(tool_name, args))
+            if hit:
+                TOOL_CALLS.inc(tool=tool_name)
+                with span("chat.route_tool", **{"tool.name": tool_name, "speculative": True}):
+                    return result
+        return self.route_tool(tool_name, args)
+
+    def _run_turn(self, messages, user_input=None):
+        pop_stale_notes()
         if not messages or messages[0].get("role") != "system":
             messages = [SYSTEM_PROMPT] + messages
+        if open_endpoints():
+            messages = messages[:1] + [DEGRADED_MODE_PROMPT] + messages[1:]
+        if self.use_fact_sheet and self.emp_id is not None:
+            sheet = self._fact_sheet_message()
+            if sheet:
+                messages = messages[:1] + [sheet] + messages[1:]
 
-        response = openai.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-            max_tokens=512,
-        )
-        msg = response.choices[0].message
-
-        while hasattr(msg, "tool_calls") and msg.tool_calls:
-            messages.append({
-                "role": "assistant",
-                "tool_calls": [call.model_dump() for call in msg.tool_calls]
-            })
-            for call in msg.tool_calls:
-                tool_name = call.function.name
-                args_json = call.function.arguments
-                args_dict = json.loads(args_json) if args_json else {}
-                tool_response = self.route_tool(tool_name, args_dict)
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": call.id,
-                    "name": tool_name,
-                    "content": str(tool_response)
-                })
-            response = openai.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        turn_tools = self.select_tools(messages)
+        speculation = self.start_speculation(self._latest_question(messages), turn_tools)
+        try:
+            return self._complete_turn(messages, turn_tools, speculation, user_input)
+        finally:
+            if speculation is not None:
+                speculation.finish()
+
+    def _cascade_route(self, question):
+        """
+        (use_small, reason) for the first step of a turn. Policy questions (best
+        tool match is search_policy) and questions no tool matches go to the
+        large model; data questions start on the small one.
+        """
+        if not self.use_cascade:
+            return False, "cascade_off"
+        matched = TOOL_SELECTOR.match(question or "")
+        if not matched:
+            return False, "no_tool_match"
+        if matched[0] == "search_policy":
+            return False, "policy_question"
+        return True, "data_question"
+
+    def _chat_step(self, model, messages, turn_tools, step, reason, **kwargs):
+        log_event(logger, "chat.model_step", step=step, model=model, reason=reason)
+        with span("chat.model_step", step=step, model=model, reason=reason):
+            response = create_chat_completion(
+                model=model,
                 messages=messages,
-                tools=tools,
+                tools=turn_tools,
                 max_tokens=512,
+                **kwargs,
             )
-            msg = response.choices[0].message
+        return response.choices[0].message
 
-        if user_input:
-            return self.fallback_with_policy_search(user_input, msg.content if msg.content else "No answer returned.")
-        else:
-            return msg.content if msg.content else "No answer returned."
+    def _complete_step(self, messages, turn_tools, step, use_small, reason, **kwargs):
+        """
+        One completion of the tool loop. A small-model step that fails the
+        cascade checks (bad tool call, empty or unsure answer) is repeated with
+        OPENAI_MODEL.
+        """
+        if not use_small:
+            return self._chat_step(settings.OPENAI_MODEL, messages, turn_tools, step, reason, **kwargs)
+        msg = self._chat_step(settings.OPENAI_SMALL_MODEL, messages, turn_tools, step, reason, **kwargs)
+        problem = step_problem(msg, turn_tools)
+        if problem is None:
+            return msg
+        return self._chat_step(settings.OPENAI_MODEL, messages, turn_tools, step, f"escalated:{problem}", **kwargs)
+
+    @staticmethod
+    def _near_deadline():
+        left = remaining()
+        return left is not None and left < settings.DEADLINE_RESERVE_S
+
+    @staticmethod
+    def best_effort_answer(messages):
+        """Answer from the tool results gathered so far, for when no completion can be made in time."""
+        gathered = [
+            f"- {m.get('name', 'tool').replace('_', ' ')}: {str(m.get('content'))[:300]}"
+            for m in messages
+            if m.get("role") == "tool" and m.get("content") != DEADLINE_TOOL_MESSAGE
+        ]
+        if not gathered:
+            return DEADLINE_MESSAGE
+        return "I could not finish the answer in time. Here is what I found so far:\n" + "\n".join(gathered)
+
+    def _complete_turn(self, messages, turn_tools, speculation, user_input):
+        """
+        Run the tool loop. After MAX_TOOL_ROUNDS rounds, or once less than
+        DEADLINE_RESERVE_S of the turn deadline is left, no more tools are run
+        and the model is asked to answer from what it has. If even that cannot
+        finish in time, the gathered tool results are returned as they are.
+        """
+        use_small, reason = self._cascade_route(self._latest_question(messages))
+        try:
+            msg = self._complete_step(messages, turn_tools, 0, use_small, reason, tool_choice="auto")
+
+            rounds = 0
+            while hasattr(msg, "tool_calls") and msg.tool_calls:
+                messages.append({
+                    "role": "assistant",
+                    "tool_calls": [call.model_dump() for call in msg.tool_calls]
+                })
+                out_of_time = self._near_deadline()
+                for call in msg.tool_calls:
+                    tool_name = call.function.name
+                    if out_of_time:
+                        tool_response = DEADLINE_TOOL_MESSAGE
+                    else:
+                        args_json = call.function.arguments
+                        args_dict = json.loads(args_json) if args_json else {}
+                        tool_response = self.call_tool(tool_name, args_dict, speculation)
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": call.id,
+                        "name": tool_name,
+                        "content": str(tool_response)
+                    })
+                    if use_small and tool_name == "search_policy":
+                        # Answering from policy text needs the large model.
+                        use_small, reason = False, "policy_reasoning"
+                rounds += 1
+                if out_of_time or rounds >= settings.MAX_TOOL_ROUNDS or self._near_deadline():
+                    log_event(logger, "chat.tool_loop_stopped", rounds=rounds, remaining_s=remaining())
+                    msg = self._complete_step(messages, turn_tools, rounds, use_small, reason, tool_choice="none")
+                    break
+                msg = self._complete_step(messages, turn_tools, rounds, use_small, reason)
+        except DeadlineExceeded:
+            logger.warning("Turn deadline exceeded; answering from the data gathered so far")
+            return self.best_effort_answer(messages) + self.staleness_notice(pop_stale_notes())
+        except QueueFullError as e:
+            # The OpenAI limiter is saturated; degrade like an unavailable ERP tool does.
+            logger.warning("Turn degraded, model requests are queued out: %s", e)
+            return self.best_effort_answer(messages) + self.staleness_notice(pop_stale_notes())
+
+        if self.lazy and self.prefetch:
+            self.start_prefetch()
+
+        answer = msg.content if msg.content else "No answer returned."
+        if user_input and not self._near_deadline():
+            answer = self.fallback_with_policy_search(user_input, answer)
+        return answer + self.staleness_notice(pop_stale_notes())
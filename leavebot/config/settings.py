@@ -1,15 +1,4 @@
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-EMPLOYEE_DETAILS_API = os.getenv("EMPLOYEE_DETAILS_API", "http://localhost/api/EmployeeMasterApi/HrmGetEmployeeDetails/")
-LEAVE_TYPE_API = os.getenv("LEAVE_TYPE_API", "http://localhost/api/LeaveApplicationApi/FillLeaveType")
-LEAVE_HISTORY_API = os.getenv("LEAVE_HISTORY_API", "http://localhost/api/LeaveApplicationApi/HrmGetLeaveApplicationDetails")
-LEAVE_SUMMARY_API = os.getenv("LEAVE_SUMMARY_API", "http://localhost/api/LeaveApplicationApi")
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-ERP_BEARER_TOKEN = os.getenv("ERP_BEARER_TOKEN", "")
 
 RAW_DATA_PATH = os.path.join("data", "raw")
 PROCESSED_JSON_PATH = os.path.join("data", "api_json")
@@ -22,19 +11,189 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 default_doc_path = os.path.join(
     BASE_DIR, "data", "combined_doc_knowledge.json"
 )
-# Allow overriding the embeddings path via environment variable
-DOC_EMBEDDINGS_PATH = os.getenv("DOC_EMBEDDINGS_PATH", default_doc_path)
+# Binary index written by `python -m leavebot.core.ingest_docs`.
+default_index_path = os.path.join(BASE_DIR, "data", "policy_index.npz")
 
+PROJECT_VERSION = "1.0.0"
+PROJECT_AUTHOR = "Shahnawaz/ AI Team Anvin"
 
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-LOG_FILE = os.getenv("LOG_FILE", "leavebot.log")
+_loaded = False
 
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
-MAX_TOKENS = int(os.getenv("MAX_TOKENS", "4096"))
 
-ENABLE_DOC_SEARCH = os.getenv("ENABLE_DOC_SEARCH", "True") == "True"
-ENABLE_API_FETCH = os.getenv("ENABLE_API_FETCH", "True") == "True"
+def _code_map(text):
+    """Parse "AL=21,SL=14" into {"AL": 21.0, "SL": 14.0}."""
+    result = {}
+    for item in (text or "").split(","):
+        code, sep, value = item.partition("=")
+        if sep and code.strip():
+            result[code.strip()] = float(value)
+    return result
 
-PROJECT_VERSION = "1.0.0"
-PROJECT_AUTHOR = "Shahnawaz/ AI Team Anvin"
+
+def _read_env():
+    """Read `.env` plus the process environment into a dict of settings."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    index_path = os.getenv("DOC_INDEX_PATH", default_index_path)
+    return {
+        "EMPLOYEE_DETAILS_API": os.getenv("EMPLOYEE_DETAILS_API", "http://localhost/api/EmployeeMasterApi/HrmGetEmployeeDetails/"),
+        "LEAVE_TYPE_API": os.getenv("LEAVE_TYPE_API", "http://localhost/api/LeaveApplicationApi/FillLeaveType"),
+        "LEAVE_HISTORY_API": os.getenv("LEAVE_HISTORY_API", "http://localhost/api/LeaveApplicationApi/HrmGetLeaveApplicationDetails"),
+        "LEAVE_SUMMARY_API": os.getenv("LEAVE_SUMMARY_API", "http://localhost/api/LeaveApplicationApi"),
+        # Direct reports of a manager; "{manager_id}" is replaced with the manager's Emp_ID_N.
+        "DIRECT_REPORTS_API": os.getenv(
+            "DIRECT_REPORTS_API",
+            "http://localhost/api/EmployeeMasterApi/HrmGetEmployeeDetails/?strReportingToID_N={manager_id}",
+        ),
+
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", ""),
+        "ERP_BEARER_TOKEN": os.getenv("ERP_BEARER_TOKEN", ""),
+
+        # Allow overriding the embeddings path via environment variable. Defaults
+        # to the ingested binary index when present, else the legacy JSON file.
+        "DOC_INDEX_PATH": index_path,
+        "DOC_EMBEDDINGS_PATH": os.getenv(
+            "DOC_EMBEDDINGS_PATH", index_path if os.path.exists(index_path) else default_doc_path
+        ),
+
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "INFO"),
+        "LOG_FILE": os.getenv("LOG_FILE", "leavebot.log"),
+
+        # Finished traces are written as OTLP/JSON lines to TRACE_EXPORT_PATH, or
+        # POSTed to an OTLP/HTTP collector when TRACE_EXPORT_ENDPOINT is set.
+        "TRACE_EXPORT_PATH": os.getenv("TRACE_EXPORT_PATH", ""),
+        "TRACE_EXPORT_ENDPOINT": os.getenv("TRACE_EXPORT_ENDPOINT", ""),
+
+        # Prometheus scrape endpoint (0 disables) and text exposition file.
+        "METRICS_PORT": int(os.getenv("METRICS_PORT", "0")),
+        "METRICS_EXPORT_PATH": os.getenv("METRICS_EXPORT_PATH", "leavebot_metrics.prom"),
+
+        # Set LEAVEBOT_PROFILE=True to profile every chat turn and tool call.
+        "PROFILE_ENABLED": os.getenv("LEAVEBOT_PROFILE", "False") == "True",
+        "PROFILE_DIR": os.getenv("LEAVEBOT_PROFILE_DIR", "profiles"),
+        "PROFILE_TOP_N": int(os.getenv("LEAVEBOT_PROFILE_TOP_N", "20")),
+
+        "OPENAI_MODEL": os.getenv("OPENAI_MODEL", "gpt-4o"),
+        "EMBEDDING_MODEL": os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
+        # Index build options: shortened text-embedding-3 vectors (0 = full size) and
+        # stored matrix precision ("none", "float16" or "int8").
+        "EMBEDDING_DIMENSIONS": int(os.getenv("EMBEDDING_DIMENSIONS", "0")),
+        "INDEX_QUANTIZATION": os.getenv("INDEX_QUANTIZATION", "none"),
+        "MAX_TOKENS": int(os.getenv("MAX_TOKENS", "4096")),
+
+        "ENABLE_DOC_SEARCH": os.getenv("ENABLE_DOC_SEARCH", "True") == "True",
+        "ENABLE_API_FETCH": os.getenv("ENABLE_API_FETCH", "True") == "True",
+
+        # Client-side request limits per minute (0 = unlimited).
+        "OPENAI_RPM": int(os.getenv("OPENAI_RPM", "0")),
+        "OPENAI_TPM": int(os.getenv("OPENAI_TPM", "0")),
+        "ERP_RPM": int(os.getenv("ERP_RPM", "0")),
+        # In-flight ERP requests; the cap shrinks when latency exceeds the target.
+        "ERP_MAX_CONCURRENCY": int(os.getenv("ERP_MAX_CONCURRENCY", "8")),
+        "ERP_TARGET_LATENCY_S": float(os.getenv("ERP_TARGET_LATENCY_S", "2.0")),
+        # Callers allowed to wait on a limiter before new ones are rejected.
+        "RATE_LIMIT_MAX_QUEUE": int(os.getenv("RATE_LIMIT_MAX_QUEUE", "64")),
+        "OPENAI_MAX_RETRIES": int(os.getenv("OPENAI_MAX_RETRIES", "3")),
+        "ERP_MAX_RETRIES": int(os.getenv("ERP_MAX_RETRIES", "2")),
+        # Default timeout for ERP calls that do not set their own.
+        "ERP_TIMEOUT_S": float(os.getenv("ERP_TIMEOUT_S", "15")),
+        # Circuit breaker per ERP endpoint: opens after N consecutive failures
+        # or slow calls, then probes again after the reset timeout.
+        "BREAKER_FAILURE_THRESHOLD": int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+        "BREAKER_SLOW_CALL_S": float(os.getenv("BREAKER_SLOW_CALL_S", "8")),
+        "BREAKER_RESET_TIMEOUT_S": float(os.getenv("BREAKER_RESET_TIMEOUT_S", "30")),
+
+        # Session snapshots: resumed without ERP calls while younger than the max age.
+        "SNAPSHOT_DB_PATH": os.getenv("SNAPSHOT_DB_PATH", os.path.join(BASE_DIR, "data", "snapshots.sqlite3")),
+        "SNAPSHOT_MAX_AGE_S": float(os.getenv("SNAPSHOT_MAX_AGE_S", "900")),
+
+        # Policy search: "hybrid" (BM25 + vectors), "vector" or "lexical". In hybrid
+        # mode a BM25 hit that beats the runner-up by this margin is returned
+        # without an embedding call (0 disables the fast path).
+        "POLICY_SEARCH_MODE": os.getenv("POLICY_SEARCH_MODE", "hybrid"),
+        "LEXICAL_FASTPATH_MARGIN": float(os.getenv("LEXICAL_FASTPATH_MARGIN", "1.5")),
+
+        # Team mode: employees per bulk leave-history request, and concurrent
+        # bulk/balance requests per team view.
+        "TEAM_BULK_SIZE": int(os.getenv("TEAM_BULK_SIZE", "50")),
+        "TEAM_MAX_CONCURRENCY": int(os.getenv("TEAM_MAX_CONCURRENCY", "4")),
+
+        # Inline a compact employee fact sheet into the system prompt so most data
+        # questions need one completion instead of a tool round trip.
+        "FACT_SHEET_ENABLED": os.getenv("FACT_SHEET_ENABLED", "False") == "True",
+        "FACT_SHEET_TOKEN_BUDGET": int(os.getenv("FACT_SHEET_TOKEN_BUDGET", "400")),
+
+        # Send only the tool schemas matching each question (full set when none match).
+        "TOOL_SELECTION_ENABLED": os.getenv("TOOL_SELECTION_ENABLED", "False") == "True",
+
+        # Start the likely tools alongside the first completion. At most
+        # SPECULATION_MAX_TOOLS per turn; a tool stops being speculated once
+        # SPECULATION_MIN_SAMPLES runs show a hit rate below SPECULATION_MIN_HIT_RATE.
+        "SPECULATION_ENABLED": os.getenv("SPECULATION_ENABLED", "False") == "True",
+        "SPECULATION_MAX_TOOLS": int(os.getenv("SPECULATION_MAX_TOOLS", "2")),
+        "SPECULATION_MIN_HIT_RATE": float(os.getenv("SPECULATION_MIN_HIT_RATE", "0.3")),
+        "SPECULATION_MIN_SAMPLES": int(os.getenv("SPECULATION_MIN_SAMPLES", "10")),
+
+        # Model cascade: OPENAI_SMALL_MODEL picks tools and phrases answers from
+        # data tools; OPENAI_MODEL handles policy questions and failed checks.
+        "CASCADE_ENABLED": os.getenv("CASCADE_ENABLED", "False") == "True",
+        "OPENAI_SMALL_MODEL": os.getenv("OPENAI_SMALL_MODEL", "gpt-4o-mini"),
+
+        # Per-turn time budget (0 disables). Every ERP, embedding and completion
+        # call in a turn gets at most the time left. Tools stop after
+        # MAX_TOOL_ROUNDS rounds or when less than DEADLINE_RESERVE_S remain, and
+        # the model answers from what it has.
+        "TURN_DEADLINE_S": float(os.getenv("TURN_DEADLINE_S", "8")),
+        "MAX_TOOL_ROUNDS": int(os.getenv("MAX_TOOL_ROUNDS", "4")),
+        "DEADLINE_RESERVE_S": float(os.getenv("DEADLINE_RESERVE_S", "2")),
+
+        # Local accrual model: days accrued per year by leave code, the most days
+        # carried over each anniversary, and how often (seconds) the model is
+        # checked against the ERP balance and reseeded when it drifts by more
+        # than ACCRUAL_DRIFT_TOLERANCE days.
+        "LEAVE_ACCRUAL_DAYS": _code_map(os.getenv("LEAVE_ACCRUAL_DAYS", "AL=21")),
+        "LEAVE_CARRY_FORWARD_MAX": _code_map(os.getenv("LEAVE_CARRY_FORWARD_MAX", "")),
+        "ACCRUAL_RECONCILE_S": float(os.getenv("ACCRUAL_RECONCILE_S", "21600")),
+        "ACCRUAL_DRIFT_TOLERANCE": float(os.getenv("ACCRUAL_DRIFT_TOLERANCE", "0.5")),
+
+        # Cache TTLs (seconds): employee profiles, leave types and teams, and
+        # leave history and balances. Leave-change events published to the
+        # shared INVALIDATION_DB_PATH log evict entries as soon as a worker's
+        # listener polls it (every INVALIDATION_POLL_S), so LEAVE_CACHE_TTL_S
+        # can be long when the listener is enabled. INVALIDATION_PORT serves
+        # POST /invalidate for publishers (0 disables).
+        "ERP_CACHE_TTL_S": float(os.getenv("ERP_CACHE_TTL_S", "3600")),
+        "LEAVE_CACHE_TTL_S": float(os.getenv("LEAVE_CACHE_TTL_S", "3600")),
+        "INVALIDATION_ENABLED": os.getenv("INVALIDATION_ENABLED", "False") == "True",
+        "INVALIDATION_DB_PATH": os.getenv(
+            "INVALIDATION_DB_PATH", os.path.join(BASE_DIR, "data", "cache_events.sqlite3")
+        ),
+        "INVALIDATION_POLL_S": float(os.getenv("INVALIDATION_POLL_S", "2")),
+        "INVALIDATION_PORT": int(os.getenv("INVALIDATION_PORT", "0")),
+
+        # Record ("record") or replay ("replay") every ERP and OpenAI exchange
+        # to/from the CASSETTE_PATH file; "off" talks to the services. On
+        # replay CASSETTE_SIMULATE_LATENCY sleeps for each recorded call time.
+        "CASSETTE_MODE": os.getenv("CASSETTE_MODE", "off"),
+        "CASSETTE_PATH": os.getenv("CASSETTE_PATH", os.path.join(BASE_DIR, "data", "cassette.jsonl")),
+        "CASSETTE_SIMULATE_LATENCY": os.getenv("CASSETTE_SIMULATE_LATENCY", "False") == "True",
+    }
+
+
+def load():
+    """Load the environment-backed settings now; later calls are no-ops."""
+    global _loaded
+    if not _loaded:
+        globals().update(_read_env())
+        _loaded = True
+
+
+def __getattr__(name):
+    # Environment-backed settings are read on first access, so importing
+    # the package does not parse `.env` or import python-dotenv.
+    if not _loaded:
+        load()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,240 @@
+# air_ticket_index.py
+"""
+Organisation-wide air-ticket eligibility.
+
+`air_ticket_info` answers for one employee. For HR travel planning ("who
+becomes eligible in the next 60 days") `eligibility_frame` computes the same
+fields for every employee in one pass: balances and ticket claims are laid
+out as two frames, and the first eligible leave type, the last claim and the
+next eligible date are found with pandas group-bys and date arithmetic.
+pandas is imported on first use.
+
+`AirTicketIndex` keeps the results sorted by next eligible date, so a date
+range is two bisects, and `update()` replaces one employee's entry when
+their history or balances change without recomputing the rest.
+"""
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+
+from .schema import LeaveBalance, LeaveRecord, parse_date, value_of
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=8192)
+def _cached_date(value):
+    """parse_date for raw ERP dicts, whose dates are strings repeated across employees."""
+    parsed = parse_date(value)
+    return parsed if isinstance(parsed, date) else None
+
+
+def _as_date(rec, key):
+    value = value_of(rec, key, _cached_date)
+    return value if isinstance(value, date) else None
+
+
+def _ticket_fields(bal):
+    """(air ticket flag, percent, anniversary) of one balance record."""
+    if isinstance(bal, LeaveBalance):
+        return str(bal.air_ticket if bal.air_ticket is not None else "0"), bal.air_ticket_percent, bal.anniversary
+    return str(bal.get("Airticket", "0")), bal.get("AirTicketPercent"), _as_date(bal, "Emp_AnnivDate_D")
+
+
+def _claim_date(rec):
+    """Travel (else start) date of a leave record that requested a ticket, or None for other records."""
+    if isinstance(rec, LeaveRecord):
+        if str(rec.air_ticket_requested if rec.air_ticket_requested is not None else "0") != "1":
+            return None
+        return rec.travel_date or rec.from_date
+    if str(rec.get("Ela_AirTicketReq_N", "0")) != "1":
+        return None
+    return _as_date(rec, "LeaveGrid_dtTravelDate") or _as_date(rec, "LeaveGrid_Ela_FromDate_D")
+
+
+def eligibility_frame(balances, histories, period_years=2):
+    """
+    Air-ticket eligibility of many employees at once.
+
+    Args:
+        balances (dict): {emp_id: {Lpd_ID_N: balance record}}.
+        histories (dict): {emp_id: [leave records]}.
+        period_years (int): Years between tickets, as in next_air_ticket_eligibility.
+
+    Returns:
+        DataFrame indexed by emp_id (every employee in `balances`) with
+        `eligible`, `percent`, `last_claim_date` and `next_eligible_date`
+        (datetime64; NaT when unknown).
+    """
+    import pandas as pd
+
+    # Read straight from the record slots: this loop is most of the work.
+    balance_rows = [
+        (emp_id, *_ticket_fields(bal))
+        for emp_id, by_type in balances.items()
+        for bal in (by_type or {}).values()
+        if bal
+    ]
+    claim_rows = [
+        (emp_id, claim)
+        for emp_id, records in histories.items()
+        for claim in map(_claim_date, records or ())
+        if claim is not None
+    ]
+
+    # First air-ticket leave type per employee, as air_ticket_info picks it.
+    types = pd.DataFrame.from_records(balance_rows, columns=["emp_id", "air_ticket", "percent", "anniversary"])
+    types = types[types["air_ticket"] == "1"].drop_duplicates("emp_id").set_index("emp_id")
+    claims = pd.DataFrame.from_records(claim_rows, columns=["emp_id", "claim_date"])
+    claims["claim_date"] = pd.to_datetime(claims["claim_date"], errors="coerce")
+
+    frame = pd.DataFrame(index=pd.Index(list(balances), name="emp_id", dtype="object"))
+    frame["eligible"] = frame.index.isin(types.index)
+    frame["percent"] = pd.to_numeric(types["percent"], errors="coerce").reindex(frame.index).fillna(0.0)
+    anniversary = pd.to_datetime(types["anniversary"], errors="coerce").reindex(frame.index)
+    frame["last_claim_date"] = claims.groupby("emp_id")["claim_date"].max().reindex(frame.index)
+    base = frame["last_claim_date"].fillna(anniversary)
+    # Without an anniversary air_ticket_info gives no next date, claim or not.
+    frame["next_eligible_date"] = (base + pd.Timedelta(days=period_years * 365)).where(anniversary.notna())
+    frame.loc[~frame["eligible"], ["last_claim_date", "next_eligible_date"]] = pd.NaT
+    return frame
+
+
+def employee_info(balances, history, period_years=2):
+    """
+    One employee's row of eligibility_frame as an air_ticket_info-style dict,
+    without pandas. Dates are parsed as in the batch (ISO datetimes included)
+    and returned as ISO dates, so `update()` agrees with `build()`.
+    """
+    fields = next((f for f in map(_ticket_fields, (b for b in (balances or {}).values() if b)) if f[0] == "1"), None)
+    if fields is None:
+        return {"eligible": False}
+    _, percent, anniversary = fields
+    try:
+        percent = float(percent)
+    except (TypeError, ValueError):
+        percent = 0.0
+    if math.isnan(percent):
+        percent = 0.0
+    claims = [claim for claim in map(_claim_date, history or ()) if claim is not None]
+    last_claim = max(claims) if claims else None
+    base = last_claim or anniversary
+    next_date = base + timedelta(days=period_years * 365) if anniversary else None
+    return {
+        "eligible": True,
+        "percent": percent,
+        "next_eligible_date": next_date.isoformat() if next_date else None,
+        "last_claim_date": last_claim.isoformat() if last_claim else None,
+    }
+
+
+def _frame_info(row):
+    if not row.eligible:
+        return {"eligible": False}
+    return {
+        "eligible": True,
+        "percent": float(row.percent),
+        "next_eligible_date": None if row.next_eligible_date is None else row.next_eligible_date.isoformat(),
+        "last_claim_date": None if row.last_claim_date is None else row.last_claim_date.isoformat(),
+    }
+
+
+class AirTicketIndex:
+    """
+    Air-ticket eligibility of every employee, sorted by next eligible date.
+
+    Build it with `AirTicketIndex.build(balances, histories)`; keep it current
+    with `update()` / `remove()` as employees' data changes.
+    """
+
+    def __init__(self):
+        self._info = {}  # emp_id -> air_ticket_info-style dict
+        self._ordinals = []  # next eligible dates, sorted
+        self._emp_ids = []  # parallel to _ordinals
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, balances, histories):
+        """Index every employee in `balances` (see eligibility_frame)."""
+        index = cls()
+        frame = eligibility_frame(balances, histories)
+        due = frame[frame["next_eligible_date"].notna()].sort_values("next_eligible_date", kind="stable")
+        index._ordinals = (
+            due["next_eligible_date"].values.astype("datetime64[D]").astype("int64") + _EPOCH_ORDINAL
+        ).tolist()
+        index._emp_ids = due.index.tolist()
+        for col in ("last_claim_date", "next_eligible_date"):
+            frame[col] = frame[col].dt.date.astype("object").where(frame[col].notna(), None)
+        index._info = {row.Index: _frame_info(row) for row in frame.itertuples()}
+        return index
+
+    def __len__(self):
+        return len(self._info)
+
+    def __contains__(self, emp_id):
+        return emp_id in self._info
+
+    def get(self, emp_id):
+        """air_ticket_info-style dict for `emp_id`, or None when not indexed."""
+        return self._info.get(emp_id)
+
+    def _unplace(self, emp_id):
+        info = self._info.get(emp_id)
+        next_date = info and info.get("next_eligible_date")
+        if not next_date:
+            return
+        ordinal = date.fromisoformat(next_date).toordinal()
+        lo, hi = bisect_left(self._ordinals, ordinal), bisect_right(self._ordinals, ordinal)
+        pos = lo + self._emp_ids[lo:hi].index(emp_id)
+        del self._ordinals[pos]
+        del self._emp_ids[pos]
+
+    def update(self, emp_id, balances, history):
+        """
+        Recompute one employee from their {Lpd_ID_N: balance} and leave history
+        (e.g. after a new application) and move their entry. Returns the new info.
+        """
+        info = employee_info(balances, history)
+        with self._lock:
+            self._unplace(emp_id)
+            self._info[emp_id] = info
+            if info.get("next_eligible_date"):
+                ordinal = date.fromisoformat(info["next_eligible_date"]).toordinal()
+                pos = bisect_right(self._ordinals, ordinal)
+                self._ordinals.insert(pos, ordinal)
+                self._emp_ids.insert(pos, emp_id)
+        return info
+
+    def remove(self, emp_id):
+        """Drop an employee (e.g. one who has left)."""
+        with self._lock:
+            self._unplace(emp_id)
+            self._info.pop(emp_id, None)
+
+    def eligible_between(self, start, end):
+        """
+        Employees whose next eligible date falls in [start, end], earliest first:
+        [{"emp_id", "next_eligible_date", "last_claim_date", "percent"}].
+        """
+        start, end = parse_date(start), parse_date(end)
+        with self._lock:
+            lo = bisect_left(self._ordinals, start.toordinal())
+            hi = bisect_right(self._ordinals, end.toordinal())
+            emp_ids = self._emp_ids[lo:hi]
+            infos = [self._info[emp_id] for emp_id in emp_ids]
+        return [
+            {
+                "emp_id": emp_id,
+                "next_eligible_date": info["next_eligible_date"],
+                "last_claim_date": info["last_claim_date"],
+                "percent": info["percent"],
+            }
+            for emp_id, info in zip(emp_ids, infos)
+        ]
+
+    def eligible_within(self, days, today=None):
+        """Employees becoming eligible from `today` through `days` days later."""
+        today = today or date.today()
+        return self.eligible_between(today, today + timedelta(days=days))
@@ -1,6 +1,7 @@
 # air_ticket_utils.py
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 def is_air_ticket_eligible(leave_balance):
     """Return True if this leave type grants air ticket eligibility."""
@@ -13,6 +14,11 @@ def get_air_ticket_percent(leave_balance):
     except (TypeError, ValueError):
         return 0.0
 
+@lru_cache(maxsize=4096)
+def _strptime(text, fmt):
+    """strptime is slow and the same anniversaries and claim dates come up again and again."""
+    return datetime.strptime(text, fmt)
+
 def next_air_ticket_eligibility(anniv_date, last_ticket_date=None, period_years=2):
     """
     Returns the next date when the employee will be eligible for air ticket.
@@ -21,13 +27,13 @@ def next_air_ticket_eligibility(anniv_date, last_ticket_date=None, period_years=
     if not anniv_date:
         return None
     try:
-        anniv = datetime.strptime(anniv_date, "%d-%b-%Y")
+        anniv = _strptime(anniv_date, "%d-%b-%Y")
     except (TypeError, ValueError):
         try:
-            anniv = datetime.strptime(anniv_date, "%Y-%m-%d")
+            anniv = _strptime(anniv_date, "%Y-%m-%d")
         except (TypeError, ValueError):
             return None
-    last = datetime.strptime(last_ticket_date, "%Y-%m-%d") if last_ticket_date else anniv
+    last = _strptime(last_ticket_date, "%Y-%m-%d") if last_ticket_date else anniv
     return (last + timedelta(days=period_years*365)).strftime("%Y-%m-%d")
 
 def has_claimed_air_ticket(leave_history, year=None):
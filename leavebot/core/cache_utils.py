@@ -1,7 +1,74 @@
-from cachetools import TTLCache
+import threading
+import time
 
-# Simple in-memory caches for API responses. TTL defaults to 1 hour.
-EMPLOYEE_CACHE = TTLCache(maxsize=64, ttl=3600)
-LEAVE_TYPES_CACHE = TTLCache(maxsize=64, ttl=3600)
-LEAVE_HISTORY_CACHE = TTLCache(maxsize=64, ttl=3600)
-LEAVE_BALANCE_CACHE = TTLCache(maxsize=256, ttl=3600)
+from cachetools import LRUCache, TLRUCache, TTLCache
+
+from leavebot.config import settings
+
+
+def _ttl_from(setting):
+    """Expiry function for TLRUCache that reads its TTL from `setting` when an entry is stored."""
+    def ttu(_key, _value, now):
+        return now + getattr(settings, setting)
+    return ttu
+
+
+# Simple in-memory caches for API responses. TTLs come from ERP_CACHE_TTL_S
+# and LEAVE_CACHE_TTL_S (1 hour by default); with the invalidation listener
+# running (see invalidation.py) leave entries are evicted when they change,
+# so LEAVE_CACHE_TTL_S can be much longer.
+# Employee and history entries are compact schema records, so team views
+# can keep a whole department cached.
+EMPLOYEE_CACHE = TLRUCache(maxsize=1024, ttu=_ttl_from("ERP_CACHE_TTL_S"))
+LEAVE_TYPES_CACHE = TLRUCache(maxsize=256, ttu=_ttl_from("ERP_CACHE_TTL_S"))
+LEAVE_HISTORY_CACHE = TLRUCache(maxsize=1024, ttu=_ttl_from("LEAVE_CACHE_TTL_S"))
+LEAVE_BALANCE_CACHE = TLRUCache(maxsize=2048, ttu=_ttl_from("LEAVE_CACHE_TTL_S"))
+# Report histories from the bulk team fetch, keyed by Emp_ID_N. Their leave
+# codes come from the manager's leave types, so they are kept apart from
+# LEAVE_HISTORY_CACHE, which each employee's own session reads.
+TEAM_HISTORY_CACHE = TLRUCache(maxsize=1024, ttu=_ttl_from("LEAVE_CACHE_TTL_S"))
+# Direct reports per manager Emp_ID_N.
+TEAM_CACHE = TLRUCache(maxsize=256, ttu=_ttl_from("ERP_CACHE_TTL_S"))
+# Query embeddings keyed by (model, query text).
+EMBEDDING_CACHE = TTLCache(maxsize=512, ttl=3600)
+
+# Last successful payload per (source, key). Unlike the TTL caches it never
+# expires, so it can still be served (flagged as stale) while the ERP is down.
+LAST_KNOWN_CACHE = LRUCache(maxsize=1024)
+_last_known_lock = threading.Lock()
+_stale_notes = threading.local()
+
+
+def remember_last_known(source, key, data):
+    with _last_known_lock:
+        LAST_KNOWN_CACHE[(source, key)] = (time.time(), data)
+
+
+def recall_last_known(source, key):
+    """Return (saved_at_epoch, data) for the last good payload, or None."""
+    with _last_known_lock:
+        return LAST_KNOWN_CACHE.get((source, key))
+
+
+def forget_last_known(match):
+    """Drop the last-known copies whose (source, key) satisfies `match`; returns how many."""
+    with _last_known_lock:
+        keys = [entry for entry in LAST_KNOWN_CACHE if match(*entry)]
+        for entry in keys:
+            LAST_KNOWN_CACHE.pop(entry, None)
+    return len(keys)
+
+
+def note_stale(source, saved_at):
+    """Record on this thread that `source` was answered from last-known data."""
+    notes = getattr(_stale_notes, "items", None)
+    if notes is None:
+        notes = _stale_notes.items = {}
+    notes[source] = min(saved_at, notes.get(source, saved_at))
+
+
+def pop_stale_notes():
+    """Return and clear this thread's {source: oldest saved_at} staleness notes."""
+    notes = getattr(_stale_notes, "items", None) or {}
+    _stale_notes.items = {}
+    return notes
@@ -0,0 +1,275 @@
+# cassette.py
+"""
+Record and replay of ERP and OpenAI traffic.
+
+In record mode every `erp_request`, chat completion and embedding call is
+appended to a cassette, a JSONL file with one exchange per line: the kind
+("erp", "chat" or "embedding"), the request, the decoded response or the
+error raised, and the seconds the call took (retries and rate limiting
+included). In replay mode the same calls are answered from the cassette
+without touching the network or the limiters, optionally sleeping for the
+recorded latency. Replaying a recorded batch run measures only the local
+work (tool selection, leave_utils, prompt building, serialization), so the
+numbers are stable enough to compare between commits.
+
+Exchanges are matched by a hash of the request. Repeated identical
+requests are served in recorded order, the last one again once they run
+out. A request that was never recorded (e.g. a prompt changed since the
+recording) gets the next unused exchange of its kind, or raises
+CassetteMiss with `strict`.
+
+Enable it for a block with `use_cassette(path, "record")`, or for the whole
+process with CASSETTE_MODE / CASSETTE_PATH / CASSETTE_SIMULATE_LATENCY.
+"""
+import hashlib
+import importlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from leavebot.config import settings
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """A strict replay was asked for a request the cassette does not hold."""
+
+
+class RecordedError(RuntimeError):
+    """Stands in for a recorded error whose class cannot be rebuilt on replay."""
+
+
+class Replayed(dict):
+    """A recorded response object: a dict whose keys also read as attributes."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def model_dump(self, **kwargs):
+        return _plain(self)
+
+
+def _wrap(value):
+    if isinstance(value, dict):
+        return Replayed((k, _wrap(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_wrap(v) for v in value]
+    return value
+
+
+def _plain(value):
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _jsonable(value):
+    """JSON default for SDK objects (pydantic models, namespaces)."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def request_key(kind, request):
+    """Hash of a request, independent of dict key order."""
+    text = json.dumps([kind, request], sort_keys=True, default=_jsonable, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _describe_error(exc):
+    response = getattr(exc, "response", None)
+    return {
+        "type": f"{type(exc).__module__}.{type(exc).__qualname__}",
+        "message": str(exc),
+        "status_code": getattr(response, "status_code", None),
+    }
+
+
+def _rebuild_error(error):
+    """The recorded exception, rebuilt from its class name so callers' except clauses still match."""
+    module, _, name = error["type"].rpartition(".")
+    try:
+        cls = getattr(importlib.import_module(module), name)
+    except (ImportError, AttributeError, ValueError):
+        cls = None
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        return RecordedError(f"{error['type']}: {error['message']}")
+    try:
+        exc = cls(error["message"])
+    except Exception:
+        # Constructors that need more than a message (SDK errors, CircuitOpenError).
+        exc = cls.__new__(cls)
+        Exception.__init__(exc, error["message"])
+    if error.get("status_code") is not None and hasattr(exc, "response"):
+        import requests
+
+        # raise_for_status errors carry the response; classify_erp_error reads its status.
+        exc.response = requests.Response()
+        exc.response.status_code = error["status_code"]
+    return exc
+
+
+class Cassette:
+    """
+    One cassette file, opened for recording (truncated) or replay.
+
+    Args:
+        path (str): JSONL cassette file.
+        mode (str): "record" or "replay".
+        simulate_latency (bool): On replay, sleep for each exchange's recorded time.
+        strict (bool): On replay, raise CassetteMiss for unrecorded requests.
+    """
+
+    def __init__(self, path, mode, simulate_latency=False, strict=False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.strict = strict
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if mode == "record":
+            self._file = open(path, "w", encoding="utf-8")
+            return
+        self._by_key = defaultdict(deque)  # key -> exchanges not yet served
+        self._last = {}  # key -> last exchange served
+        self._by_kind = defaultdict(deque)  # kind -> exchanges in recorded order, for misses
+        self._used = set()
+        with open(path, "r", encoding="utf-8") as f:
+            for seq, line in enumerate(f):
+                if line.strip():
+                    entry = json.loads(line)
+                    entry["seq"] = seq
+                    self._by_key[entry["key"]].append(entry)
+                    self._by_kind[entry["kind"]].append(entry)
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, kind, request, send):
+        """Run `send()`, append the exchange and return its result (or re-raise its error)."""
+        entry = {"kind": kind, "key": request_key(kind, request), "request": request}
+        start = time.perf_counter()
+        try:
+            result = send()
+        except Exception as e:
+            entry["error"] = _describe_error(e)
+            raise
+        else:
+            entry["response"] = result
+            return result
+        finally:
+            entry["latency_s"] = round(time.perf_counter() - start, 6)
+            line = json.dumps(entry, default=_jsonable, ensure_ascii=False)
+            with self._lock:
+                self._file.write(line + "\n")
+                self._file.flush()
+                self.recorded += 1
+
+    def _next(self, kind, key):
+        with self._lock:
+            pending = self._by_key.get(key)
+            if pending:
+                entry = pending.popleft()
+            elif key in self._last:
+                entry = self._last[key]
+            else:
+                self.misses += 1
+                if self.strict:
+                    raise CassetteMiss(f"No recorded {kind} exchange for request {key[:12]}")
+                queue = self._by_kind[kind]
+                while queue and queue[0]["seq"] in self._used:
+                    queue.popleft()
+                if not queue:
+                    raise CassetteMiss(f"No {kind} exchanges left in {self.path}")
+                entry = queue.popleft()
+                self._by_key[entry["key"]].remove(entry)
+                self._last.setdefault(entry["key"], entry)
+                logger.warning("Cassette miss for %s request; replaying recorded exchange #%d", kind, entry["seq"])
+            self._used.add(entry["seq"])
+            self._last[key] = entry
+            self.replayed += 1
+        return entry
+
+    def replay(self, kind, request):
+        """The recorded response to `request` (attribute-readable), or raise its recorded error."""
+        entry = self._next(kind, request_key(kind, request))
+        if self.simulate_latency:
+            time.sleep(entry["latency_s"])
+        if "error" in entry:
+            raise _rebuild_error(entry["error"])
+        return _wrap(entry["response"])
+
+    def exchange(self, kind, request, send):
+        """Record `send()` or replay it, according to the mode."""
+        if self.replaying:
+            return self.replay(kind, request)
+        return self.record(kind, request, send)
+
+
+_active = None
+_configured = False
+_active_lock = threading.Lock()
+
+
+def active():
+    """The cassette in use, or None. CASSETTE_MODE is read on first call."""
+    global _active, _configured
+    if not _configured:
+        with _active_lock:
+            if not _configured:
+                mode = settings.CASSETTE_MODE
+                if mode not in MODES:
+                    raise ValueError(f"Unknown CASSETTE_MODE {mode!r}; expected one of {MODES}")
+                if mode != "off" and _active is None:
+                    _active = Cassette(settings.CASSETTE_PATH, mode, settings.CASSETTE_SIMULATE_LATENCY)
+                    logger.info("Cassette %s: %s", mode, settings.CASSETTE_PATH)
+                _configured = True
+    return _active
+
+
+def exchange(kind, request, send):
+    """`send()` through the active cassette, or just `send()` without one."""
+    cassette = active()
+    if cassette is None:
+        return send()
+    return cassette.exchange(kind, request, send)
+
+
+@contextmanager
+def use_cassette(path, mode="replay", simulate_latency=False, strict=False):
+    """Record or replay all ERP and OpenAI calls made inside the block; yields the Cassette."""
+    global _active, _configured
+    cassette = Cassette(path, mode, simulate_latency, strict)
+    with _active_lock:
+        previous, was_configured = _active, _configured
+        _active, _configured = cassette, True
+    try:
+        yield cassette
+    finally:
+        with _active_lock:
+            _active, _configured = previous, was_configured
+        cassette.close()
@@ -0,0 +1,129 @@
+# circuit_breaker.py
+"""
+Per-endpoint circuit breakers for the ERP.
+
+closed    -> calls flow; consecutive failures (errors or calls slower than
+             `slow_call_threshold`) are counted.
+open      -> after `failure_threshold` of them, calls fail immediately with
+             CircuitOpenError for `reset_timeout` seconds.
+half_open -> then up to `half_open_max_calls` probe calls are let through;
+             a success closes the breaker, a failure re-opens it.
+"""
+import threading
+import time
+
+from leavebot.config import settings
+from .metrics import REGISTRY
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = REGISTRY.gauge(
+    "leavebot_circuit_state", "Circuit state (0 closed, 1 half-open, 2 open).", ("endpoint",))
+BREAKER_REJECTIONS = REGISTRY.counter(
+    "leavebot_circuit_rejections_total", "Calls rejected by an open circuit.", ("endpoint",))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"ERP endpoint '{endpoint}' is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, slow_call_threshold=5.0, reset_timeout=30.0,
+                 half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, endpoint=name)
+
+    def _set_state(self, state):
+        self.state = state
+        BREAKER_STATE.set(_STATE_VALUES[state], endpoint=self.name)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed now."""
+        with self._lock:
+            if self.state == OPEN:
+                waited = time.monotonic() - self.opened_at
+                if waited < self.reset_timeout:
+                    BREAKER_REJECTIONS.inc(endpoint=self.name)
+                    raise CircuitOpenError(self.name, self.reset_timeout - waited)
+                self._set_state(HALF_OPEN)
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    BREAKER_REJECTIONS.inc(endpoint=self.name)
+                    raise CircuitOpenError(self.name, 0)
+                self._probes += 1
+
+    def release(self):
+        """
+        End a call admitted by `before_call` that says nothing about the
+        endpoint's health (e.g. rejected by a local limiter or cut short by the
+        turn deadline), so a half-open probe slot is not held forever.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self, latency=None):
+        if latency is not None and latency > self.slow_call_threshold:
+            self.record_failure()
+            return
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    @property
+    def is_open(self):
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Return the shared breaker for endpoint `name`, creating it from settings."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+                    slow_call_threshold=settings.BREAKER_SLOW_CALL_S,
+                    reset_timeout=settings.BREAKER_RESET_TIMEOUT_S,
+                )
+    return breaker
+
+
+def open_endpoints():
+    """Names of endpoints whose circuit is currently open."""
+    return sorted(name for name, b in _breakers.items() if b.is_open)
+
+
+def reset_breakers():
+    with _lock:
+        _breakers.clear()
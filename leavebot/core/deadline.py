@@ -0,0 +1,62 @@
+# deadline.py
+"""
+Per-turn deadlines.
+
+A chat turn runs inside `deadline_scope(seconds)`. Every ERP request,
+embedding call and completion made on that thread asks `timeout_for()` for
+its timeout, which is the smaller of its own timeout and the time left, and
+raises DeadlineExceeded once the time is up. Worker threads started for the
+turn carry the deadline over with `deadline_scope(at=current())`.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of starting a call after the turn's deadline has passed."""
+
+
+def current():
+    """Monotonic time at which this thread's deadline expires, or None."""
+    return getattr(_local, "at", None)
+
+
+@contextmanager
+def deadline_scope(seconds=None, at=None):
+    """
+    Run a block with a deadline `seconds` from now (or at monotonic time `at`).
+    A deadline already in force is only ever shortened. With neither argument
+    (or seconds <= 0) the enclosing deadline, if any, is kept.
+    """
+    previous = current()
+    if seconds is not None and seconds > 0:
+        at = time.monotonic() + seconds if at is None else min(at, time.monotonic() + seconds)
+    if previous is not None:
+        at = previous if at is None else min(at, previous)
+    _local.at = at
+    try:
+        yield at
+    finally:
+        _local.at = previous
+
+
+def remaining():
+    """Seconds left before this thread's deadline (may be negative), or None without one."""
+    at = current()
+    return None if at is None else at - time.monotonic()
+
+
+def timeout_for(timeout=None):
+    """
+    Timeout to use for a call: `timeout` capped at the time left. Returns
+    `timeout` unchanged without a deadline; raises DeadlineExceeded when none is left.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("turn deadline exceeded")
+    return left if timeout is None else min(timeout, left)
@@ -1,20 +1,16 @@
 # Helper functions for employee data
 
-from datetime import datetime
+from datetime import date, datetime
+
+from .schema import parse_date, value_of
 
 def years_of_service(emp_data):
     """Returns integer years of service for an employee (by DOJ)."""
     emp = emp_data[0] if isinstance(emp_data, list) else emp_data
-    doj_str = emp.get("Emp_DOJ_D") or emp.get("Emp_ESBDate_D")
-    if not doj_str:
+    doj = value_of(emp, "Emp_DOJ_D", parse_date) or value_of(emp, "Emp_ESBDate_D", parse_date)
+    if not isinstance(doj, date):
         return 0
-    for fmt in ("%d-%b-%Y", "%Y-%m-%d"):
-        try:
-            doj = datetime.strptime(doj_str, fmt)
-            return (datetime.today() - doj).days // 365
-        except Exception:
-            continue
-    return 0
+    return (date.today() - doj).days // 365
 
 def is_manager(emp_data):
     """Return True if employee manages others based on Emp_EmployeeReportsDesc_V."""
@@ -67,15 +63,9 @@ def get_nationality(emp_data):
 def is_probation_completed(emp_data):
     """Check if employee's probation is completed (compare today to Emp_ProbationEndDate_D)."""
     emp = emp_data[0] if isinstance(emp_data, list) else emp_data
-    end = emp.get("Emp_ProbationEndDate_D")
-    if not end:
+    end_date = value_of(emp, "Emp_ProbationEndDate_D", parse_date)
+    if not isinstance(end_date, date):
         return True
-    for fmt in ("%d-%b-%Y", "%Y-%m-%d"):
-        try:
-            end_date = datetime.strptime(end, fmt)
-            return datetime.today() > end_date
-        except Exception:
-            continue
-    return True
+    return datetime.today() > datetime.combine(end_date, datetime.min.time())
 
 # Add further employee inference/calculation utilities as required.
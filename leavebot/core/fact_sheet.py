@@ -0,0 +1,51 @@
+# fact_sheet.py
+"""
+Compact employee fact sheet for the system prompt.
+
+When the sheet is inlined, the model can answer most data questions in one
+completion instead of a tool call plus a follow-up call. Sections are added
+in priority order and each is cut to the items that fit, so the sheet stays
+within a token budget.
+"""
+from .llm_client import estimate_tokens
+
+FACT_SHEET_HEADER = (
+    "Employee facts loaded from the HR system for this session. Answer from these "
+    "facts when they cover the question; call a tool for anything they do not cover."
+)
+
+
+def _tokens(text):
+    return estimate_tokens([{"content": text}]) + 1
+
+
+def _render(title, items):
+    return f"{title}: " + "; ".join(items)
+
+
+def build_fact_sheet(sections, budget):
+    """
+    Render `sections`, a list of (title, [item, ...]) in priority order, as
+    one line per section. The total stays within about `budget` tokens.
+    Returns "" when nothing fits.
+    """
+    lines = []
+    used = _tokens(FACT_SHEET_HEADER)
+    for title, items in sections:
+        kept = []
+        for item in items:
+            if used + _tokens(_render(title, kept + [item])) > budget:
+                break
+            kept.append(item)
+        if kept:
+            line = _render(title, kept)
+            lines.append(line)
+            used += _tokens(line)
+    if not lines:
+        return ""
+    return "\n".join([FACT_SHEET_HEADER] + lines)
+
+
+def format_days(value):
+    """12.0 -> '12', 2.5 -> '2.5'; non-numbers are returned as text."""
+    return f"{value:g}" if isinstance(value, (int, float)) else str(value)
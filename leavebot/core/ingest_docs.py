@@ -0,0 +1,241 @@
+# ingest_docs.py
+"""
+Build the policy search index from the documents in data/raw.
+
+Documents are read in blocks and split into overlapping chunks without
+loading whole files. Chunks are embedded in large batches on a thread pool.
+Each batch goes through llm_client, which applies the rate limits and retries.
+A chunk whose sha256 (of model and text) is already in the existing index
+reuses that vector, so re-running after a policy edit only embeds what
+changed. The result is written atomically as a binary `.npz` index that
+search_embeddings.load_index reads directly. With `--quantize float16|int8`
+the index holds the quantized matrix, and the float32 rows used for
+re-ranking go to a `<index>.f32.npy` sidecar.
+
+    python -m leavebot.core.ingest_docs [--raw-dir data/raw] [--output data/policy_index.npz]
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from leavebot.config import settings
+from .llm_client import create_embeddings
+from .log_utils import configure_logging, get_logger
+from .quantization import QUANTIZATIONS, normalize_rows, quantize
+from .tracing import span
+
+logger = get_logger(__name__)
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf")
+READ_BLOCK_CHARS = 64 * 1024
+
+
+def iter_documents(raw_dir):
+    """Yield (source, blocks) for every supported file under `raw_dir`, in path order."""
+    for root, dirs, files in os.walk(raw_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, raw_dir), read_blocks(path)
+
+
+def read_blocks(path):
+    """Yield the text of `path` in blocks of about READ_BLOCK_CHARS."""
+    if path.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            logger.warning("Skipping %s: install pypdf to ingest PDF files", path)
+            return
+        for page in PdfReader(path).pages:
+            yield (page.extract_text() or "") + "\n"
+        return
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for block in iter(lambda: f.read(READ_BLOCK_CHARS), ""):
+            yield block
+
+
+def chunk_text(blocks, chunk_size=1200, overlap=200):
+    """
+    Split a stream of text blocks into chunks of at most `chunk_size`
+    characters. Each chunk starts with roughly the last `overlap` characters
+    of the previous one. Cuts fall on whitespace where possible.
+    """
+    if overlap >= chunk_size // 2:
+        raise ValueError("overlap must be less than half of chunk_size")
+    buffer = ""
+    carried = 0
+    for block in blocks:
+        buffer += block
+        while len(buffer) >= chunk_size:
+            cut = buffer.rfind(" ", chunk_size // 2, chunk_size)
+            if cut <= 0:
+                cut = chunk_size
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            start = buffer.find(" ", cut - overlap, cut)
+            start = cut if start < 0 else start + 1
+            buffer = buffer[start:]
+            carried = len(buffer)
+    tail = buffer.strip()
+    if tail and len(buffer) > carried:
+        yield tail
+
+
+def chunk_hash(model, text, dimensions=None):
+    if dimensions:
+        model = f"{model}@{dimensions}"
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def sidecar_path(path):
+    """Float32 rows of a quantized index, kept next to it for re-ranking."""
+    return f"{path}.f32.npy"
+
+
+def load_existing(path):
+    """Return {chunk_hash: vector} from an existing .npz index, or {} if there is none."""
+    import numpy as np
+
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as data:
+        if "hashes" not in data:
+            return {}
+        hashes = data["hashes"].tolist()
+        if "embeddings" in data:
+            return dict(zip(hashes, data["embeddings"]))
+    if os.path.exists(sidecar_path(path)):
+        return dict(zip(hashes, np.load(sidecar_path(path))))
+    return {}
+
+
+def embed_missing(texts, model, batch_size=256, workers=4, dimensions=None):
+    """Embed `texts` in batches of `batch_size` on `workers` threads; returns vectors in order."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    vectors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch_vectors in pool.map(lambda batch: create_embeddings(batch, model, dimensions), batches):
+            vectors.extend(batch_vectors)
+    return vectors
+
+
+def write_index(path, texts, sources, hashes, matrix, model, dimensions=None, quantization="none"):
+    """Write the binary index (and float32 sidecar when quantized) atomically."""
+    import numpy as np
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    arrays = {}
+    if quantization == "none":
+        arrays["embeddings"] = matrix
+    else:
+        matrix = normalize_rows(matrix)
+        arrays["codes"], scales = quantize(matrix, quantization)
+        if scales is not None:
+            arrays["scales"] = scales
+        tmp_sidecar = f"{sidecar_path(path)}.tmp.npy"
+        np.save(tmp_sidecar, matrix)
+        os.replace(tmp_sidecar, sidecar_path(path))
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        texts=np.array(texts, dtype=str),
+        sources=np.array(sources, dtype=str),
+        hashes=np.array(hashes, dtype=str),
+        model=np.array(model),
+        dimensions=np.array(dimensions or 0),
+        quantization=np.array(quantization),
+        **arrays,
+    )
+    os.replace(tmp_path, path)
+
+
+def ingest(raw_dir=None, output=None, model=None, chunk_size=1200, overlap=200, batch_size=256, workers=4,
+           dimensions=None, quantization=None):
+    """
+    Chunk, embed and index every document under `raw_dir`.
+
+    Returns:
+        dict: documents, chunks, embedded and reused counts, and elapsed seconds.
+    """
+    import numpy as np
+
+    raw_dir = raw_dir or os.path.join(settings.BASE_DIR, settings.RAW_DATA_PATH)
+    output = output or settings.DOC_INDEX_PATH
+    model = model or settings.EMBEDDING_MODEL
+    dimensions = settings.EMBEDDING_DIMENSIONS if dimensions is None else dimensions
+    quantization = quantization or settings.INDEX_QUANTIZATION
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+    start = time.perf_counter()
+    with span("ingest.run", raw_dir=raw_dir, model=model) as sp:
+        texts, sources, hashes = [], [], []
+        documents = 0
+        for source, blocks in iter_documents(raw_dir):
+            documents += 1
+            for chunk in chunk_text(blocks, chunk_size, overlap):
+                texts.append(chunk)
+                sources.append(source)
+                hashes.append(chunk_hash(model, chunk, dimensions))
+
+        existing = load_existing(output)
+        missing = sorted({h: i for i, h in enumerate(hashes) if h not in existing}.values())
+        if missing:
+            vectors = embed_missing([texts[i] for i in missing], model, batch_size, workers, dimensions)
+            existing.update(zip((hashes[i] for i in missing), vectors))
+
+        matrix = np.array([existing[h] for h in hashes], dtype=np.float32)
+        if not hashes:
+            matrix = matrix.reshape(0, 0)
+        write_index(output, texts, sources, hashes, matrix, model, dimensions, quantization)
+        stats = {
+            "documents": documents,
+            "chunks": len(texts),
+            "embedded": len(missing),
+            "reused": len(texts) - len(missing),
+            "seconds": time.perf_counter() - start,
+        }
+        for key, value in stats.items():
+            sp.set_attribute(f"ingest.{key}", value)
+    logger.info(
+        "Indexed %d chunks from %d documents into %s (%d embedded, %d reused) in %.1fs",
+        stats["chunks"], documents, output, stats["embedded"], stats["reused"], stats["seconds"],
+    )
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the LeaveBot policy search index.")
+    parser.add_argument("--raw-dir", default=None, help="Directory of policy documents (default: data/raw)")
+    parser.add_argument("--output", default=None, help="Index file to write (default: DOC_INDEX_PATH)")
+    parser.add_argument("--model", default=None, help="Embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--chunk-size", type=int, default=1200, help="Maximum characters per chunk")
+    parser.add_argument("--overlap", type=int, default=200, help="Characters shared by consecutive chunks")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per embeddings request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent embeddings requests")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="Shortened embedding size for text-embedding-3 models (default: EMBEDDING_DIMENSIONS)")
+    parser.add_argument("--quantize", choices=QUANTIZATIONS, default=None,
+                        help="Stored matrix precision (default: INDEX_QUANTIZATION)")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    stats = ingest(
+        args.raw_dir, args.output, args.model, args.chunk_size, args.overlap, args.batch_size, args.workers,
+        args.dimensions, args.quantize,
+    )
+    print(
+        f"{stats['chunks']} chunks from {stats['documents']} documents: "
+        f"{stats['embedded']} embedded, {stats['reused']} unchanged ({stats['seconds']:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# invalidation.py
+"""
+Event-driven cache invalidation.
+
+A publisher, such as the ERP integration via `POST /invalidate`, or
+`python -m leavebot.core.invalidation publish <emp_id>`, appends "employee
+X's leave changed" events to a SQLite event log shared by every LeaveBot
+process (INVALIDATION_DB_PATH). Each process runs one listener thread that
+reads new events every INVALIDATION_POLL_S. For each event it evicts that
+employee's entries from the TTL caches and the last-known copies, and bumps
+the employee's version. ChatEngine compares that version at the start of
+each turn and reloads the datasets that changed. Restored session
+snapshots are compared with the time of the employee's last event.
+
+Event kinds:
+    leave     leave history and balances (after an application, approval, ...)
+    employee  employee profile and leave types
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from leavebot.config import settings
+from .cache_utils import (
+    EMPLOYEE_CACHE,
+    LEAVE_BALANCE_CACHE,
+    LEAVE_HISTORY_CACHE,
+    LEAVE_TYPES_CACHE,
+    TEAM_HISTORY_CACHE,
+    forget_last_known,
+)
+from .log_utils import get_logger, log_event
+from .metrics import CACHE_INVALIDATIONS
+
+logger = get_logger(__name__)
+
+EVENT_KINDS = ("leave", "employee")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_events (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    emp_id       INTEGER NOT NULL,
+    kind         TEXT    NOT NULL,
+    published_at REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_events_published_at ON cache_events (published_at);
+"""
+
+# How often a listener deletes events older than its backfill window.
+PURGE_INTERVAL_S = 3600
+
+
+def _emp_key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class EventLog:
+    """Append-only log of invalidation events in SQLite, shared between processes."""
+
+    def __init__(self, path=None):
+        self.path = path or settings.INVALIDATION_DB_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not shareable by default.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+        return conn
+
+    def publish(self, emp_id, kind="leave"):
+        """Append one event; returns its id."""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind {kind!r}; expected one of {EVENT_KINDS}")
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO cache_events (emp_id, kind, published_at) VALUES (?, ?, ?)",
+                (_emp_key(emp_id), kind, time.time()),
+            )
+        return cur.lastrowid
+
+    def last_id(self):
+        row = self._connect().execute("SELECT MAX(id) FROM cache_events").fetchone()
+        return row[0] or 0
+
+    def after(self, last_id, limit=500):
+        """Events with id > `last_id`, oldest first: [(id, emp_id, kind, published_at)]."""
+        return self._connect().execute(
+            "SELECT id, emp_id, kind, published_at FROM cache_events WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, limit),
+        ).fetchall()
+
+    def since(self, published_after):
+        """[(emp_id, kind, latest published_at)] for events newer than `published_after` (epoch seconds)."""
+        return self._connect().execute(
+            "SELECT emp_id, kind, MAX(published_at) FROM cache_events WHERE published_at > ? GROUP BY emp_id, kind",
+            (published_after,),
+        ).fetchall()
+
+    def purge(self, older_than):
+        """Delete events published more than `older_than` seconds ago."""
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM cache_events WHERE published_at < ?", (time.time() - older_than,))
+        return cur.rowcount
+
+
+# {emp_id: {kind: (version, latest published_at)}} for events this process has applied.
+_applied = {}
+_applied_lock = threading.Lock()
+
+
+def version(emp_id, kind="leave"):
+    """How many `kind` events for `emp_id` this process has applied."""
+    return _applied.get(_emp_key(emp_id), {}).get(kind, (0, 0.0))[0]
+
+
+def invalidated_since(emp_id, saved_at, kind="leave"):
+    """True when a `kind` event for `emp_id` was published after `saved_at` (epoch seconds)."""
+    return _applied.get(_emp_key(emp_id), {}).get(kind, (0, 0.0))[1] > saved_at
+
+
+def _record(emp_id, kind, published_at, bump=True):
+    with _applied_lock:
+        kinds = _applied.setdefault(emp_id, {})
+        count, latest = kinds.get(kind, (0, 0.0))
+        kinds[kind] = (count + bump, max(latest, published_at))
+
+
+def _evict(cache, match):
+    keys = [key for key in list(cache) if match(key)]
+    for key in keys:
+        cache.pop(key, None)
+    return len(keys)
+
+
+def evict_employee(emp_id, kind="leave", published_at=None):
+    """
+    Drop `emp_id`'s cached `kind` data from this process and bump its version.
+    Returns the number of entries evicted.
+    """
+    emp_id = _emp_key(emp_id)
+    if kind == "leave":
+        caches = {
+            "leave_history": LEAVE_HISTORY_CACHE,
+            "leave_balance": LEAVE_BALANCE_CACHE,
+            "team_history": TEAM_HISTORY_CACHE,
+        }
+    else:
+        caches = {"employee": EMPLOYEE_CACHE, "leave_types": LEAVE_TYPES_CACHE}
+
+    def owned(key):
+        return (key[0] if isinstance(key, tuple) else key) == emp_id
+
+    evicted = sum(_evict(cache, owned) for cache in caches.values())
+    # The last-known copies would otherwise be served during the next outage.
+    evicted += forget_last_known(lambda source, key: source in caches and owned(key))
+    _record(emp_id, kind, time.time() if published_at is None else published_at)
+    CACHE_INVALIDATIONS.inc(kind=kind)
+    return evicted
+
+
+class InvalidationListener:
+    """Applies new events from an EventLog to this process's caches."""
+
+    def __init__(self, log, interval=None, backfill=None):
+        self.log = log
+        self.interval = settings.INVALIDATION_POLL_S if interval is None else interval
+        self.last_id = log.last_id()
+        # Events from before this process started still matter for snapshots
+        # saved before them; nothing was cached then, so only their times are kept.
+        self.backfill = settings.SNAPSHOT_MAX_AGE_S if backfill is None else backfill
+        for emp_id, kind, published_at in log.since(time.time() - self.backfill):
+            _record(_emp_key(emp_id), kind, published_at, bump=False)
+        self._purged_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Apply every event published since the last poll; returns how many were applied."""
+        applied = 0
+        while True:
+            events = self.log.after(self.last_id)
+            if not events:
+                return applied
+            for event_id, emp_id, kind, published_at in events:
+                evicted = evict_employee(emp_id, kind, published_at)
+                log_event(logger, "cache.invalidated", emp_id=emp_id, kind=kind, evicted=evicted,
+                          lag_s=round(time.time() - published_at, 3))
+                self.last_id = event_id
+                applied += 1
+
+    def purge(self):
+        """
+        Delete events older than the backfill window, which no listener or
+        snapshot check reads any more, so the shared log stays small.
+        """
+        self._purged_at = time.monotonic()
+        removed = self.log.purge(self.backfill)
+        if removed:
+            log_event(logger, "cache.events_purged", removed=removed)
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                if time.monotonic() - self._purged_at >= PURGE_INTERVAL_S:
+                    self.purge()
+            except sqlite3.Error as e:
+                logger.warning("Cache invalidation poll failed: %s", e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def _request_emp_ids(body):
+    """
+    Employee IDs of an /invalidate body: `emp_ids` (a non-empty list) or
+    `emp_id`. Each must be an int or a string of digits; raises ValueError otherwise.
+    """
+    if "emp_ids" in body:
+        emp_ids = body["emp_ids"]
+        if not isinstance(emp_ids, list) or not emp_ids:
+            raise ValueError("emp_ids must be a non-empty list")
+    else:
+        emp_ids = [body["emp_id"]]
+    for emp_id in emp_ids:
+        valid_int = isinstance(emp_id, int) and not isinstance(emp_id, bool)
+        if not (valid_int or (isinstance(emp_id, str) and emp_id.isdigit())):
+            raise ValueError(f"Invalid employee ID {emp_id!r}")
+    return [int(emp_id) for emp_id in emp_ids]
+
+
+def make_invalidation_server(port, host="127.0.0.1", log=None):
+    """
+    Build (but do not start) an HTTP server accepting
+    POST /invalidate {"emp_id": 5469, "kind": "leave"} (or "emp_ids": [...])
+    and appending the events to the shared log.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    log = log or EventLog()
+
+    class InvalidationHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.split("?")[0] != "/invalidate":
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                emp_ids = _request_emp_ids(body)
+                ids = [log.publish(emp_id, body.get("kind", "leave")) for emp_id in emp_ids]
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self._reply(202, {"published": ids})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), InvalidationHandler)
+
+
+_listener = None
+_server = None
+_start_lock = threading.Lock()
+
+
+def start_invalidation(port=None):
+    """
+    Start this process's listener (when INVALIDATION_ENABLED) and, when a port
+    is configured, the /invalidate endpoint, once per process. Returns the listener or None.
+    """
+    global _listener, _server
+    if not settings.INVALIDATION_ENABLED:
+        return None
+    port = settings.INVALIDATION_PORT if port is None else port
+    with _start_lock:
+        if _listener is None:
+            _listener = InvalidationListener(EventLog()).start()
+        if port and _server is None:
+            try:
+                _server = make_invalidation_server(port)
+            except OSError as e:
+                # Another worker on this host already serves the endpoint.
+                logger.info("Invalidation endpoint not started on port %s: %s", port, e)
+            else:
+                threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _listener
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish leave-change events to the LeaveBot cache listeners.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    publish = sub.add_parser("publish", help="Publish events for some employees")
+    publish.add_argument("emp_ids", nargs="+")
+    publish.add_argument("--kind", choices=EVENT_KINDS, default="leave")
+    serve = sub.add_parser("serve", help="Serve POST /invalidate")
+    serve.add_argument("--port", type=int, default=None, help="Default: INVALIDATION_PORT")
+    serve.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--db", default=None, help="Event log (default: INVALIDATION_DB_PATH)")
+    args = parser.parse_args(argv)
+
+    log = EventLog(args.db)
+    if args.command == "publish":
+        ids = [log.publish(emp_id, args.kind) for emp_id in args.emp_ids]
+        print(f"Published {len(ids)} {args.kind} event(s), last id {ids[-1]}")
+        return
+    server = make_invalidation_server(args.port or settings.INVALIDATION_PORT, args.host, log)
+    print(f"Serving POST /invalidate on {args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
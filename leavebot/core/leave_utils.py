@@ -1,7 +1,9 @@
 # leave_utils.py
-from datetime import datetime
+from datetime import date, datetime
 from collections import Counter
 
+from .schema import parse_date, parse_number, value_of
+
 def build_leave_mappings(leave_types):
     """
     Build code-to-description, description-to-code, and code-to-Lpd_ID_N mappings from API data.
@@ -43,10 +45,9 @@ def total_leave_taken(leave_history, leave_types, code_or_desc=None):
         if rec.get("LeaveGrid_Status") != "Approved":
             continue
         if rec.get("LeaveGrid_Lvm_Code_V") in codes:
-            try:
-                total += float(rec.get("LeaveGrid_Ela_Tot", 0) or 0)
-            except ValueError:
-                continue
+            days = value_of(rec, "LeaveGrid_Ela_Tot", parse_number)
+            if isinstance(days, float):
+                total += days
     return total
 
 def leaves_by_type(leave_history, leave_types):
@@ -59,9 +60,8 @@ def leaves_by_type(leave_history, leave_types):
         if rec.get("LeaveGrid_Status") != "Approved":
             continue
         code = rec.get("LeaveGrid_Lvm_Code_V")
-        try:
-            days = float(rec.get("LeaveGrid_Ela_Tot", 0) or 0)
-        except ValueError:
+        days = value_of(rec, "LeaveGrid_Ela_Tot", parse_number)
+        if not isinstance(days, float):
             days = 0.0
         if code:
             desc = code_to_desc.get(code, code)
@@ -87,15 +87,10 @@ def is_on_leave_today(leave_history):
     for rec in leave_history:
         if rec.get("LeaveGrid_Status") != "Approved":
             continue
-        from_str = (rec.get("LeaveGrid_Ela_FromDate_D") or "")[:10]
-        to_str   = (rec.get("LeaveGrid_Ela_ToDate_D")   or "")[:10]
-        try:
-            fdate = datetime.strptime(from_str, "%Y-%m-%d").date()
-            tdate = datetime.strptime(to_str,   "%Y-%m-%d").date()
-            if fdate <= today <= tdate:
-                return True
-        except ValueError:
-            continue
+        fdate = value_of(rec, "LeaveGrid_Ela_FromDate_D", parse_date)
+        tdate = value_of(rec, "LeaveGrid_Ela_ToDate_D", parse_date)
+        if isinstance(fdate, date) and isinstance(tdate, date) and fdate <= today <= tdate:
+            return True
     return False
 
 def next_leave_balance_reset(leave_types):
@@ -129,18 +124,24 @@ def leave_type_balance(leave_balances, leave_types, code_or_desc):
     leave_balances is a dict of {Lpd_ID_N: balance_data}
     code_or_desc is a string, e.g. "AL" or "Annual Leave"
     """
-    code_to_desc, desc_to_code, code_to_lpdid = build_leave_mappings(leave_types)
-
-    if code_or_desc in code_to_lpdid:
-        lpd_id = code_to_lpdid[code_or_desc]
-    elif code_or_desc in desc_to_code and desc_to_code[code_or_desc] in code_to_lpdid:
-        lpd_id = code_to_lpdid[desc_to_code[code_or_desc]]
-    else:
+    lpd_id = resolve_lpd_id(leave_types, code_or_desc)
+    if lpd_id is None:
         return None
 
     bal = leave_balances.get(lpd_id, {})
     return bal.get("Balance")
 
+def resolve_lpd_id(leave_types, code_or_desc):
+    """
+    Return the Lpd_ID_N for a leave code or description, or None if unknown.
+    """
+    _, desc_to_code, code_to_lpdid = build_leave_mappings(leave_types)
+    if code_or_desc in code_to_lpdid:
+        return code_to_lpdid[code_or_desc]
+    if code_or_desc in desc_to_code and desc_to_code[code_or_desc] in code_to_lpdid:
+        return code_to_lpdid[desc_to_code[code_or_desc]]
+    return None
+
 def leave_codes_summary(leave_history):
     """
     Debug utility: Return a Counter of codes found in leave_history.
@@ -151,22 +152,12 @@ def recent_leaves(leave_history, count=5):
     """
     Return a list of the most recent approved leave records.
     """
-    def parse_date(date_str):
-        if not date_str:
-            return None
-        for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d", "%d-%b-%Y"):
-            try:
-                return datetime.strptime(date_str[:19], fmt)
-            except Exception:
-                continue
-        return None
+    def from_date(rec):
+        value = value_of(rec, "LeaveGrid_Ela_FromDate_D", parse_date)
+        return value if isinstance(value, date) else date.min
 
     filtered = [rec for rec in leave_history if rec.get("LeaveGrid_Status") == "Approved"]
-    sorted_history = sorted(
-        filtered,
-        key=lambda rec: parse_date(rec.get("LeaveGrid_Ela_FromDate_D")) or datetime.min,
-        reverse=True,
-    )
+    sorted_history = sorted(filtered, key=from_date, reverse=True)
 
     result = []
     for rec in sorted_history[: int(count)]:
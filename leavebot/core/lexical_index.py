@@ -0,0 +1,81 @@
+# lexical_index.py
+"""In-memory BM25 inverted index over the policy chunks (pure Python, no network)."""
+import math
+import re
+from collections import Counter, defaultdict
+
+# Keeps leave codes ("al", "sl") and article references ("12", "12.3", "art-40").
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it my "
+    "of on or our the their there this to was what when where which who will with "
+    "would you your me we".split()
+)
+
+
+def tokenize(text):
+    """Lowercase word/number tokens with stopwords removed."""
+    return [tok for tok in _TOKEN_RE.findall((text or "").lower()) if tok not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of texts. `search` returns
+    [(doc_index, score, coverage)] best first, where coverage is the fraction
+    of distinct query terms found in the document.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_index, term_frequency)]
+        lengths = []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc, tf))
+        self.doc_count = len(lengths)
+        avg_len = (sum(lengths) / len(lengths)) if lengths else 0.0
+        # Per-document length normalisation, computed once instead of per query.
+        self._norm = [k1 * (1 - b + b * length / avg_len) if avg_len else k1 for length in lengths]
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query, top_k=10):
+        terms = set(tokenize(query))
+        if not terms or not self.doc_count:
+            return []
+        scores = defaultdict(float)
+        matched = Counter()
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc, tf in postings:
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + self._norm[doc])
+                matched[doc] += 1
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(doc, score, matched[doc] / len(terms)) for doc, score in ranked]
+
+
+def is_confident(results, margin):
+    """
+    True when the best lexical hit contains every query term and outscores
+    the runner-up by at least `margin` times. A margin <= 0 never matches.
+    """
+    if margin <= 0 or not results or results[0][2] < 1.0:
+        return False
+    return len(results) == 1 or results[0][1] >= margin * results[1][1]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of doc indexes; returns [(doc_index, fused_score)] best first."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            fused[doc] += 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
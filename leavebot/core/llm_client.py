@@ -0,0 +1,158 @@
+# llm_client.py
+"""Single entry point for the OpenAI calls made by LeaveBot."""
+import json
+import threading
+import time
+
+from leavebot.config import settings
+from . import cassette, rate_limit
+from .deadline import DeadlineExceeded, remaining, timeout_for
+from .log_utils import get_logger
+from .metrics import LLM_SECONDS, LLM_TOKENS
+from .tracing import span
+
+logger = get_logger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+# id(tools) -> (tools, serialized length); tool lists are module-level or cached subsets.
+_tools_chars = {}
+
+
+def get_client():
+    """
+    Return the shared OpenAI client, importing `openai` and constructing the
+    client on first use. OPENAI_BASE_URL in the environment is honoured.
+    Retries are handled here (see call_with_retries), not by the SDK.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+
+                _client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+    return _client
+
+
+def set_client(client):
+    """Replace the shared client (e.g. with a stub in tests); None resets it."""
+    global _client
+    _client = client
+
+
+def estimate_tokens(messages=None, tools=None, max_tokens=0):
+    """Rough token estimate (~4 characters per token) used to pre-charge tokens/min."""
+    chars = sum(len(str(m.get("content") or "")) + len(json.dumps(m.get("tool_calls") or "")) for m in messages or [])
+    if tools:
+        chars += _serialized_length(tools)
+    return chars // 4 + (max_tokens or 0)
+
+
+def _serialized_length(tools):
+    """JSON length of a tool list, serialized once per list object."""
+    cached = _tools_chars.get(id(tools))
+    if cached is None or cached[0] is not tools:
+        if len(_tools_chars) >= 64:
+            _tools_chars.clear()
+        cached = _tools_chars[id(tools)] = (tools, len(json.dumps(tools)))
+    return cached[1]
+
+
+def classify_openai_error(exc):
+    """Return (retryable, retry_after) for an exception raised by the OpenAI SDK."""
+    import openai
+
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        response = getattr(exc, "response", None)
+        return True, rate_limit.parse_retry_after(getattr(response, "headers", None))
+    return False, None
+
+
+def _timeout_kwargs(timeout):
+    return {"timeout": timeout} if timeout is not None else {}
+
+
+def _call_openai(fn, estimated_tokens, kind, model):
+    """
+    Run `fn(timeout)` with rate limiting and retries. `timeout` is the time
+    left before the turn deadline (None without one), for the SDK request.
+    """
+    limiter = rate_limit.get_rate_limiter("openai")
+
+    def attempt():
+        rate_limit.acquire("openai", estimated_tokens, remaining())
+        timeout = timeout_for(None)
+        start = time.perf_counter()
+        try:
+            return fn(timeout)
+        except Exception as e:
+            import openai
+
+            if isinstance(e, openai.RateLimitError) and limiter is not None:
+                limiter.on_throttle(classify_openai_error(e)[1])
+            if isinstance(e, openai.APITimeoutError) and timeout is not None and remaining() <= 0:
+                raise DeadlineExceeded(f"OpenAI {kind} request hit the turn deadline") from e
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, kind=kind, model=model)
+
+    def on_retry(exc, attempt_no, delay):
+        logger.warning("OpenAI %s attempt %d failed (%s); retrying in %.2fs", kind, attempt_no, exc, delay)
+
+    result = rate_limit.call_with_retries(
+        attempt, classify_openai_error, attempts=settings.OPENAI_MAX_RETRIES + 1, on_retry=on_retry
+    )
+    if limiter is not None:
+        limiter.on_success()
+    return result
+
+
+def create_chat_completion(**kwargs):
+    """
+    Call `chat.completions.create`, recording model and token usage on an
+    `llm.chat_completion` span. Keyword arguments are passed through.
+    Under a cassette the exchange is recorded or replayed (see core.cassette).
+    """
+    model = kwargs.get("model", "")
+    estimated = estimate_tokens(kwargs.get("messages"), kwargs.get("tools"), kwargs.get("max_tokens"))
+    with span("llm.chat_completion", **{"llm.model": model}) as sp:
+        response = cassette.exchange("chat", kwargs, lambda: _call_openai(
+            lambda timeout: get_client().chat.completions.create(**kwargs, **_timeout_kwargs(timeout)),
+            estimated, "chat", model,
+        ))
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            sp.set_attribute("llm.usage.prompt_tokens", usage.prompt_tokens or 0)
+            sp.set_attribute("llm.usage.completion_tokens", usage.completion_tokens or 0)
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="chat", model=model, type="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens or 0, kind="chat", model=model, type="completion")
+            limiter = rate_limit.get_rate_limiter("openai")
+            if limiter is not None:
+                limiter.record_usage(estimated, (usage.prompt_tokens or 0) + (usage.completion_tokens or 0))
+        return response
+
+
+def create_embedding(text, model, dimensions=None):
+    """Return the embedding vector (list of floats) for a single text."""
+    return create_embeddings([text], model, dimensions)[0]
+
+
+def create_embeddings(texts, model, dimensions=None):
+    """
+    Embed a batch of texts in one request; returns the vectors in input order.
+    `dimensions` shortens text-embedding-3 vectors (None keeps the model default).
+    """
+    texts = list(texts)
+    extra = {"dimensions": dimensions} if dimensions else {}
+    estimated = sum(len(text) // 4 + 1 for text in texts)
+    with span("llm.embedding", **{"llm.model": model, "llm.batch_size": len(texts)}) as sp:
+        resp = cassette.exchange("embedding", {"input": texts, "model": model, **extra}, lambda: _call_openai(
+            lambda timeout: get_client().embeddings.create(input=texts, model=model, **extra, **_timeout_kwargs(timeout)),
+            estimated, "embedding", model,
+        ))
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            sp.set_attribute("llm.usage.prompt_tokens", usage.prompt_tokens or 0)
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="embedding", model=model, type="prompt")
+        return [item.embedding for item in sorted(resp.data, key=lambda item: item.index)]
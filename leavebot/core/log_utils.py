@@ -0,0 +1,35 @@
+# log_utils.py
+import json
+import logging
+
+from leavebot.config import settings
+
+_configured = False
+
+
+def configure_logging():
+    """Configure the `leavebot` logger from LOG_LEVEL / LOG_FILE (once)."""
+    global _configured
+    if not _configured:
+        root = logging.getLogger("leavebot")
+        root.setLevel(settings.LOG_LEVEL.upper())
+        if settings.LOG_FILE and not root.handlers:
+            handler = logging.FileHandler(settings.LOG_FILE, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+            root.addHandler(handler)
+        _configured = True
+
+
+def get_logger(name="leavebot"):
+    """
+    Return a logger under the `leavebot` hierarchy. Handlers are attached
+    lazily by configure_logging(), so this is safe to call at import time.
+    """
+    return logging.getLogger(name)
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """Log a single structured line: the event name plus JSON-encoded fields."""
+    configure_logging()
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({"event": event, **fields}, default=str, sort_keys=True))
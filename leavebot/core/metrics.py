@@ -0,0 +1,261 @@
+# metrics.py
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Recording is a dict lookup plus an add under a per-metric lock, so it is
+cheap enough for every ERP call, cache lookup and tool call. Values can be
+read back directly (`counter.value(...)`), which is what the tests use.
+"""
+import bisect
+import threading
+
+from leavebot.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value, optionally split by labels."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = self._header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. a queue depth."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values (seconds, by convention)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(_label_key(self.labelnames, labels))
+        return state[2] if state else 0
+
+    def sum(self, **labels):
+        state = self._values.get(_label_key(self.labelnames, labels))
+        return state[1] if state else 0.0
+
+    def render(self):
+        lines = self._header()
+        for key, (counts, total, n) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds named metrics and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def reset(self):
+        """Clear recorded values (metrics stay registered)."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self):
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TURNS = REGISTRY.counter("leavebot_turns_total", "Chat turns handled.")
+TURN_SECONDS = REGISTRY.histogram("leavebot_turn_duration_seconds", "End-to-end chat turn latency.")
+LLM_SECONDS = REGISTRY.histogram(
+    "leavebot_llm_request_duration_seconds", "OpenAI request latency.", ("kind", "model"))
+LLM_TOKENS = REGISTRY.counter(
+    "leavebot_llm_tokens_total", "OpenAI token usage.", ("kind", "model", "type"))
+ERP_SECONDS = REGISTRY.histogram(
+    "leavebot_erp_request_duration_seconds", "ERP HTTP request latency.", ("endpoint",))
+ERP_ERRORS = REGISTRY.counter(
+    "leavebot_erp_request_errors_total", "ERP requests that raised.", ("endpoint",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "leavebot_cache_requests_total", "Cache lookups by result.", ("cache", "result"))
+TOOL_CALLS = REGISTRY.counter("leavebot_tool_calls_total", "Tool calls routed by ChatEngine.", ("tool",))
+ACCRUAL_RECONCILIATIONS = REGISTRY.counter(
+    "leavebot_accrual_reconciliations_total", "Accrual model checks against the ERP by result.", ("result",))
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    "leavebot_cache_invalidations_total", "Invalidation events applied by this process, by kind.", ("kind",))
+SPECULATIVE_RUNS = REGISTRY.counter(
+    "leavebot_speculative_tool_runs_total", "Speculative tool runs by outcome.", ("tool", "outcome"))
+SPECULATIVE_WASTED_SECONDS = REGISTRY.counter(
+    "leavebot_speculative_tool_wasted_seconds_total", "Time spent on speculative runs the model did not use.",
+    ("tool",))
+
+
+def record_cache_lookup(cache, hit):
+    """Count a hit or miss for one of the named caches in cache_utils."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratio(cache):
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.value(cache=cache, result="miss")
+    return hits / total if total else 0.0
+
+
+def write_metrics(path=None, registry=REGISTRY):
+    """Write the text exposition to `path` (default METRICS_EXPORT_PATH)."""
+    path = path or settings.METRICS_EXPORT_PATH
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    return path
+
+
+def make_metrics_server(port, host="0.0.0.0", registry=REGISTRY):
+    """Build (but do not start) an HTTP server answering GET /metrics."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), MetricsHandler)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """
+    Serve GET /metrics on a daemon thread (once per process).
+    Returns the server, or None when no port is configured.
+    """
+    global _server
+    port = settings.METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = make_metrics_server(port, host)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
@@ -0,0 +1,59 @@
+# model_cascade.py
+"""
+Checks for the small-model-first cascade.
+
+The small model handles the "pick a tool" step and the final answer after
+plain data tools. Each of its steps is checked here; any problem found means
+the step is repeated with the large model.
+"""
+import json
+import re
+
+# Phrases that show the model could not answer from what it was given.
+LOW_CONFIDENCE_PATTERNS = re.compile(
+    r"\b(i(?:'m| am) not sure|i do not know|i don't know|i(?: do not|'m not| am not| don't) have (?:access|enough|the information)"
+    r"|unable to (?:find|determine|answer)|cannot (?:determine|answer)|can't (?:determine|answer)|no information)\b",
+    re.IGNORECASE,
+)
+
+
+def _tool_schemas(tools):
+    return {t["function"]["name"]: t["function"] for t in tools}
+
+
+def tool_call_problem(call, tools):
+    """Why a tool call is unusable (unknown tool, bad JSON, missing argument), or None."""
+    schema = _tool_schemas(tools).get(call.function.name)
+    if schema is None:
+        return "unknown_tool"
+    try:
+        args = json.loads(call.function.arguments) if call.function.arguments else {}
+    except ValueError:
+        return "invalid_arguments"
+    if not isinstance(args, dict):
+        return "invalid_arguments"
+    required = schema.get("parameters", {}).get("required", [])
+    if any(args.get(name) in (None, "") for name in required):
+        return "missing_argument"
+    return None
+
+
+def step_problem(message, tools):
+    """
+    Validate one completion message from the small model. Returns the reason
+    to escalate ("unknown_tool", "invalid_arguments", "missing_argument",
+    "empty_answer", "low_confidence") or None when the step can be used.
+    """
+    calls = getattr(message, "tool_calls", None)
+    if calls:
+        for call in calls:
+            problem = tool_call_problem(call, tools)
+            if problem:
+                return problem
+        return None
+    content = (getattr(message, "content", None) or "").strip()
+    if not content:
+        return "empty_answer"
+    if LOW_CONFIDENCE_PATTERNS.search(content):
+        return "low_confidence"
+    return None
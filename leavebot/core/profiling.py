@@ -0,0 +1,182 @@
+# profiling.py
+"""
+Per-turn and per-tool profiling for ChatEngine and the batch runner.
+
+Each profiled block is captured twice: with cProfile (written as `.pstats`
+and summarized as the top-N functions by cumulative time) and with a
+wall-clock stack sampler (written as `.collapsed`, one `frame;frame;frame
+count` line per stack, ready for flamegraph.pl or speedscope).
+
+Only one thread is traced with cProfile at a time: from Python 3.12 a second
+active cProfile raises "another profiling tool is already active". Blocks
+started on other threads meanwhile (concurrent batch workers) are sampled
+only and write just the `.collapsed` file.
+"""
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from leavebot.config import settings
+
+# Thread currently traced by cProfile, process-wide.
+_cprofile_owner = None
+_cprofile_lock = threading.Lock()
+
+
+def _claim_cprofile():
+    global _cprofile_owner
+    with _cprofile_lock:
+        if _cprofile_owner is None:
+            _cprofile_owner = threading.get_ident()
+            return True
+        return False
+
+
+def _release_cprofile():
+    global _cprofile_owner
+    with _cprofile_lock:
+        _cprofile_owner = None
+
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval from a helper thread."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """
+    Profile labelled blocks into `output_dir`.
+
+    Blocks may nest on one thread (a tool inside a turn): the outer cProfile
+    is paused while the inner one runs and the inner stats are merged back
+    into the outer block's `.pstats`, so each file covers its full block.
+    """
+
+    def __init__(self, output_dir=None, top_n=None, sample_interval=0.005, stream=None):
+        self.output_dir = output_dir or settings.PROFILE_DIR
+        self.top_n = settings.PROFILE_TOP_N if top_n is None else top_n
+        self.sample_interval = sample_interval
+        self.stream = stream or sys.stdout
+        self._local = threading.local()
+        self._counter = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _next_prefix(self, label):
+        with self._lock:
+            self._counter += 1
+            n = self._counter
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        return os.path.join(self.output_dir, f"{n:04d}-{safe}")
+
+    @contextmanager
+    def profile(self, label):
+        import cProfile
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        outer = stack[-1] if stack else None
+        if outer is None:
+            owns_cprofile = _claim_cprofile()
+            traced = owns_cprofile
+        else:
+            owns_cprofile = False
+            traced = outer["profile"] is not None
+            if traced:
+                outer["profile"].disable()
+
+        entry = {"profile": cProfile.Profile() if traced else None, "merged": []}
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        stack.append(entry)
+        sampler.start()
+        start = time.perf_counter()
+        if traced:
+            entry["profile"].enable()
+        try:
+            yield
+        finally:
+            if traced:
+                entry["profile"].disable()
+            elapsed = time.perf_counter() - start
+            sampler.stop()
+            stack.pop()
+            try:
+                path = self._write(label, entry, sampler, elapsed)
+            finally:
+                if owns_cprofile:
+                    _release_cprofile()
+            if outer is not None and traced:
+                outer["merged"].append(path)
+                outer["profile"].enable()
+
+    def _write(self, label, entry, sampler, elapsed):
+        import pstats
+
+        prefix = self._next_prefix(label)
+        with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        if entry["profile"] is None:
+            if self.top_n:
+                self.stream.write(f"\n--- profile {label}: {elapsed * 1000:.1f} ms -> {prefix}.collapsed "
+                                  f"(sampled only; cProfile busy on another thread) ---\n")
+            return None
+
+        stats = pstats.Stats(entry["profile"], stream=io.StringIO())
+        for merged in entry["merged"]:
+            stats.add(merged)
+        stats.dump_stats(prefix + ".pstats")
+
+        if self.top_n:
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(self.top_n)
+            self.stream.write(f"\n--- profile {label}: {elapsed * 1000:.1f} ms -> {prefix}.pstats ---\n")
+            self.stream.write(out.getvalue())
+        return prefix + ".pstats"
+
+
+def default_profiler():
+    """Return a Profiler when LEAVEBOT_PROFILE is enabled, else None."""
+    return Profiler() if settings.PROFILE_ENABLED else None
+
+
+@contextmanager
+def maybe_profile(profiler, label):
+    """`profiler.profile(label)` when a profiler is set, otherwise a no-op."""
+    if profiler is None:
+        yield
+    else:
+        with profiler.profile(label):
+            yield
@@ -0,0 +1,98 @@
+# quantization.py
+"""
+Reduced-precision storage for the policy embedding matrix.
+
+Rows are L2-normalized before quantization:
+- float16 halves the matrix.
+- int8 stores one float32 scale per row and quarters it.
+
+The scan runs over the small matrix. The best candidates are then
+re-scored against float32 rows that are memory-mapped from a sidecar
+file, so only those rows are read from disk.
+"""
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+def normalize_rows(matrix):
+    import numpy as np
+
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.size:
+        matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9)
+    return matrix
+
+
+def truncate(matrix, dimensions):
+    """
+    Shorten embeddings to their first `dimensions` components and re-normalize,
+    which is how text-embedding-3 models implement the `dimensions` parameter.
+    """
+    import numpy as np
+
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if not dimensions or dimensions >= matrix.shape[-1]:
+        return normalize_rows(matrix)
+    return normalize_rows(matrix[..., :dimensions])
+
+
+def quantize(matrix, method):
+    """Return (codes, scales) for normalized float32 rows; scales is None unless int8."""
+    import numpy as np
+
+    if method == "float16":
+        return matrix.astype(np.float16), None
+    if method == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.zeros(len(matrix))
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    if method == "none":
+        return matrix, None
+    raise ValueError(f"Unknown quantization {method!r}; expected one of {QUANTIZATIONS}")
+
+
+class QuantizedMatrix:
+    """
+    A quantized embedding matrix: `matrix @ query` gives approximate cosine
+    scores, and `rerank(rows, query)` gives exact float32 scores for `rows`.
+    """
+
+    def __init__(self, codes, scales=None, full=None):
+        self.codes = codes
+        self.scales = scales
+        self.full = full
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory for the scan (the float32 sidecar stays on disk)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    # Rows widened to float32 per block of the scan; small enough to stay in cache.
+    BLOCK_ROWS = 512
+
+    def __matmul__(self, query):
+        import numpy as np
+
+        query = query.astype(np.float32)
+        rows = len(self.codes)
+        scores = np.empty(rows, dtype=np.float32)
+        block = np.empty((min(self.BLOCK_ROWS, rows), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, rows, self.BLOCK_ROWS):
+            stop = min(start + self.BLOCK_ROWS, rows)
+            widened = block[: stop - start]
+            widened[...] = self.codes[start:stop]
+            np.dot(widened, query, out=scores[start:stop])
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def rerank(self, rows, query):
+        import numpy as np
+
+        if self.full is None:
+            return (self @ query)[rows]
+        return np.asarray(self.full[rows], dtype=np.float32) @ query
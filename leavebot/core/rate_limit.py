@@ -0,0 +1,367 @@
+# rate_limit.py
+"""
+Client-side rate limiting and backpressure for the OpenAI and ERP backends.
+
+- `AdaptiveRateLimiter`: requests/min and tokens/min buckets. A throttle
+  signal (HTTP 429 / Retry-After) pauses all callers and halves the rate;
+  successes restore it gradually.
+- `ConcurrencyLimiter`: adaptive cap on in-flight requests (AIMD on
+  observed latency) for the ERP.
+- Both keep a bounded wait queue and raise `QueueFullError` at once when
+  it is full, instead of letting work pile up behind a slow backend.
+  A wait that outlasts the turn deadline raises `DeadlineExceeded`.
+- `call_with_retries`: exponential backoff with full jitter that never
+  retries sooner than the server's Retry-After.
+
+Limiters are named ("openai", "erp") and shared by every thread in the process.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from leavebot.config import settings
+from .deadline import DeadlineExceeded, remaining as deadline_remaining
+from .metrics import REGISTRY
+
+LIMITER_QUEUE_DEPTH = REGISTRY.gauge(
+    "leavebot_limiter_queue_depth", "Callers waiting on a limiter.", ("limiter",))
+LIMITER_THROTTLES = REGISTRY.counter(
+    "leavebot_limiter_throttle_events_total", "Throttle and rejection events.", ("limiter", "reason"))
+LIMITER_LIMIT = REGISTRY.gauge(
+    "leavebot_limiter_current_limit", "Current adaptive limit (per minute, or in-flight).", ("limiter",))
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a limiter's wait queue is full; the caller should fail fast."""
+
+    def __init__(self, message, limiter=None):
+        super().__init__(message)
+        self.limiter = limiter  # name of the limiter that gave up, e.g. "openai" or "erp"
+
+
+def _wait_failed(message, limiter):
+    """
+    Error for a limiter wait that could not finish in time: DeadlineExceeded
+    when the turn deadline has passed (the wait was capped by it), else QueueFullError.
+    """
+    left = deadline_remaining()
+    if left is not None and left <= 0:
+        return DeadlineExceeded(f"{message}: turn deadline passed")
+    return QueueFullError(message, limiter)
+
+
+class RateLimiter:
+    """Token bucket refilled at `rate_per_minute`, holding at most `burst` tokens."""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate_per_minute = float(rate_per_minute)
+        self.burst = float(burst if burst is not None else max(1.0, self.rate_per_minute / 60))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_minute / 60)
+
+    def set_rate(self, rate_per_minute):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate_per_minute = float(rate_per_minute)
+
+    def adjust(self, delta):
+        """Return (positive) or charge (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.burst, self._tokens + delta)
+
+    def acquire(self, amount=1, timeout=None):
+        """
+        Block until `amount` tokens are available and take them.
+        Returns False if `timeout` seconds pass first.
+        """
+        amount = min(amount, self.burst)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return True
+                wait = (amount - self._tokens) * 60 / self.rate_per_minute
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter:
+    """
+    Requests/min plus optional tokens/min limits with a bounded wait queue.
+    Either limit may be 0 (unlimited); Retry-After cooldowns still apply.
+    """
+
+    def __init__(self, name, requests_per_minute=0, tokens_per_minute=0, max_queue=64,
+                 min_fraction=0.1, recovery_step=0.05):
+        self.name = name
+        self.base_rpm = requests_per_minute
+        self.base_tpm = tokens_per_minute
+        self.requests = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self.tokens = RateLimiter(tokens_per_minute, burst=tokens_per_minute) if tokens_per_minute else None
+        self.max_queue = max_queue
+        self.min_fraction = min_fraction
+        self.recovery_step = recovery_step
+        self.scale = 1.0
+        self.waiting = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        LIMITER_LIMIT.set(requests_per_minute, limiter=name)
+
+    def _apply_scale(self):
+        if self.requests:
+            self.requests.set_rate(self.base_rpm * self.scale)
+        if self.tokens:
+            self.tokens.set_rate(self.base_tpm * self.scale)
+        LIMITER_LIMIT.set(self.base_rpm * self.scale, limiter=self.name)
+
+    def acquire(self, tokens=0, timeout=None):
+        """Wait for a request slot (and `tokens` tokens); raise QueueFullError if saturated."""
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                LIMITER_THROTTLES.inc(limiter=self.name, reason="rejected")
+                raise QueueFullError(f"{self.name} limiter queue is full ({self.max_queue} waiting)", self.name)
+            self.waiting += 1
+            LIMITER_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+        try:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            pause = self._blocked_until - time.monotonic()
+            if pause > 0:
+                if deadline is not None and time.monotonic() + pause > deadline:
+                    raise _wait_failed(f"{self.name} is cooling down for {pause:.1f}s", self.name)
+                time.sleep(pause)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self.requests and not self.requests.acquire(1, remaining):
+                raise _wait_failed(f"{self.name} request budget exhausted", self.name)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self.tokens and tokens and not self.tokens.acquire(tokens, remaining):
+                raise _wait_failed(f"{self.name} token budget exhausted", self.name)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                LIMITER_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real usage is known."""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def on_throttle(self, retry_after=None):
+        """The backend pushed back: pause everyone and halve the rate."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + (retry_after or 1.0))
+            self.scale = max(self.min_fraction, self.scale * 0.5)
+            self._apply_scale()
+        LIMITER_THROTTLES.inc(limiter=self.name, reason="retry_after" if retry_after else "throttled")
+
+    def on_success(self):
+        if self.scale < 1.0:
+            with self._lock:
+                self.scale = min(1.0, self.scale + self.recovery_step)
+                self._apply_scale()
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests. The cap shrinks multiplicatively when latency
+    exceeds `target_latency` or the backend throttles, and grows additively
+    (about +1 per `limit` fast responses) back to `max_concurrency`.
+    """
+
+    def __init__(self, name, max_concurrency, min_concurrency=1, target_latency=2.0, max_queue=32):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        LIMITER_LIMIT.set(self.limit, limiter=name)
+
+    def _has_capacity(self, now):
+        return now >= self._blocked_until and self.in_flight < max(self.min_concurrency, int(self.limit))
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if not self._has_capacity(time.monotonic()) and self.waiting >= self.max_queue:
+                LIMITER_THROTTLES.inc(limiter=self.name, reason="rejected")
+                raise QueueFullError(f"{self.name} limiter queue is full ({self.max_queue} waiting)", self.name)
+            self.waiting += 1
+            LIMITER_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+            try:
+                while not self._has_capacity(time.monotonic()):
+                    now = time.monotonic()
+                    wait = max(0.0, self._blocked_until - now) or None
+                    if deadline is not None:
+                        if now >= deadline:
+                            LIMITER_THROTTLES.inc(limiter=self.name, reason="timeout")
+                            raise _wait_failed(f"{self.name} limiter wait timed out", self.name)
+                        wait = min(wait or deadline - now, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self.waiting -= 1
+                LIMITER_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+            self.in_flight += 1
+
+    def release(self, latency=None, retry_after=None, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled or retry_after:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                LIMITER_THROTTLES.inc(limiter=self.name, reason="retry_after" if retry_after else "throttled")
+            elif latency is not None and latency > self.target_latency:
+                self.limit = max(self.min_concurrency, self.limit * 0.75)
+                LIMITER_THROTTLES.inc(limiter=self.name, reason="latency")
+            elif latency is not None:
+                self.limit = min(self.max_concurrency, self.limit + 1 / max(self.limit, 1.0))
+            LIMITER_LIMIT.set(self.limit, limiter=self.name)
+            self._cond.notify_all()
+
+
+class Slot:
+    """Outcome of one request, reported back to a ConcurrencyLimiter on exit."""
+
+    __slots__ = ("latency", "retry_after", "throttled")
+
+    def __init__(self):
+        self.latency = None
+        self.retry_after = None
+        self.throttled = False
+
+
+@contextmanager
+def concurrency_slot(name, timeout=None):
+    """Hold one in-flight slot of limiter `name` (a no-op if it has none)."""
+    limiter = get_concurrency_limiter(name)
+    slot = Slot()
+    if limiter is None:
+        yield slot
+        return
+    limiter.acquire(timeout)
+    try:
+        yield slot
+    finally:
+        limiter.release(slot.latency, slot.retry_after, slot.throttled)
+
+
+def call_with_retries(fn, classify, attempts=3, base_delay=0.5, max_delay=20.0, on_retry=None):
+    """
+    Call `fn()` up to `attempts` times.
+
+    `classify(exc)` returns (retryable, retry_after_seconds_or_None). Between
+    attempts sleep a full-jitter exponential backoff, but never less than
+    the server's Retry-After. No retry is made that would start after the
+    current turn deadline (see deadline.py).
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            retryable, retry_after = classify(e)
+            if not retryable or attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if retry_after:
+                delay = max(delay, min(retry_after, max_delay))
+            left = deadline_remaining()
+            if left is not None and delay >= left:
+                # The retry could not finish before the turn's deadline.
+                raise
+            if on_retry:
+                on_retry(e, attempt + 1, delay)
+            time.sleep(delay)
+
+
+def parse_retry_after(headers):
+    """Read Retry-After (seconds) or retry-after-ms from response headers."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+_rate_limiters = {}
+_concurrency_limiters = {}
+_configured = set()
+_lock = threading.Lock()
+
+
+def configure_rate_limit(name, requests_per_minute=0, tokens_per_minute=0, max_queue=None):
+    """(Re)configure the adaptive rate limiter for backend `name`."""
+    with _lock:
+        _configured.add(("rate", name))
+        _rate_limiters[name] = AdaptiveRateLimiter(
+            name, requests_per_minute, tokens_per_minute,
+            max_queue=max_queue if max_queue is not None else settings.RATE_LIMIT_MAX_QUEUE,
+        )
+
+
+def configure_concurrency_limit(name, max_concurrency, target_latency=2.0, max_queue=None):
+    """(Re)configure, or with a falsy cap remove, the concurrency limiter for `name`."""
+    with _lock:
+        _configured.add(("concurrency", name))
+        if max_concurrency:
+            _concurrency_limiters[name] = ConcurrencyLimiter(
+                name, max_concurrency, target_latency=target_latency,
+                max_queue=max_queue if max_queue is not None else settings.RATE_LIMIT_MAX_QUEUE,
+            )
+        else:
+            _concurrency_limiters.pop(name, None)
+
+
+def get_rate_limiter(name):
+    if ("rate", name) not in _configured:
+        if name == "openai":
+            configure_rate_limit(name, settings.OPENAI_RPM, settings.OPENAI_TPM)
+        elif name == "erp":
+            configure_rate_limit(name, settings.ERP_RPM)
+        else:
+            configure_rate_limit(name)
+    return _rate_limiters.get(name)
+
+
+def get_concurrency_limiter(name):
+    if ("concurrency", name) not in _configured:
+        if name == "erp":
+            configure_concurrency_limit(name, settings.ERP_MAX_CONCURRENCY, settings.ERP_TARGET_LATENCY_S)
+        else:
+            configure_concurrency_limit(name, 0)
+    return _concurrency_limiters.get(name)
+
+
+def acquire(name, tokens=0, timeout=None):
+    """Wait for permission to send one request (of ~`tokens` tokens) to `name`."""
+    limiter = get_rate_limiter(name)
+    if limiter is not None:
+        limiter.acquire(tokens, timeout)
@@ -0,0 +1,194 @@
+# schema.py
+"""
+Compact records for cached ERP payloads.
+
+ERP responses carry dozens of keys LeaveBot never reads. The fetch layer
+projects them into `__slots__` records holding only the fields used by
+leave_utils, employee_utils and air_ticket_utils, with dates and numbers
+parsed once. Records keep dict-style access on the original ERP keys
+(`rec.get("LeaveGrid_Status")`, `rec["Balance"]`), so existing callers work
+unchanged; dates read that way come back as ISO strings.
+"""
+import sys
+from datetime import date, datetime
+
+_DATE_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d", "%d-%b-%Y", "%d/%m/%Y")
+
+
+def parse_date(value):
+    """Parse an ERP date to a `date`; None for blanks, the raw value if unparseable."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:19], fmt).date()
+        except ValueError:
+            continue
+    return value
+
+
+def parse_number(value):
+    """Parse an ERP numeric to float; None for blanks, the raw value if unparseable."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def intern_text(value):
+    """Intern short repeated strings (status, codes) so records share one copy."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Record:
+    """
+    Base for slot-backed ERP records.
+
+    Subclasses list FIELDS as (erp_key, attribute, parser) and set
+    `__slots__` to the attribute names.
+    """
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._KEYS = {key: (attr, parser) for key, attr, parser in cls.FIELDS}
+
+    def __init__(self, **attrs):
+        for _, attr, _ in self.FIELDS:
+            setattr(self, attr, attrs.get(attr))
+
+    @classmethod
+    def from_erp(cls, raw):
+        """Project one raw ERP dict, dropping every key not in FIELDS."""
+        rec = cls.__new__(cls)
+        for key, attr, parser in cls.FIELDS:
+            value = raw.get(key)
+            setattr(rec, attr, parser(value) if parser else value)
+        return rec
+
+    def parsed(self, key):
+        """Return the parsed value stored for an ERP key (None if unknown or missing)."""
+        field = self._KEYS.get(key)
+        return getattr(self, field[0]) if field else None
+
+    # --- dict compatibility on the raw ERP keys ---
+    def get(self, key, default=None):
+        value = self.parsed(key)
+        if value is None:
+            return default
+        return value.isoformat() if isinstance(value, date) else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        field = self._KEYS.get(key)
+        if field is None:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        attr, parser = field
+        setattr(self, attr, parser(value) if parser else value)
+
+    def __contains__(self, key):
+        return self.parsed(key) is not None
+
+    def keys(self):
+        return [key for key, attr, _ in self.FIELDS if getattr(self, attr) is not None]
+
+    def items(self):
+        return [(key, self.get(key)) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr) for _, attr, _ in self.FIELDS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class LeaveRecord(Record):
+    """One leave application from the leave-history API."""
+    FIELDS = (
+        ("Emp_ID_N", "emp_id", None),
+        ("LeaveGrid_Lvm_ID_N", "lvm_id", None),
+        ("LeaveGrid_Lvm_Code_V", "code", intern_text),
+        ("LeaveGrid_Lvm_Description_V", "description", intern_text),
+        ("LeaveGrid_Status", "status", intern_text),
+        ("LeaveGrid_Ela_Tot", "days", parse_number),
+        ("LeaveGrid_Ela_FromDate_D", "from_date", parse_date),
+        ("LeaveGrid_Ela_ToDate_D", "to_date", parse_date),
+        ("LeaveGrid_Ela_AppDate_D", "applied_on", parse_date),
+        ("LeaveGrid_dtTravelDate", "travel_date", parse_date),
+        ("Ela_AirTicketReq_N", "air_ticket_requested", None),
+    )
+    __slots__ = tuple(field[1] for field in FIELDS)
+
+
+class LeaveBalance(Record):
+    """Balance of one leave type from the leave-summary API."""
+    FIELDS = (
+        ("Balance", "balance", parse_number),
+        ("Airticket", "air_ticket", intern_text),
+        ("AirTicketPercent", "air_ticket_percent", parse_number),
+        ("Emp_AnnivDate_D", "anniversary", parse_date),
+        ("Lvm_Code_V", "code", intern_text),
+    )
+    __slots__ = tuple(field[1] for field in FIELDS)
+
+
+class Employee(Record):
+    """Employee profile from the employee-details API."""
+    FIELDS = (
+        ("Emp_ID_N", "emp_id", None),
+        ("Emp_Code_V", "code", None),
+        ("Emp_EFullName_V", "full_name", None),
+        ("Emp_EDisplayName_V", "display_name", None),
+        ("Emp_EmailID_V", "email", None),
+        ("Emp_Mobile_V", "mobile", None),
+        ("Dpm_Desc_V", "department", intern_text),
+        ("Dsm_Desc_V", "designation", intern_text),
+        ("Emp_ReportingToID_N", "reporting_to_id", None),
+        ("Emp_EmployeeReportsDesc_V", "reports_to_name", None),
+        ("Emp_DOJ_D", "joined_on", parse_date),
+        ("Emp_ESBDate_D", "esb_date", parse_date),
+        ("Emp_AnnivDate_D", "anniversary", parse_date),
+        ("Emp_ProbationEndDate_D", "probation_end", parse_date),
+        ("Cnt_Nationality_V", "country_nationality", intern_text),
+        ("Emp_Nationality_V", "nationality", intern_text),
+    )
+    __slots__ = tuple(field[1] for field in FIELDS)
+
+
+def project(record_cls, payload):
+    """
+    Project an ERP payload (a list of dicts or a single dict) into `record_cls`
+    records. Anything else, including already-projected records, is returned as is.
+    """
+    if isinstance(payload, list):
+        return [record_cls.from_erp(item) if isinstance(item, dict) else item for item in payload]
+    if isinstance(payload, dict):
+        return record_cls.from_erp(payload)
+    return payload
+
+
+def value_of(rec, key, parser):
+    """Parsed value of an ERP key from either a Record or a raw ERP dict."""
+    if isinstance(rec, Record):
+        return rec.parsed(key)
+    return parser(rec.get(key))
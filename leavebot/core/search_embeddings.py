@@ -1,44 +1,181 @@
-import os
 import json
-import numpy as np
-import openai
-from leavebot.config.settings import DOC_EMBEDDINGS_PATH
-
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-def get_query_embedding(query, model="text-embedding-3-large"):
-    # Or "text-embedding-ada-002" for legacy
-    try:
-        resp = openai.embeddings.create(input=[query], model=model)
-    except openai.AuthenticationError:
-        print(
-            "OpenAI authentication failed. Please set the OPENAI_API_KEY environment variable with a valid API key."
-        )
-        return None
-    return np.array(resp.data[0].embedding, dtype=np.float32)
+import os
+import threading
+from leavebot.config import settings
+from .cache_utils import EMBEDDING_CACHE
+from .lexical_index import BM25Index, is_confident, reciprocal_rank_fusion
+from .llm_client import create_embedding
+from .log_utils import get_logger
+from .metrics import record_cache_lookup
+from .quantization import QuantizedMatrix
+from .tracing import span
+
+logger = get_logger(__name__)
+
+# numpy and openai are imported inside the functions below so importing
+# this module (and ChatEngine) stays cheap; both load on the first search.
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+# Embedding model and dimensions the loaded index was built with ({} for JSON).
+_index_meta = {}
+_lexical = None
+_lexical_key = None
+
+
+def load_index(path=None):
+    """
+    Load the policy embeddings index once and reuse it until the file changes.
+    Reads the binary `.npz` index written by ingest_docs, or the legacy JSON list.
+    Returns (chunks, matrix) where `matrix` holds one L2-normalized row per
+    chunk: a float32 array, or a QuantizedMatrix for float16/int8 indexes.
+    """
+    global _index, _index_key, _index_meta
+    import numpy as np
+
+    path = path or settings.DOC_EMBEDDINGS_PATH
+    key = (path, os.path.getmtime(path))
+    with _index_lock:
+        if _index_key != key:
+            with span("policy.index_load", path=path):
+                meta = {}
+                if path.endswith(".npz"):
+                    with np.load(path, allow_pickle=False) as data:
+                        if "codes" in data:
+                            full = f"{path}.f32.npy"
+                            matrix = QuantizedMatrix(
+                                data["codes"],
+                                data["scales"] if "scales" in data else None,
+                                np.load(full, mmap_mode="r") if os.path.exists(full) else None,
+                            )
+                        else:
+                            matrix = data["embeddings"].astype(np.float32)
+                        chunks = [
+                            {"text": text, "source": source}
+                            for text, source in zip(data["texts"].tolist(), data["sources"].tolist())
+                        ]
+                        if "model" in data:
+                            meta = {"model": str(data["model"]), "dimensions": int(data["dimensions"]) or None}
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        embeddings = json.load(f)
+                    matrix = np.array([chunk["embedding"] for chunk in embeddings], dtype=np.float32)
+                    chunks = [
+                        {"text": chunk.get("text", ""), "source": chunk.get("source", "")}
+                        for chunk in embeddings
+                    ]
+                if isinstance(matrix, np.ndarray) and matrix.size:
+                    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9
+            _index, _index_key, _index_meta = (chunks, matrix), key, meta
+        return _index
+
+
+def load_lexical_index(path=None):
+    """BM25 index over the chunks of load_index(path), rebuilt when the file changes."""
+    global _lexical, _lexical_key
+    chunks, _ = load_index(path)
+    with _index_lock:
+        if _lexical_key != _index_key:
+            with span("policy.lexical_index_build", chunks=len(chunks)):
+                _lexical = BM25Index([chunk["text"] for chunk in chunks])
+            _lexical_key = _index_key
+        return _lexical
+
+def get_query_embedding(query, model=None, dimensions=None):
+    """Embed the query with `model` (default EMBEDDING_MODEL), optionally shortened to `dimensions`."""
+    import numpy as np
+    import openai
+
+    model = model or settings.EMBEDDING_MODEL
+    cache_key = (model, dimensions, query)
+    with span("policy.query_embedding") as sp:
+        cached = EMBEDDING_CACHE.get(cache_key)
+        sp.set_attribute("cache.hit", cached is not None)
+        record_cache_lookup("embedding", cached is not None)
+        if cached is not None:
+            return cached
+        try:
+            embedding = create_embedding(query, model, dimensions)
+        except openai.AuthenticationError:
+            print(
+                "OpenAI authentication failed. Please set the OPENAI_API_KEY environment variable with a valid API key."
+            )
+            return None
+        embedding = np.array(embedding, dtype=np.float32)
+        EMBEDDING_CACHE[cache_key] = embedding
+        return embedding
 
 def cosine_sim(a, b):
+    import numpy as np
+
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9)
 
-def search_embeddings(query, top_k=3):
-    """Semantic search with OpenAI embeddings."""
-    with open(DOC_EMBEDDINGS_PATH, "r", encoding="utf-8") as f:
-        embeddings = json.load(f)
-    # Get embedding for query
-    query_emb = get_query_embedding(query)
-    if query_emb is None:
-        return []
-    # For each doc chunk, compute similarity
-    results = []
-    for chunk in embeddings:
-        chunk_emb = np.array(chunk["embedding"], dtype=np.float32)
-        sim = cosine_sim(query_emb, chunk_emb)
-        results.append({
-            "similarity": float(sim),
-            "chunk": chunk.get("text", ""),         # <-- changed "chunk" to "text"
-            "document": chunk.get("source", ""),    # <-- changed "document" to "source"
-        })
-
-    # Sort by similarity descending, return top_k
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-    return results[:top_k]
+def _result(chunk, method, score, similarity=None):
+    return {
+        "similarity": similarity,
+        "score": score,
+        "method": method,
+        "chunk": chunk["text"],
+        "document": chunk["source"],
+    }
+
+
+def search_embeddings(query, top_k=3, mode=None):
+    """
+    Policy search. In "hybrid" mode (POLICY_SEARCH_MODE) BM25 and cosine
+    rankings are fused with reciprocal rank fusion. A confident BM25 hit is
+    returned without the embedding call, and BM25 results are also returned
+    if the embedding call fails. "vector" and "lexical" use one ranking only.
+
+    Each result has `chunk`, `document`, `method`, the ranking `score` and the
+    cosine `similarity` (None for results found without an embedding).
+    """
+    import numpy as np
+
+    mode = mode or settings.POLICY_SEARCH_MODE
+    with span("policy.search", top_k=top_k, mode=mode) as sp:
+        chunks, matrix = load_index()
+        if not chunks or top_k <= 0:
+            return []
+        candidates = max(4 * top_k, 20)
+
+        lexical = []
+        if mode != "vector":
+            with span("policy.lexical_scan", chunks=len(chunks)):
+                lexical = load_lexical_index().search(query, candidates)
+            if mode == "lexical" or is_confident(lexical, settings.LEXICAL_FASTPATH_MARGIN):
+                sp.set_attribute("policy.path", "lexical")
+                return [_result(chunks[i], "lexical", score) for i, score, _ in lexical[:top_k]]
+
+        try:
+            # Query vectors must match the model and size the index was built with.
+            query_emb = get_query_embedding(query, _index_meta.get("model"), _index_meta.get("dimensions"))
+        except Exception as e:
+            if not lexical:
+                raise
+            logger.warning("Query embedding failed (%s); answering from the lexical index", e)
+            query_emb = None
+        if query_emb is None:
+            sp.set_attribute("policy.path", "lexical_fallback")
+            return [_result(chunks[i], "lexical", score) for i, score, _ in lexical[:top_k]]
+
+        # Rows are pre-normalized, so one matrix-vector product gives the cosine similarities
+        with span("policy.index_scan", chunks=len(chunks)):
+            query_emb = query_emb / (np.linalg.norm(query_emb) + 1e-9)
+            sims = matrix @ query_emb
+            quantized = isinstance(matrix, QuantizedMatrix)
+            k = min(top_k if mode == "vector" and not quantized else candidates, len(chunks))
+            top = np.argpartition(-sims, k - 1)[:k]
+            if quantized:
+                # Approximate scan, then exact float32 scores for the candidates.
+                with span("policy.rerank", candidates=len(top)):
+                    sims[top] = matrix.rerank(top, query_emb)
+            top = top[np.argsort(-sims[top])]
+        if mode == "vector" or not lexical:
+            sp.set_attribute("policy.path", "vector")
+            return [_result(chunks[i], "vector", float(sims[i]), float(sims[i])) for i in top[:top_k]]
+
+        sp.set_attribute("policy.path", "hybrid")
+        fused = reciprocal_rank_fusion([top.tolist(), [i for i, _, _ in lexical]])[:top_k]
+        return [_result(chunks[i], "hybrid", score, float(sims[i])) for i, score in fused]
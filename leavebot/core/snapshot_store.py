@@ -0,0 +1,110 @@
+# snapshot_store.py
+"""
+Local snapshot store for ChatEngine sessions.
+
+Snapshots are pickled with protocol 5, zlib-compressed and kept in a SQLite
+table keyed by (emp_id, session_id), so a restarted Streamlit worker or a
+reloaded page can resume a session without repeating the ERP calls. The
+file is local and written only by LeaveBot; never point it at untrusted data.
+Every page visit without a session id starts a new session, so `save()`
+also deletes snapshots older than SNAPSHOT_MAX_AGE_S, at most once per
+PURGE_INTERVAL_S per store.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from leavebot.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    emp_id     INTEGER NOT NULL,
+    session_id TEXT    NOT NULL,
+    saved_at   REAL    NOT NULL,
+    payload    BLOB    NOT NULL,
+    PRIMARY KEY (emp_id, session_id)
+)
+"""
+
+# How often save() deletes snapshots too old to be resumed.
+PURGE_INTERVAL_S = 3600
+
+
+class SnapshotStore:
+    def __init__(self, path=None):
+        self.path = path or settings.SNAPSHOT_DB_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._purged_at = None  # monotonic time of the last purge
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not shareable by default.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+        return conn
+
+    @staticmethod
+    def encode(state):
+        return zlib.compress(pickle.dumps(state, protocol=5), 1)
+
+    @staticmethod
+    def decode(payload):
+        return pickle.loads(zlib.decompress(payload))
+
+    def save(self, emp_id, session_id, state):
+        """
+        Insert or replace the snapshot; returns its size in bytes. The first
+        save, and then one every PURGE_INTERVAL_S, also purges expired snapshots.
+        """
+        payload = self.encode(state)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (emp_id, session_id, saved_at, payload) VALUES (?, ?, ?, ?)",
+                (int(emp_id), str(session_id), time.time(), payload),
+            )
+        now = time.monotonic()
+        if self._purged_at is None or now - self._purged_at >= PURGE_INTERVAL_S:
+            self._purged_at = now
+            self.purge(settings.SNAPSHOT_MAX_AGE_S)
+        return len(payload)
+
+    def load(self, emp_id, session_id, max_age=None):
+        """
+        Return (saved_at, state), or None when missing or older than `max_age` seconds.
+        """
+        row = self._connect().execute(
+            "SELECT saved_at, payload FROM snapshots WHERE emp_id = ? AND session_id = ?",
+            (int(emp_id), str(session_id)),
+        ).fetchone()
+        if row is None:
+            return None
+        saved_at, payload = row
+        if max_age is not None and time.time() - saved_at > max_age:
+            return None
+        return saved_at, self.decode(payload)
+
+    def delete(self, emp_id, session_id=None):
+        """Delete one session's snapshot, or every snapshot of the employee."""
+        with self._connect() as conn:
+            if session_id is None:
+                cur = conn.execute("DELETE FROM snapshots WHERE emp_id = ?", (int(emp_id),))
+            else:
+                cur = conn.execute(
+                    "DELETE FROM snapshots WHERE emp_id = ? AND session_id = ?", (int(emp_id), str(session_id))
+                )
+        return cur.rowcount
+
+    def purge(self, older_than):
+        """Delete snapshots saved more than `older_than` seconds ago."""
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM snapshots WHERE saved_at < ?", (time.time() - older_than,))
+        return cur.rowcount
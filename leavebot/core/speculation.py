@@ -0,0 +1,130 @@
+# speculation.py
+"""
+Speculative tool execution.
+
+Before the first completion of a turn, the tools the model is likely to call
+are started on a small shared thread pool. When the model then asks for one
+of them with the same arguments, the running (or finished) result is used
+instead of starting the call again. Unused runs are counted as waste: queued
+ones are cancelled, running ones are left to finish and their time is
+recorded. Tools whose speculative runs are rarely used stop being speculated.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import deadline
+from .cache_utils import note_stale, pop_stale_notes
+from .log_utils import get_logger
+from .metrics import SPECULATIVE_RUNS, SPECULATIVE_WASTED_SECONDS
+from .tracing import span
+
+logger = get_logger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_POOL_WORKERS = 4
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=_POOL_WORKERS, thread_name_prefix="speculative-tool")
+    return _pool
+
+
+def _outcomes(tool):
+    hits = SPECULATIVE_RUNS.value(tool=tool, outcome="hit")
+    misses = SPECULATIVE_RUNS.value(tool=tool, outcome="wasted") + SPECULATIVE_RUNS.value(tool=tool, outcome="failed")
+    return hits, hits + misses
+
+
+def hit_rate(tool):
+    """Fraction of finished speculative runs of `tool` that the model used, or None before any ran."""
+    hits, total = _outcomes(tool)
+    return hits / total if total else None
+
+
+def worth_speculating(tool, min_hit_rate, min_samples):
+    """False once `tool` has at least `min_samples` finished runs and a hit rate below `min_hit_rate`."""
+    hits, total = _outcomes(tool)
+    return total < max(1, min_samples) or hits / total >= min_hit_rate
+
+
+class Speculation:
+    """
+    Speculative runs for one turn.
+
+    Args:
+        calls: [(key, tool_name, fn)]; `key` identifies the call (tool name
+            plus canonical arguments) and `fn()` runs it.
+    """
+
+    def __init__(self, calls):
+        self._futures = {}
+        self._tools = {}
+        self._taken = set()
+        pool = _get_pool()
+        turn_deadline = deadline.current()
+        for key, tool, fn in calls:
+            if key in self._futures:
+                continue
+            self._tools[key] = tool
+            self._futures[key] = pool.submit(self._timed, tool, fn, turn_deadline)
+
+    @staticmethod
+    def _timed(tool, fn, turn_deadline):
+        # Staleness notes are per thread, so they travel back with the result.
+        pop_stale_notes()
+        start = time.perf_counter()
+        with deadline.deadline_scope(at=turn_deadline), span("chat.speculative_tool", **{"tool.name": tool}):
+            result = fn()
+        return result, time.perf_counter() - start, pop_stale_notes()
+
+    def __len__(self):
+        return len(self._futures)
+
+    def take(self, key):
+        """
+        Return (True, result) when `key` was run speculatively and succeeded,
+        waiting for it (until the turn deadline) if it is still running;
+        (False, None) otherwise.
+        """
+        future = self._futures.get(key)
+        if future is None or key in self._taken:
+            return False, None
+        self._taken.add(key)
+        tool = self._tools[key]
+        try:
+            result, _, stale_notes = future.result(deadline.remaining())
+        except Exception as e:
+            SPECULATIVE_RUNS.inc(tool=tool, outcome="failed")
+            logger.warning("Speculative %s failed, running it again: %s", tool, e)
+            return False, None
+        for source, saved_at in stale_notes.items():
+            note_stale(source, saved_at)
+        SPECULATIVE_RUNS.inc(tool=tool, outcome="hit")
+        return True, result
+
+    def finish(self):
+        """Cancel or account for the runs the model did not ask for. Returns the number wasted."""
+        wasted = 0
+        for key, future in self._futures.items():
+            if key in self._taken:
+                continue
+            tool = self._tools[key]
+            if future.cancel():
+                SPECULATIVE_RUNS.inc(tool=tool, outcome="cancelled")
+                continue
+            wasted += 1
+            future.add_done_callback(lambda f, tool=tool: self._record_waste(tool, f))
+        self._taken.update(self._futures)
+        return wasted
+
+    @staticmethod
+    def _record_waste(tool, future):
+        SPECULATIVE_RUNS.inc(tool=tool, outcome="wasted")
+        if future.exception() is None:
+            SPECULATIVE_WASTED_SECONDS.inc(future.result()[1], tool=tool)
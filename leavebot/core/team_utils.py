@@ -0,0 +1,126 @@
+# team_utils.py
+"""
+Team aggregates for managers, computed with pandas over one frame that
+holds every direct report's leave history. pandas is imported on first use.
+"""
+from datetime import date
+
+from .employee_utils import employee_contact_summary
+from .schema import parse_date, parse_number, value_of
+
+TEAM_COLUMNS = ["emp_id", "name", "code", "description", "status", "days", "from_date", "to_date"]
+
+
+def team_member_names(reports):
+    """Return {emp_id: display name} for a list of employee records."""
+    names = {}
+    for rec in reports:
+        emp_id = rec.get("Emp_ID_N")
+        try:
+            emp_id = int(emp_id)
+        except (TypeError, ValueError):
+            pass
+        names[emp_id] = rec.get("Emp_EFullName_V") or rec.get("Emp_EDisplayName_V") or str(emp_id)
+    return names
+
+
+def team_members(reports):
+    """Contact summary of each direct report."""
+    return [employee_contact_summary(rec) for rec in reports]
+
+
+def team_frame(reports, histories):
+    """
+    Build one DataFrame (TEAM_COLUMNS plus `approved`) from {emp_id: leave records}.
+    Dates and days are parsed here once for every aggregate below.
+    """
+    import pandas as pd
+
+    names = team_member_names(reports)
+    rows = [
+        (
+            emp_id,
+            names.get(emp_id, str(emp_id)),
+            rec.get("LeaveGrid_Lvm_Code_V"),
+            rec.get("LeaveGrid_Lvm_Description_V") or rec.get("LeaveGrid_Lvm_Code_V"),
+            (rec.get("LeaveGrid_Status") or "").strip(),
+            value_of(rec, "LeaveGrid_Ela_Tot", parse_number),
+            value_of(rec, "LeaveGrid_Ela_FromDate_D", parse_date),
+            value_of(rec, "LeaveGrid_Ela_ToDate_D", parse_date),
+        )
+        for emp_id, records in histories.items()
+        for rec in records
+    ]
+    df = pd.DataFrame.from_records(rows, columns=TEAM_COLUMNS)
+    df["days"] = pd.to_numeric(df["days"], errors="coerce").fillna(0.0)
+    df["from_date"] = pd.to_datetime(df["from_date"], errors="coerce")
+    df["to_date"] = pd.to_datetime(df["to_date"], errors="coerce")
+    df["approved"] = df["status"].str.lower() == "approved"
+    return df
+
+
+def team_pending_leaves(df, status=None):
+    """Non-approved applications across the team, earliest first."""
+    pending = df[~df["approved"]]
+    if status:
+        pending = pending[pending["status"].str.lower() == status.strip().lower()]
+    pending = pending.sort_values("from_date")
+    return [
+        {
+            "name": row.name,
+            "leave": row.description,
+            "from": row.from_date.date().isoformat() if not _is_missing(row.from_date) else "",
+            "to": row.to_date.date().isoformat() if not _is_missing(row.to_date) else "",
+            "status": row.status,
+        }
+        for row in pending.itertuples(index=False)
+    ]
+
+
+def team_leave_summary(df):
+    """
+    Approved days per member and leave type, plus team totals per type:
+    {"by_member": {name: {leave: days}}, "team_total": {leave: days}}.
+    """
+    approved = df[df["approved"]]
+    by_member = approved.groupby(["name", "description"])["days"].sum()
+    totals = approved.groupby("description")["days"].sum()
+    summary = {}
+    for (name, leave), days in by_member.items():
+        summary.setdefault(name, {})[leave] = float(days)
+    return {"by_member": summary, "team_total": {leave: float(days) for leave, days in totals.items()}}
+
+
+def team_on_leave(df, today=None):
+    """Names of members on approved leave today."""
+    import pandas as pd
+
+    today = pd.Timestamp(today or date.today())
+    on_leave = df[df["approved"] & (df["from_date"] <= today) & (df["to_date"] >= today)]
+    return sorted(on_leave["name"].unique().tolist())
+
+
+def team_balance_totals(balances, reports):
+    """
+    Sum one leave type's balances over the team:
+    {"by_member": {name: balance}, "total": float, "missing": [names without a balance]}.
+    """
+    import pandas as pd
+
+    names = team_member_names(reports)
+    series = pd.Series(
+        {names.get(emp_id, str(emp_id)): (bal.get("Balance") if bal else None) for emp_id, bal in balances.items()},
+        dtype="object",
+    )
+    values = pd.to_numeric(series, errors="coerce")
+    return {
+        "by_member": {name: float(v) for name, v in values.dropna().items()},
+        "total": float(values.sum()),
+        "missing": sorted(values[values.isna()].index.tolist()),
+    }
+
+
+def _is_missing(value):
+    import pandas as pd
+
+    return pd.isna(value)
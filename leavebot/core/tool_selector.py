@@ -0,0 +1,88 @@
+# tool_selector.py
+"""
+Per-turn tool subset selection.
+
+Every tool schema sent with a completion costs prompt tokens, on the first
+call and on every follow-up inside the tool loop. The selector scores the
+tools against the user's question with BM25 over each tool's name,
+description and keywords (local, no network) and sends only the relevant
+ones. When nothing matches it falls back to the full set.
+"""
+import json
+import threading
+
+from .lexical_index import BM25Index
+
+
+def tool_name(schema):
+    return schema["function"]["name"]
+
+
+def tool_text(schema, keywords=()):
+    """Searchable text of one tool: name words, description, parameter descriptions, keywords."""
+    function = schema["function"]
+    params = function.get("parameters", {}).get("properties", {})
+    parts = [function["name"].replace("_", " "), function.get("description", "")]
+    parts.extend(p.get("description", "") for p in params.values())
+    parts.extend(keywords)
+    return " ".join(parts)
+
+
+class ToolSelector:
+    """
+    Chooses the tools to send for a question.
+
+    Args:
+        tools: full list of tool schemas, in the order they should be sent.
+        keywords: {tool name: [extra words or phrases users say for it]}.
+        always: tool names included whenever a subset is sent.
+        max_tools: most matched tools to send (not counting `always`).
+        min_ratio: drop matches scoring below this fraction of the best match.
+    """
+
+    def __init__(self, tools, keywords=None, always=(), max_tools=4, min_ratio=0.3):
+        keywords = keywords or {}
+        self.tools = list(tools)
+        self.names = [tool_name(t) for t in self.tools]
+        self.always = [name for name in self.names if name in set(always)]
+        self.max_tools = max_tools
+        self.min_ratio = min_ratio
+        self._index = BM25Index([tool_text(t, keywords.get(tool_name(t), ())) for t in self.tools])
+        # Each schema is serialized once; subset sizes are summed from these.
+        self.schema_chars = {tool_name(t): len(json.dumps(t)) for t in self.tools}
+        self._subsets = {frozenset(self.names): self.tools}
+        self._lock = threading.Lock()
+
+    def match(self, question):
+        """Names of matching tools, best first (without `always`)."""
+        results = self._index.search(question, top_k=self.max_tools)
+        if not results:
+            return []
+        best = results[0][1]
+        return [self.names[doc] for doc, score, _ in results if score >= self.min_ratio * best]
+
+    def select(self, question):
+        """
+        Tool schemas to send for `question`. Returns the full list when no tool
+        matches. The same list object is returned for the same subset, so
+        callers can reuse anything derived from it.
+        """
+        matched = self.match(question)
+        if not matched:
+            return self.tools
+        return self.subset(matched + self.always)
+
+    def subset(self, names):
+        """Cached list of the schemas named in `names`, in the original order."""
+        key = frozenset(names)
+        with self._lock:
+            tools = self._subsets.get(key)
+            if tools is None:
+                tools = [t for t in self.tools if tool_name(t) in key]
+                self._subsets[key] = tools
+            return tools
+
+    def schema_tokens(self, tools=None):
+        """Approximate prompt tokens of `tools` (default: the full set), ~4 characters per token."""
+        tools = self.tools if tools is None else tools
+        return sum(self.schema_chars[tool_name(t)] for t in tools) // 4
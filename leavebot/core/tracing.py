@@ -0,0 +1,204 @@
+# tracing.py
+"""
+Lightweight span tracing for LeaveBot.
+
+Spans nest per thread. When a root span (normally one chat turn) finishes,
+the whole trace is handed to the configured exporter as an OpenTelemetry
+(OTLP/JSON) payload and a one-line latency summary is logged.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from leavebot.config import settings
+from .log_utils import get_logger, log_event
+
+logger = get_logger("leavebot.tracing")
+
+_local = threading.local()
+_exporter = None
+_exporter_configured = False
+
+
+class Span:
+    """A timed operation with attributes; create via `span()`."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "error", "_trace")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        if parent is None:
+            self.trace_id = os.urandom(16).hex()
+            self.parent_id = None
+            self._trace = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self._trace = parent._trace
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        """Return this span in OTLP/JSON span form."""
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def to_otlp_payload(spans, service_name="leavebot"):
+    """Wrap finished spans in an OTLP `resourceSpans` export request."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "leavebot"},
+                "spans": [s.to_otlp() for s in spans],
+            }],
+        }]
+    }
+
+
+class FileSpanExporter:
+    """Append one OTLP/JSON export request per trace to a local file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        line = json.dumps(to_otlp_payload(spans))
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPHttpExporter:
+    """POST traces to an OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces."""
+
+    def __init__(self, endpoint, timeout=2):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans):
+        import requests
+        try:
+            requests.post(self.endpoint, json=to_otlp_payload(spans), timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning("Trace export to %s failed: %s", self.endpoint, e)
+
+
+def set_exporter(exporter):
+    """Install an exporter (anything with `export(spans)`), or None to disable."""
+    global _exporter, _exporter_configured
+    _exporter = exporter
+    _exporter_configured = True
+
+
+def get_exporter():
+    global _exporter, _exporter_configured
+    if not _exporter_configured:
+        if settings.TRACE_EXPORT_ENDPOINT:
+            _exporter = OTLPHttpExporter(settings.TRACE_EXPORT_ENDPOINT)
+        elif settings.TRACE_EXPORT_PATH:
+            _exporter = FileSpanExporter(settings.TRACE_EXPORT_PATH)
+        _exporter_configured = True
+    return _exporter
+
+
+def current_span():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child of the current span (or as a new trace root).
+
+    Usage:
+        with span("erp.fetch_employee_details", emp_id=emp_id) as sp:
+            sp.set_attribute("cache.hit", False)
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    sp = Span(name, stack[-1] if stack else None, attributes)
+    stack.append(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.end_ns = time.time_ns()
+        stack.pop()
+        sp._trace.append(sp)
+        if sp.parent_id is None:
+            _finish_trace(sp)
+
+
+def summarize_trace(root):
+    """Return a per-span-name latency breakdown (ms, count) plus token totals."""
+    breakdown = {}
+    tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+    for s in root._trace:
+        if s is root:
+            continue
+        entry = breakdown.setdefault(s.name, {"ms": 0.0, "count": 0})
+        entry["ms"] = round(entry["ms"] + s.duration_ms, 3)
+        entry["count"] += 1
+        for key in tokens:
+            tokens[key] += int(s.attributes.get(f"llm.usage.{key}", 0) or 0)
+    return {
+        "trace_id": root.trace_id,
+        "name": root.name,
+        "duration_ms": round(root.duration_ms, 3),
+        "error": root.error,
+        "breakdown": breakdown,
+        **tokens,
+    }
+
+
+def _finish_trace(root):
+    log_event(logger, "trace.summary", **summarize_trace(root))
+    exporter = get_exporter()
+    if exporter is not None:
+        try:
+            exporter.export(list(root._trace))
+        except Exception as e:
+            logger.warning("Trace export failed: %s", e)
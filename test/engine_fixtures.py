@@ -0,0 +1,38 @@
+"""Shared fixture for tests that drive a ChatEngine with its ERP fetchers mocked."""
+from unittest import mock
+
+from leavebot.api import fetch_leave_balance as balance_api
+from leavebot.chatbot import chat_engine
+
+LEAVE_TYPES = [
+    {"Lvm_ID_N": 1, "Lpd_ID_N": 11, "Lvm_Code_V": "AL", "Lvm_Description_V": "Annual Leave"},
+    {"Lvm_ID_N": 2, "Lpd_ID_N": 12, "Lvm_Code_V": "SL", "Lvm_Description_V": "Sick Leave"},
+]
+EMPLOYEE = [{"Emp_ID_N": 7, "Emp_ReportingToID_N": 9, "Emp_EFullName_V": "Test User"}]
+
+
+def _fake(value):
+    return value if isinstance(value, mock.Mock) else mock.Mock(return_value=value)
+
+
+def patch_engine_fetchers(test, employee=EMPLOYEE, leave_types=LEAVE_TYPES, history=None, balance=None):
+    """
+    Replace the ERP fetchers ChatEngine calls with mocks until `test` ends.
+
+    Each argument is the value the fetcher returns, or a Mock used as it is.
+    `history` defaults to no leave records and `balance` to {"Balance": 5}
+    for every leave type. Returns {fetcher name: mock}.
+    """
+    fakes = {
+        "fetch_employee_details": _fake(employee),
+        "fetch_leave_types": _fake(leave_types),
+        "fetch_leave_history": _fake([] if history is None else history),
+        "fetch_leave_balance": _fake({"Balance": 5} if balance is None else balance),
+    }
+    for name, fake in fakes.items():
+        # Balances are fetched through fetch_leave_balances, which looks the name up in its own module.
+        module = balance_api if name == "fetch_leave_balance" else chat_engine
+        patcher = mock.patch.object(module, name, fake)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return fakes
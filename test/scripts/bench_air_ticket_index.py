@@ -0,0 +1,114 @@
+"""
+Benchmark the organisation-wide air-ticket index against per-employee air_ticket_info.
+
+Synthesizes an organisation of projected balances and leave histories (as
+the caches hold them), then times: the per-employee loop, the one-pass
+build, "eligible in the next N days" range queries, and incremental updates.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from leavebot.core.air_ticket_index import AirTicketIndex  # noqa: E402
+from leavebot.core.air_ticket_utils import air_ticket_info  # noqa: E402
+from leavebot.core.schema import LeaveBalance, LeaveRecord  # noqa: E402
+
+
+def make_org(employees, records_per_employee=12, seed=0):
+    """Return ({emp_id: {Lpd_ID_N: LeaveBalance}}, {emp_id: [LeaveRecord]})."""
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    balances, histories = {}, {}
+    for emp_id in range(1, employees + 1):
+        anniversary = start + timedelta(days=rng.randrange(3650))
+        balances[emp_id] = {
+            11: LeaveBalance.from_erp({
+                "Balance": rng.randrange(30), "Lvm_Code_V": "AL", "Emp_AnnivDate_D": anniversary.isoformat(),
+                "Airticket": "1" if rng.random() < 0.8 else "0", "AirTicketPercent": rng.choice((50, 100)),
+            }),
+            12: LeaveBalance.from_erp({"Balance": rng.randrange(15), "Lvm_Code_V": "SL", "Airticket": "0"}),
+        }
+        records = []
+        for _ in range(records_per_employee):
+            from_date = date(2022, 1, 1) + timedelta(days=rng.randrange(1400))
+            records.append(LeaveRecord.from_erp({
+                "Emp_ID_N": emp_id, "LeaveGrid_Lvm_ID_N": 1, "LeaveGrid_Status": "Approved",
+                "LeaveGrid_Ela_Tot": rng.randrange(1, 10), "LeaveGrid_Ela_FromDate_D": from_date.isoformat(),
+                "Ela_AirTicketReq_N": "1" if rng.random() < 0.15 else "0",
+            }))
+        histories[emp_id] = records
+    return balances, histories
+
+
+def run(employees=10000, records_per_employee=12, window_days=60, queries=1000, updates=1000, seed=0):
+    """Time each stage; returns a dict of seconds and counts."""
+    import pandas  # noqa: F401  (imported lazily by the index; keep the import out of the timings)
+
+    balances, histories = make_org(employees, records_per_employee, seed)
+
+    start = time.perf_counter()
+    scalar = {emp_id: air_ticket_info(balances[emp_id], histories[emp_id]) for emp_id in balances}
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = AirTicketIndex.build(balances, histories)
+    build_s = time.perf_counter() - start
+    mismatches = sum(1 for emp_id, info in scalar.items() if index.get(emp_id) != info)
+
+    today = date.today()
+    start = time.perf_counter()
+    for i in range(queries):
+        due = index.eligible_within(window_days, today + timedelta(days=i % 365))
+    query_s = (time.perf_counter() - start) / queries
+
+    rng = random.Random(seed + 1)
+    start = time.perf_counter()
+    for _ in range(updates):
+        emp_id = rng.randrange(1, employees + 1)
+        claim = LeaveRecord.from_erp({
+            "LeaveGrid_Ela_FromDate_D": (today - timedelta(days=rng.randrange(700))).isoformat(),
+            "Ela_AirTicketReq_N": "1",
+        })
+        histories[emp_id] = histories[emp_id] + [claim]
+        index.update(emp_id, balances[emp_id], histories[emp_id])
+    update_s = (time.perf_counter() - start) / updates
+
+    return {
+        "employees": employees,
+        "loop_s": loop_s,
+        "build_s": build_s,
+        "mismatches": mismatches,
+        "window_days": window_days,
+        "due_in_window": len(due),
+        "query_s": query_s,
+        "update_s": update_s,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--records", type=int, default=12, help="Leave records per employee")
+    parser.add_argument("--days", type=int, default=60, help="Eligibility window for range queries")
+    args = parser.parse_args(argv)
+
+    result = run(args.employees, args.records, args.days)
+    print(f"Employees: {result['employees']}")
+    print(f"Per-employee air_ticket_info loop: {result['loop_s'] * 1000:8.1f} ms")
+    print(f"Batch build (frame + index):       {result['build_s'] * 1000:8.1f} ms "
+          f"({result['mismatches']} mismatches with the loop)")
+    print(f"Eligible in next {result['window_days']} days: {result['due_in_window']} employees, "
+          f"{result['query_s'] * 1e6:.1f} us per query")
+    print(f"Incremental update:                {result['update_s'] * 1e6:8.1f} us per employee")
+
+
+if __name__ == "__main__":
+    main()
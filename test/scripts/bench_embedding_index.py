@@ -0,0 +1,135 @@
+"""
+Benchmark reduced-dimension and quantized policy indexes against full-precision search.
+
+Loads the full-precision vectors of the policy index (DOC_EMBEDDINGS_PATH or
+--index) and compares truncated dimensions x {none, float16, int8}. For each
+setting it reports matrix size, median query latency and top-k agreement
+with the float32 full-dimension ranking. Queries are corpus vectors plus
+noise, so no embedding calls are made. --synthetic N benchmarks N random
+vectors instead of a corpus.
+"""
+import argparse
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from leavebot.core.quantization import QUANTIZATIONS, QuantizedMatrix, quantize, truncate  # noqa: E402
+
+
+def load_vectors(path):
+    """Return the float32 vectors of a .npz/.json index (or its float32 sidecar)."""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as data:
+            if "embeddings" in data:
+                return data["embeddings"].astype(np.float32)
+        return np.load(f"{path}.f32.npy").astype(np.float32)
+    import json
+
+    with open(path, "r", encoding="utf-8") as f:
+        return np.array([chunk["embedding"] for chunk in json.load(f)], dtype=np.float32)
+
+
+def synthetic_vectors(count, dim=3072, clusters=50, seed=0):
+    """
+    Clustered random vectors, roughly shaped like a policy corpus. Variance
+    decays along the dimensions, as in text-embedding-3 vectors whose leading
+    components carry most of the signal.
+    """
+    rng = np.random.default_rng(seed)
+    decay = 1.0 / np.sqrt(1.0 + np.arange(dim) / 32.0)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(size=(count, dim))
+    return (vectors * decay).astype(np.float32)
+
+
+def make_queries(vectors, count, noise=0.5, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    return (picks + noise * np.abs(picks).mean() * rng.normal(size=picks.shape)).astype(np.float32)
+
+
+def search(matrix, query, top_k, rerank_depth):
+    """Top-k rows for one normalized query, using the same scan + rerank as search_embeddings."""
+    sims = matrix @ query
+    k = min(max(top_k, rerank_depth) if isinstance(matrix, QuantizedMatrix) else top_k, len(sims))
+    top = np.argpartition(-sims, k - 1)[:k]
+    if isinstance(matrix, QuantizedMatrix):
+        sims[top] = matrix.rerank(top, query)
+    return top[np.argsort(-sims[top])][:top_k]
+
+
+def build(vectors, dimensions, method):
+    full = truncate(vectors, dimensions)
+    if method == "none":
+        return full
+    codes, scales = quantize(full, method)
+    return QuantizedMatrix(codes, scales, full)
+
+
+def run(vectors, queries, dims_list, methods, top_k=5, rerank_depth=20):
+    """
+    Returns:
+        list[dict]: one row per (dimensions, method) with bytes, p50 latency (ms)
+        and recall@k against the float32 full-dimension baseline.
+    """
+    baseline_matrix = truncate(vectors, None)
+    baseline_queries = truncate(queries, None)
+    baseline = [set(search(baseline_matrix, q, top_k, rerank_depth)) for q in baseline_queries]
+    rows = []
+    for dims in dims_list:
+        shaped_queries = truncate(queries, dims)
+        for method in methods:
+            matrix = build(vectors, dims, method)
+            timings, agreement = [], 0.0
+            for query, expected in zip(shaped_queries, baseline):
+                start = time.perf_counter()
+                top = search(matrix, query, top_k, rerank_depth)
+                timings.append(time.perf_counter() - start)
+                agreement += len(expected & set(top)) / top_k
+            rows.append({
+                "dimensions": matrix.shape[1],
+                "method": method,
+                "bytes": matrix.nbytes,
+                "p50_ms": float(np.median(timings)) * 1000,
+                "recall": agreement / len(baseline),
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=None, help="Index file (default: DOC_EMBEDDINGS_PATH)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of an index")
+    parser.add_argument("--dims", default="0,1024,512,256", help="Comma-separated dimensions (0 = full)")
+    parser.add_argument("--methods", default=",".join(QUANTIZATIONS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rerank-depth", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic)
+    else:
+        from leavebot.config import settings
+
+        vectors = load_vectors(args.index or settings.DOC_EMBEDDINGS_PATH)
+    queries = make_queries(vectors, args.queries)
+    dims_list = [int(d) or None for d in args.dims.split(",")]
+    rows = run(vectors, queries, dims_list, args.methods.split(","), args.top_k, args.rerank_depth)
+
+    print(f"{len(vectors)} vectors, {args.queries} queries, recall@{args.top_k} vs float32 full dimensions")
+    print(f"{'dims':>6} {'method':>8} {'size KiB':>10} {'p50 ms':>8} {'recall':>7}")
+    for row in rows:
+        print(f"{row['dimensions']:>6} {row['method']:>8} {row['bytes'] / 1024:>10.1f} "
+              f"{row['p50_ms']:>8.3f} {row['recall']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare turn latency, LLM calls and tokens with and without the inline fact sheet.
+
+Each question in questions.txt is asked twice for the employee: once in
+tool-loop mode and once with the fact sheet in the system prompt. Data is
+preloaded first, so only the LLM round trips are measured.
+"""
+import argparse
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+for path in (REPO_ROOT, os.path.dirname(SCRIPT_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from leavebot.chatbot.chat_engine import ChatEngine  # noqa: E402
+from leavebot.core.tracing import summarize_trace  # noqa: E402
+from scripts.test_chatbot_batch import QUESTIONS_FILE, ask_each, load_questions, summarize_runs  # noqa: E402
+
+MODES = {"tools": False, "fact_sheet": True}
+
+
+def run_mode(engine, questions, use_fact_sheet):
+    """Ask every question once; returns one record per question."""
+    engine.use_fact_sheet = use_fact_sheet
+    records = []
+    for record, root in ask_each(engine, questions, "bench.fact_sheet_turn", fact_sheet=use_fact_sheet):
+        calls = summarize_trace(root)["breakdown"].get("llm.chat_completion", {}).get("count", 0)
+        records.append({**record, "llm_calls": calls})
+    return records
+
+
+def summarize(records):
+    count = len(records) or 1
+    return {**summarize_runs(records), "mean_llm_calls": sum(r["llm_calls"] for r in records) / count}
+
+
+def compare(engine, questions, budget=None):
+    """Return {mode: summary} for the tool-loop and fact-sheet modes; `budget` sizes the sheet."""
+    engine.fact_sheet_budget = budget
+    return {mode: summarize(run_mode(engine, questions, flag)) for mode, flag in MODES.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("emp_id", type=int)
+    parser.add_argument("--questions-file", default=QUESTIONS_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N questions")
+    parser.add_argument("--budget", type=int, default=None, help="Fact sheet token budget")
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.questions_file)
+    if args.limit:
+        questions = questions[: args.limit]
+    engine = ChatEngine()
+    engine.preload_data(args.emp_id)
+    sheet = engine.fact_sheet(args.budget)
+    print(f"Fact sheet ({len(sheet)} chars):\n{sheet}\n")
+
+    results = compare(engine, questions, args.budget)
+    print(f"{'mode':>11} {'p50 s':>7} {'p90 s':>7} {'LLM calls':>10} {'prompt tok':>11} {'compl tok':>10} {'errors':>7}")
+    for mode, s in results.items():
+        print(f"{mode:>11} {s['p50_s']:>7.2f} {s['p90_s']:>7.2f} {s['mean_llm_calls']:>10.2f} "
+              f"{s['mean_prompt_tokens']:>11.0f} {s['mean_completion_tokens']:>10.0f} {s['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Import-time benchmark for LeaveBot modules, based on `python -X importtime`."""
+import argparse
+import os
+import subprocess
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+
+# Dependencies that must only load on first use, never at import time.
+HEAVY_MODULES = ("openai", "numpy", "pandas", "requests", "dotenv")
+
+
+def measure_import(module, python=sys.executable):
+    """
+    Import `module` in a fresh interpreter under -X importtime.
+
+    Returns:
+        dict: {module_name: (self_us, cumulative_us)} for every module imported.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def heavy_imports(timings):
+    """Return the top-level HEAVY_MODULES that were imported."""
+    return sorted({name.split(".")[0] for name in timings} & set(HEAVY_MODULES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("module", nargs="?", default="leavebot.chatbot.chat_engine")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    totals = []
+    for _ in range(args.runs):
+        timings = measure_import(args.module)
+        totals.append(timings[args.module][1] / 1000)
+    totals.sort()
+    print(f"{args.module}: median {totals[len(totals) // 2]:.1f} ms, min {totals[0]:.1f} ms over {args.runs} runs")
+    print(f"heavy dependencies imported: {', '.join(heavy_imports(timings)) or 'none'}")
+    print(f"\nslowest modules (cumulative ms):")
+    for name, (_, cumulative) in sorted(timings.items(), key=lambda kv: -kv[1][1])[: args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+    if args.budget_ms is not None and totals[0] > args.budget_ms:
+        print(f"\nFAIL: {totals[0]:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
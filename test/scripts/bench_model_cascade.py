@@ -0,0 +1,141 @@
+"""
+Compare the model cascade with large-model-only turns.
+
+Each question in questions.txt is asked for the employee once with every step
+on OPENAI_MODEL and once with the cascade (OPENAI_SMALL_MODEL first). The
+report gives latency, estimated cost, how often steps were escalated, and
+how closely the cascade's answers agree with the large model's.
+"""
+import argparse
+import os
+import re
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+for path in (REPO_ROOT, os.path.dirname(SCRIPT_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from leavebot.chatbot.chat_engine import ChatEngine  # noqa: E402
+from leavebot.core.lexical_index import tokenize  # noqa: E402
+from scripts.test_chatbot_batch import QUESTIONS_FILE, ask_each, load_questions, summarize_runs  # noqa: E402
+
+# USD per million (prompt, completion) tokens; override with --price MODEL=IN,OUT.
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+MODES = {"large_only": False, "cascade": True}
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def turn_cost(spans, prices=PRICES):
+    """Estimated USD cost of the completions among `spans`."""
+    cost = 0.0
+    for s in spans:
+        if s.name != "llm.chat_completion":
+            continue
+        prompt_price, completion_price = prices.get(s.attributes.get("llm.model"), (0.0, 0.0))
+        cost += (s.attributes.get("llm.usage.prompt_tokens", 0) * prompt_price
+                 + s.attributes.get("llm.usage.completion_tokens", 0) * completion_price) / 1e6
+    return cost
+
+
+def answers_agree(a, b):
+    """
+    (agree, similarity): similarity is the token Jaccard of the two answers;
+    they agree when they quote the same numbers and similarity is at least 0.5.
+    """
+    ta, tb = set(tokenize(a or "")), set(tokenize(b or ""))
+    similarity = len(ta & tb) / len(ta | tb) if ta | tb else 1.0
+    same_numbers = set(_NUMBER_RE.findall(a or "")) == set(_NUMBER_RE.findall(b or ""))
+    return same_numbers and similarity >= 0.5, similarity
+
+
+def run_mode(engine, questions, use_cascade, prices=PRICES):
+    """Ask every question once; returns one record per question."""
+    engine.use_cascade = use_cascade
+    records = []
+    for record, root in ask_each(engine, questions, "bench.cascade_turn", cascade=use_cascade):
+        steps = [s for s in root._trace if s.name == "chat.model_step"]
+        record.update(
+            cost_usd=turn_cost(root._trace, prices),
+            steps=[(s.attributes["step"], s.attributes["model"], s.attributes["reason"]) for s in steps],
+            escalations=sum(1 for s in steps if str(s.attributes["reason"]).startswith("escalated")),
+        )
+        records.append(record)
+    return records
+
+
+def summarize(records):
+    count = len(records) or 1
+    return {
+        **summarize_runs(records),
+        "total_cost_usd": sum(r["cost_usd"] for r in records),
+        "escalated_turns": sum(1 for r in records if r["escalations"]),
+        "mean_steps": sum(len(r["steps"]) for r in records) / count,
+    }
+
+
+def compare(engine, questions, prices=PRICES):
+    """Run both modes; returns {"large_only": summary, "cascade": summary, "agreement": ..., "deltas": ...}."""
+    runs = {mode: run_mode(engine, questions, flag, prices) for mode, flag in MODES.items()}
+    report = {mode: summarize(records) for mode, records in runs.items()}
+    pairs = [answers_agree(a["answer"], b["answer"]) for a, b in zip(runs["large_only"], runs["cascade"])]
+    count = len(pairs) or 1
+    report["agreement"] = sum(1 for agree, _ in pairs if agree) / count
+    report["mean_similarity"] = sum(sim for _, sim in pairs) / count
+    base, cascade = report["large_only"], report["cascade"]
+    report["deltas"] = {
+        "p50_s": cascade["p50_s"] - base["p50_s"],
+        "p90_s": cascade["p90_s"] - base["p90_s"],
+        "cost_pct": (100.0 * (cascade["total_cost_usd"] / base["total_cost_usd"] - 1)
+                     if base["total_cost_usd"] else 0.0),
+    }
+    report["disagreements"] = [
+        {"question": a["question"], "large_only": a["answer"], "cascade": b["answer"], "steps": b["steps"]}
+        for a, b, (agree, _) in zip(runs["large_only"], runs["cascade"], pairs) if not agree
+    ]
+    return report
+
+
+def parse_prices(values):
+    prices = dict(PRICES)
+    for value in values or []:
+        model, _, rates = value.partition("=")
+        prompt_price, completion_price = (float(x) for x in rates.split(","))
+        prices[model] = (prompt_price, completion_price)
+    return prices
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("emp_id", type=int)
+    parser.add_argument("--questions-file", default=QUESTIONS_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N questions")
+    parser.add_argument("--price", action="append", metavar="MODEL=IN,OUT",
+                        help="USD per million prompt/completion tokens (repeatable)")
+    args = parser.parse_args(argv)
+
+    questions = list(dict.fromkeys(load_questions(args.questions_file)))
+    if args.limit:
+        questions = questions[: args.limit]
+    engine = ChatEngine()
+    engine.preload_data(args.emp_id)
+    report = compare(engine, questions, parse_prices(args.price))
+
+    print(f"{'mode':>11} {'p50 s':>7} {'p90 s':>7} {'cost $':>9} {'steps':>6} {'escalated':>10} {'errors':>7}")
+    for mode in MODES:
+        s = report[mode]
+        print(f"{mode:>11} {s['p50_s']:>7.2f} {s['p90_s']:>7.2f} {s['total_cost_usd']:>9.4f} "
+              f"{s['mean_steps']:>6.2f} {s['escalated_turns']:>10} {s['errors']:>7}")
+    d = report["deltas"]
+    print(f"Cascade vs large only: p50 {d['p50_s']:+.2f}s, p90 {d['p90_s']:+.2f}s, cost {d['cost_pct']:+.0f}%")
+    print(f"Answer agreement {report['agreement']:.0%} (mean token similarity {report['mean_similarity']:.2f})")
+    for item in report["disagreements"]:
+        print(f"  {item['question']}\n    large: {item['large_only']}\n    cascade: {item['cascade']} {item['steps']}")
+
+
+if __name__ == "__main__":
+    main()
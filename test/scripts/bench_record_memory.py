@@ -0,0 +1,93 @@
+"""Memory benchmark: raw ERP leave-history dicts vs projected LeaveRecord slots."""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from leavebot.core.schema import LeaveRecord, project  # noqa: E402
+
+# Keys LeaveBot never reads but the leave-history API always returns.
+UNUSED_KEYS = [f"LeaveGrid_Extra{i:02d}_V" for i in range(30)]
+
+
+def make_history(employees, records_per_employee):
+    """Synthesize leave-history payloads shaped like the ERP response (fresh strings, as from JSON)."""
+    histories = []
+    for emp in range(employees):
+        records = []
+        for i in range(records_per_employee):
+            rec = {
+                "LeaveGrid_Lvm_ID_N": 1 + i % 4,
+                "LeaveGrid_Lvm_Code_V": "".join(["A", "L"]),
+                "LeaveGrid_Lvm_Description_V": " ".join(["Annual", "Leave"]),
+                "LeaveGrid_Status": "".join(["Appro", "ved"]),
+                "LeaveGrid_Ela_Tot": str(1 + i % 5),
+                "LeaveGrid_Ela_FromDate_D": f"2024-{1 + i % 12:02d}-01T00:00:00",
+                "LeaveGrid_Ela_ToDate_D": f"2024-{1 + i % 12:02d}-0{1 + i % 5}T00:00:00",
+                "LeaveGrid_Ela_AppDate_D": f"2023-12-{10 + i % 18}T00:00:00",
+                "Ela_AirTicketReq_N": i % 2,
+            }
+            for key in UNUSED_KEYS:
+                rec[key] = f"{key}-{emp}-{i}"
+            records.append(rec)
+        histories.append(records)
+    return histories
+
+
+def measure(build):
+    """Return (result, bytes still allocated by `build()` when it returns)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def compare(employees=200, records_per_employee=40):
+    """
+    Measure retained memory of raw vs projected histories.
+
+    Returns:
+        dict: raw_bytes, projected_bytes, ratio and per-employee figures.
+    """
+    raw, raw_bytes = measure(lambda: make_history(employees, records_per_employee))
+    projected, projected_bytes = measure(lambda: [project(LeaveRecord, history) for history in raw])
+    del raw
+    return {
+        "employees": employees,
+        "records_per_employee": records_per_employee,
+        "raw_bytes": raw_bytes,
+        "projected_bytes": projected_bytes,
+        "raw_per_employee": raw_bytes / employees,
+        "projected_per_employee": projected_bytes / employees,
+        "ratio": raw_bytes / projected_bytes if projected_bytes else float("inf"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--records", type=int, default=40, help="Leave records per employee")
+    args = parser.parse_args(argv)
+
+    result = compare(args.employees, args.records)
+    print(f"Employees: {result['employees']} x {result['records_per_employee']} leave records")
+    print(f"Raw dicts:      {result['raw_bytes'] / 1024:10.1f} KiB ({result['raw_per_employee'] / 1024:.1f} KiB/employee)")
+    print(f"LeaveRecord:    {result['projected_bytes'] / 1024:10.1f} KiB "
+          f"({result['projected_per_employee'] / 1024:.1f} KiB/employee)")
+    print(f"Reduction:      {result['ratio']:.1f}x more employees per MB")
+
+
+if __name__ == "__main__":
+    main()
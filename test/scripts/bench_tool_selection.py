@@ -0,0 +1,125 @@
+"""
+Measure what per-turn tool selection saves, and whether it changes answers.
+
+Offline (default): for every question in questions.txt, report the schema
+tokens sent with and without selection, and check that the tool expected for
+each labelled question is still offered.
+
+Live (--emp-id): ask each question with the full tool set and with the
+selected subset, and compare prompt tokens, latency and the tools the model
+actually called. A turn "agrees" when the subset run called the same tools.
+"""
+import argparse
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+for path in (REPO_ROOT, os.path.dirname(SCRIPT_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from leavebot.chatbot.chat_engine import TOOL_SELECTOR, ChatEngine  # noqa: E402
+from scripts.test_chatbot_batch import QUESTIONS_FILE, ask_each, load_questions, summarize_runs  # noqa: E402
+
+# Tool each data question in questions.txt needs; used to measure selection recall.
+EXPECTED_TOOLS = {
+    '"What is my air ticket eligibility status?"': "air_ticket_info",
+    '"When can I next claim an air ticket?"': "air_ticket_info",
+    '"Show me my most recent leave applications."': "recent_leaves",
+    '"Give me the last two leaves I applied for."': "recent_leaves",
+    '"List my latest three leave requests with their dates."': "recent_leaves",
+    '"What percent of my ticket fare am I eligible for?"': "air_ticket_info",
+    '"When did I last apply for leave?"': "recent_leaves",
+    '"What was my last approved leave?"': "recent_leaves",
+    "What is my current leave balance?": "leave_type_balance",
+    "How many sick leave days have I taken this year?": "total_leave_taken",
+    "Do I have enough annual leave for my requested dates?": "leave_type_balance",
+    "What is the status of my pending leave application?": "unapproved_leaves",
+    "Who is my reporting manager?": "manager_contact",
+    "What is my current designation and department?": "employee_contact",
+    "What are the objectives of the HR manual?": "search_policy",
+    "What is the process for applying for sick leave?": "search_policy",
+    "How do I apply for sick leave, and how many sick leave days do I have left?": "leave_type_balance",
+}
+
+
+def offline_report(questions, selector=TOOL_SELECTOR, expected=EXPECTED_TOOLS):
+    """Schema tokens with and without selection, and recall over the labelled questions."""
+    full = selector.schema_tokens()
+    selected = [selector.select(q) for q in questions]
+    sent = [selector.schema_tokens(tools) for tools in selected]
+    labelled = [(q, tools) for q, tools in zip(questions, selected) if q in expected]
+    misses = [q for q, tools in labelled if expected[q] not in {t["function"]["name"] for t in tools}]
+    count = len(questions) or 1
+    return {
+        "questions": len(questions),
+        "full_schema_tokens": full,
+        "mean_schema_tokens": sum(sent) / count,
+        "tokens_saved_pct": 100.0 * (1 - sum(sent) / (full * count)) if full else 0.0,
+        "fallbacks": sum(1 for tools in selected if tools is selector.tools),
+        "labelled": len(labelled),
+        "recall": 1.0 - len(misses) / len(labelled) if labelled else 1.0,
+        "misses": misses,
+    }
+
+
+def run_mode(engine, questions, use_tool_selection):
+    """Ask every question once; returns one record per question."""
+    engine.use_tool_selection = use_tool_selection
+    records = []
+    for record, root in ask_each(engine, questions, "bench.tool_selection_turn", selection=use_tool_selection):
+        tools = sorted(s.attributes["tool.name"] for s in root._trace if s.name == "chat.route_tool")
+        records.append({**record, "tools_called": tools})
+    return records
+
+
+def live_report(engine, questions):
+    """Compare the full set and the selected subset on the same questions."""
+    full = run_mode(engine, questions, False)
+    subset = run_mode(engine, questions, True)
+    count = len(questions) or 1
+    agree = sum(1 for a, b in zip(full, subset) if a["tools_called"] == b["tools_called"])
+    return {
+        "full": summarize_runs(full),
+        "selected": summarize_runs(subset),
+        "tool_agreement": agree / count,
+        "disagreements": [
+            {"question": a["question"], "full": a["tools_called"], "selected": b["tools_called"]}
+            for a, b in zip(full, subset) if a["tools_called"] != b["tools_called"]
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions-file", default=QUESTIONS_FILE)
+    parser.add_argument("--emp-id", type=int, default=None, help="Also run the live comparison for this employee")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N questions (live run)")
+    args = parser.parse_args(argv)
+
+    questions = list(dict.fromkeys(load_questions(args.questions_file)))
+    report = offline_report(questions)
+    print(f"Schema tokens: full {report['full_schema_tokens']}, selected mean {report['mean_schema_tokens']:.0f} "
+          f"({report['tokens_saved_pct']:.0f}% saved, {report['fallbacks']} fallbacks to the full set)")
+    print(f"Expected tool offered for {report['recall']:.0%} of {report['labelled']} labelled questions")
+    for question in report["misses"]:
+        print(f"  missed: {question}")
+
+    if args.emp_id is None:
+        return
+    if args.limit:
+        questions = questions[: args.limit]
+    engine = ChatEngine()
+    engine.preload_data(args.emp_id)
+    live = live_report(engine, questions)
+    for mode in ("full", "selected"):
+        s = live[mode]
+        print(f"{mode:>9}: p50 {s['p50_s']:.2f}s, prompt tokens {s['mean_prompt_tokens']:.0f}, errors {s['errors']}")
+    print(f"Same tools called in {live['tool_agreement']:.0%} of turns")
+    for d in live["disagreements"]:
+        print(f"  {d['question']}: full={d['full']} selected={d['selected']}")
+
+
+if __name__ == "__main__":
+    main()
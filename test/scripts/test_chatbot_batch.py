@@ -1,114 +1,255 @@
-import sys
-import os
+import argparse
+import contextlib
 import json
-import openai
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Ensure the project root is on the Python path for package imports
+# Ensure the repository root is on the Python path for package imports
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
-REPO_ROOT = os.path.abspath(os.path.join(PROJECT_ROOT, '..'))
-if PROJECT_ROOT not in sys.path:
-    sys.path.insert(0, PROJECT_ROOT)
-
-from ..chatbot import chat_engine
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
 
-ChatEngine = chat_engine.ChatEngine
-from ..config.settings import DOC_EMBEDDINGS_PATH
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.config import settings
+from leavebot.core.cassette import use_cassette
+from leavebot.core.metrics import write_metrics
+from leavebot.core.profiling import Profiler
+from leavebot.core.rate_limit import configure_rate_limit
+from leavebot.core.tracing import span, summarize_trace
 
 QUESTIONS_FILE = os.path.join(REPO_ROOT, 'questions.txt')
 
+BATCH_SYSTEM_PROMPT = {
+    "role": "system",
+    "content": (
+        "You are LeaveBot, a helpful HR and policy assistant. "
+        "If a user asks a question not directly answerable by API or calculations, use the search_policy tool to answer from company policy documents."
+    )
+}
+
+
+def load_questions(questions_file=QUESTIONS_FILE):
+    with open(questions_file, 'r', encoding='utf-8') as f:
+        return [q.strip() for q in f if q.strip()]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class EnginePool:
+    """One lazily loaded ChatEngine per employee, shared by that employee's questions."""
+
+    def __init__(self, cgm_id=1, from_date=None, to_date=None, profiler=None):
+        self.cgm_id = cgm_id
+        self.from_date = from_date
+        self.to_date = to_date
+        self.profiler = profiler
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def get(self, emp_id):
+        with self._lock:
+            engine = self._engines.get(emp_id)
+            if engine is None:
+                engine = ChatEngine()
+                engine.profiler = self.profiler
+                engine.preload_data(emp_id, self.from_date, self.to_date, self.cgm_id, lazy=True)
+                self._engines[emp_id] = engine
+            return engine
+
+
+def timed_turn(answer, span_name, **attributes):
+    """
+    Run `answer()` inside a span named `span_name` and time it.
+    Returns (record, root span); the record holds the answer or the error,
+    the latency and the turn's token usage.
+    """
+    record = {"answer": None, "error": None}
+    start = time.perf_counter()
+    with span(span_name, **attributes) as root:
+        try:
+            record["answer"] = answer()
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = time.perf_counter() - start
+    summary = summarize_trace(root)
+    record["prompt_tokens"] = summary["prompt_tokens"]
+    record["completion_tokens"] = summary["completion_tokens"]
+    return record, root
+
+
+def ask_each(engine, questions, span_name, **attributes):
+    """Ask every question once, on its own, on `engine`; yields (record, root span) per question."""
+    for question in questions:
+        messages = [{"role": "user", "content": question}]
+        record, root = timed_turn(lambda: engine.stream_completion(messages), span_name, **attributes)
+        yield {"question": question, **record}, root
+
+
+def summarize_runs(records):
+    """Errors, p50/p90 latency and mean token usage of `ask_each` records."""
+    latencies = sorted(r["latency_s"] for r in records)
+    count = len(records) or 1
+    return {
+        "questions": len(records),
+        "errors": sum(1 for r in records if r["error"]),
+        "p50_s": percentile(latencies, 50),
+        "p90_s": percentile(latencies, 90),
+        "mean_prompt_tokens": sum(r["prompt_tokens"] for r in records) / count,
+        "mean_completion_tokens": sum(r["completion_tokens"] for r in records) / count,
+    }
+
+
+def ask(engines, emp_id, idx, question):
+    """Answer one question and return its result record."""
+    messages = [BATCH_SYSTEM_PROMPT, {"role": "user", "content": question}]
+    turn, _ = timed_turn(
+        lambda: engines.get(emp_id).stream_completion(messages), "batch.question", emp_id=emp_id, index=idx
+    )
+    turn["latency_s"] = round(turn["latency_s"], 4)
+    return {"emp_id": emp_id, "index": idx, "question": question, **turn}
+
+
 def run_batch_test(
-    emp_id=5469,
+    emp_ids=(5469,),
     questions_file=QUESTIONS_FILE,
     cgm_id=1,
-    from_date="2024-01-01",
-    to_date="2024-12-31",
+    from_date=None,
+    to_date=None,
+    workers=4,
+    output=None,
+    profiler=None,
+    verbose=True,
 ):
-    """Run a batch of questions against the chatbot."""
-    engine = ChatEngine()
-    engine.preload_data(emp_id, from_date, to_date, cgm_id)
+    """
+    Run every question for every employee on a bounded worker pool.
+    Results are streamed to `output` as JSONL; returns the summary report.
+    """
+    questions = load_questions(questions_file)
+    engines = EnginePool(cgm_id, from_date, to_date, profiler)
+    jobs = [(emp_id, idx, q) for emp_id in emp_ids for idx, q in enumerate(questions, 1)]
+
+    latencies = []
+    tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+    errors = 0
+    out = open(output, "w", encoding="utf-8") if output else None
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(ask, engines, *job) for job in jobs]
+            for future in as_completed(futures):
+                record = future.result()
+                latencies.append(record["latency_s"])
+                tokens["prompt_tokens"] += record["prompt_tokens"]
+                tokens["completion_tokens"] += record["completion_tokens"]
+                errors += record["error"] is not None
+                if out:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if verbose:
+                    print(f"\n=== [{record['emp_id']}] Q{record['index']}: {record['question']} ===")
+                    print(f"A: {record['answer'] if record['error'] is None else 'ERROR ' + record['error']}")
+    finally:
+        if out:
+            out.close()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    report = {
+        "employees": len(emp_ids),
+        "questions": len(jobs),
+        "errors": errors,
+        "workers": workers,
+        "wall_time_s": round(wall, 3),
+        "questions_per_s": round(len(jobs) / wall, 3) if wall else 0.0,
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p90_s": percentile(latencies, 90),
+        "latency_p99_s": percentile(latencies, 99),
+        "latency_max_s": latencies[-1] if latencies else 0.0,
+        **tokens,
+    }
+    return report
+
+
+def print_report(report):
+    print("\n=== Batch summary ===")
+    for key, value in report.items():
+        print(f"{key:>20}: {value}")
+
+
+def read_emp_ids(args):
+    emp_ids = list(args.emp_ids)
+    if args.emp_ids_file:
+        with open(args.emp_ids_file, encoding="utf-8") as f:
+            emp_ids.extend(int(line) for line in f if line.strip())
+    return emp_ids or [5469]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run questions.txt against LeaveBot.")
+    parser.add_argument("emp_ids", nargs="*", type=int, help="Employee IDs (default: 5469)")
+    parser.add_argument("--emp-ids-file", help="File with one employee ID per line")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--from-date", default=None, help="Balance range start (default: current leave year)")
+    parser.add_argument("--to-date", default=None, help="Balance range end (default: current leave year)")
+    parser.add_argument("--workers", type=int, default=4, help="Questions answered concurrently")
+    parser.add_argument("--openai-rpm", type=int, default=None,
+                        help="OpenAI requests/minute limit (OPENAI_TPM still applies)")
+    parser.add_argument("--erp-rpm", type=int, default=None, help="ERP requests/minute limit")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Prometheus text file written after the run (default: METRICS_EXPORT_PATH)")
+    parser.add_argument("--profile", action="store_true", help="Profile each turn and tool call")
+    parser.add_argument("--profile-dir", default="profiles", help="Where .pstats/.collapsed files are written")
+    parser.add_argument("--profile-top", type=int, default=20, help="Hot functions printed per profile")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="CASSETTE", help="Record every ERP/OpenAI exchange to this file")
+    cassette.add_argument("--replay", metavar="CASSETTE", help="Answer ERP/OpenAI calls from a recorded cassette")
+    parser.add_argument("--simulate-latency", action="store_true", help="On replay, wait the recorded call times")
+    parser.add_argument("--strict", action="store_true", help="On replay, fail requests missing from the cassette")
+    return parser.parse_args(argv)
+
+
+def open_cassette(args):
+    """use_cassette() for --record / --replay, or a no-op context."""
+    if args.record:
+        return use_cassette(args.record, "record")
+    if args.replay:
+        return use_cassette(args.replay, "replay", args.simulate_latency, args.strict)
+    return contextlib.nullcontext()
 
-    # Read questions
-    with open(questions_file, 'r', encoding='utf-8') as f:
-        questions = [q.strip() for q in f if q.strip()]
-
-    for idx, q in enumerate(questions, 1):
-        print(f"\n=== Q{idx}: {q} ===")
-
-        # Re-initialize messages for each question
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are LeaveBot, a helpful HR and policy assistant. "
-                    "If a user asks a question not directly answerable by API or calculations, use the search_policy tool to answer from company policy documents."
-                )
-            },
-            {"role": "user", "content": q}
-        ]
-
-        # First assistant response
-        try:
-            response = chat_engine.openai.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=chat_engine.tools,
-                tool_choice="auto",
-                max_tokens=512,
-            )
-        except openai.AuthenticationError:
-            print(
-                "OpenAI authentication failed. Please set the OPENAI_API_KEY environment variable with a valid API key."
-            )
-            return
-        msg = response.choices[0].message
-
-        # Multi-step tool calling loop
-        while hasattr(msg, "tool_calls") and msg.tool_calls:
-            # Add the assistant message with all tool_calls (OpenAI protocol)
-            messages.append({
-                "role": "assistant",
-                "tool_calls": [call.model_dump() for call in msg.tool_calls]
-            })
-            # Route and add each tool result
-            for call in msg.tool_calls:
-                tool_name = call.function.name
-                args_json = call.function.arguments
-                args_dict = json.loads(args_json) if args_json else {}
-                tool_response = engine.route_tool(tool_name, args_dict)
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": call.id,
-                    "name": tool_name,
-                    "content": str(tool_response)
-                })
-
-            # For debugging: print the messages before next OpenAI call
-            print("\n=== DEBUG: MESSAGES GOING INTO NEXT OPENAI CALL ===")
-            for m in messages:
-                print(m)
-            print("====================================================\n")
-
-            # Call OpenAI again, including tools!
-            try:
-                response = chat_engine.openai.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
-                    tools=chat_engine.tools,
-                    max_tokens=512,
-                )
-            except openai.AuthenticationError:
-                print(
-                    "OpenAI authentication failed. Please set the OPENAI_API_KEY environment variable with a valid API key."
-                )
-                return
-            msg = response.choices[0].message
-
-        # Final answer (when no more tool_calls)
-        answer = msg.content
-        print(f"A: {answer}")
 
 if __name__ == "__main__":
-    # Optionally pass emp_id as CLI arg
-    emp_id = int(sys.argv[1]) if len(sys.argv) > 1 else 5469
-    run_batch_test(emp_id=emp_id)
+    args = parse_args()
+    if args.openai_rpm is not None:
+        # Rebuilding the limiter must keep the configured tokens/minute limit.
+        configure_rate_limit("openai", args.openai_rpm, settings.OPENAI_TPM)
+    if args.erp_rpm is not None:
+        configure_rate_limit("erp", args.erp_rpm)
+    profiler = Profiler(args.profile_dir, top_n=args.profile_top) if args.profile else None
+    with open_cassette(args) as cassette:
+        report = run_batch_test(
+            emp_ids=read_emp_ids(args),
+            questions_file=args.questions,
+            from_date=args.from_date,
+            to_date=args.to_date,
+            workers=args.workers,
+            output=args.output,
+            profiler=profiler,
+            verbose=not args.quiet,
+        )
+    if cassette is not None:
+        report["cassette_mode"] = cassette.mode
+        report["cassette_exchanges"] = cassette.recorded or cassette.replayed
+        report["cassette_misses"] = cassette.misses
+    print_report(report)
+    print(f"\nMetrics written to {write_metrics(args.metrics_file)}")
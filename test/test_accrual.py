@@ -0,0 +1,101 @@
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from engine_fixtures import LEAVE_TYPES, patch_engine_fetchers
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.config import settings
+from leavebot.core.accrual import AccrualModel
+from leavebot.core.cache_utils import LEAVE_BALANCE_CACHE
+from leavebot.core.metrics import ACCRUAL_RECONCILIATIONS
+
+AS_OF = date(2024, 3, 1)
+
+
+def leave(lvm_id, start, days, status="Approved"):
+    return {"LeaveGrid_Lvm_ID_N": lvm_id, "LeaveGrid_Status": status, "LeaveGrid_Ela_Tot": str(days),
+            "LeaveGrid_Ela_FromDate_D": start.isoformat(), "LeaveGrid_Ela_ToDate_D": start.isoformat()}
+
+
+def history(as_of):
+    return [
+        leave(1, as_of - timedelta(days=5), 2),
+        leave(1, as_of + timedelta(days=10), 5),
+        leave(1, as_of + timedelta(days=20), 2, status="Pending"),
+        leave(1, as_of + timedelta(days=25), 4, status="Rejected"),
+        leave(2, as_of + timedelta(days=3), 1),
+    ]
+
+
+class TestAccrualModel(unittest.TestCase):
+    def setUp(self):
+        self.model = AccrualModel(
+            AS_OF, {11: {"Balance": "10"}, 12: {"Balance": 5}}, LEAVE_TYPES, history(AS_OF),
+            anniversary="01-Jan-2020", accrual_days={"AL": 36.5}, carry_forward_max={"AL": 12},
+        )
+
+    def test_projection_accrues_and_subtracts_booked_leave(self):
+        self.assertEqual(self.model.balance_on("AL", AS_OF), 10)
+        self.assertEqual(self.model.balance_on("AL", AS_OF + timedelta(days=30)), 8)
+        self.assertEqual(self.model.balance_on("Annual Leave", AS_OF + timedelta(days=30), include_pending=True), 6)
+        self.assertEqual(self.model.balance_on("AL", AS_OF - timedelta(days=10)), 11)
+        self.assertEqual(self.model.balance_on("SL", "2024-12-31"), 4)
+        self.assertIsNone(self.model.balance_on("XL", AS_OF))
+
+    def test_carry_forward_is_capped_at_anniversary(self):
+        # 1 Mar -> 1 Jan: 10 + 30.6 accrued - 5 taken, capped at 12; then 14 days more.
+        self.assertEqual(self.model.balance_on("AL", date(2025, 1, 15)), 13.4)
+        projection = self.model.projection("Annual Leave", "2024-03-31")
+        self.assertEqual(projection["leave"], "AL")
+        self.assertEqual(projection["projected_balance_if_pending_approved"], 6)
+        self.assertEqual(projection["pending_leave_between"], 2)
+
+    def test_queries_take_microseconds(self):
+        targets = [AS_OF + timedelta(days=d) for d in range(-200, 800)]
+        start = time.perf_counter()
+        for target in targets * 10:
+            self.model.balance_on("AL", target)
+        self.assertLess((time.perf_counter() - start) / (len(targets) * 10), 200e-6)
+
+
+class TestProjectedBalanceTool(unittest.TestCase):
+    def setUp(self):
+        settings.load()
+        LEAVE_BALANCE_CACHE.clear()
+        self.addCleanup(LEAVE_BALANCE_CACHE.clear)
+        ACCRUAL_RECONCILIATIONS.clear()
+        today = date.today()
+        self.balance = patch_engine_fetchers(
+            self, employee=[{"Emp_ID_N": 7, "Emp_AnnivDate_D": "01-Jan-2020"}], history=history(today),
+            balance=mock.Mock(side_effect=lambda e, lpd, f, t: {"Balance": 10 if lpd == 11 else 5}),
+        )["fetch_leave_balance"]
+        for patcher in (mock.patch.object(settings, "LEAVE_ACCRUAL_DAYS", {"AL": 36.5}),
+                        mock.patch.object(settings, "LEAVE_CARRY_FORWARD_MAX", {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.engine = ChatEngine()
+        self.engine.preload_data(7, lazy=True)
+        self.today = today
+
+    def test_any_date_without_more_balance_requests(self):
+        for days in (30, 90, 400):
+            on = (self.today + timedelta(days=days)).isoformat()
+            result = self.engine.route_tool("projected_leave_balance", {"leave_code": "AL", "on_date": on})
+            self.assertEqual(result["projected_balance"], round(10 + 0.1 * days - 5, 2))
+        self.assertEqual(self.balance.call_count, 2)
+
+    def test_reconcile_reseeds_on_drift(self):
+        self.engine.get_accrual_model()
+        self.assertEqual(self.engine.reconcile_accrual(), {})
+        self.balance.side_effect = lambda e, lpd, f, t: {"Balance": 9 if lpd == 11 else 5}
+        with mock.patch.object(settings, "ACCRUAL_RECONCILE_S", 0):
+            result = self.engine.route_tool("projected_leave_balance", {"leave_code": "AL"})
+        self.assertEqual(result["current_balance"], 9)
+        self.assertEqual(ACCRUAL_RECONCILIATIONS.value(result="reseeded"), 1)
+        self.assertEqual(self.engine.reconcile_accrual(force=True), {11: 0.0, 12: 0.0})
+        self.assertEqual(ACCRUAL_RECONCILIATIONS.value(result="ok"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from datetime import date, timedelta
+
+from leavebot.core.air_ticket_index import AirTicketIndex, eligibility_frame, employee_info
+from leavebot.core.air_ticket_utils import air_ticket_info
+from leavebot.core.schema import LeaveRecord
+from scripts.bench_air_ticket_index import make_org
+
+
+class TestAirTicketIndex(unittest.TestCase):
+    def setUp(self):
+        self.balances, self.histories = make_org(300, seed=3)
+        # Raw ERP dicts go through the same pass as projected records.
+        self.balances["raw"] = {11: {"Airticket": "1", "AirTicketPercent": "100", "Emp_AnnivDate_D": "10-Aug-2023"}}
+        self.histories["raw"] = [{"Ela_AirTicketReq_N": 1, "LeaveGrid_dtTravelDate": "2024-02-01T00:00:00"}]
+        self.index = AirTicketIndex.build(self.balances, self.histories)
+
+    def test_batch_matches_per_employee_results(self):
+        for emp_id, balances in self.balances.items():
+            self.assertEqual(self.index.get(emp_id), employee_info(balances, self.histories[emp_id]), emp_id)
+            if emp_id != "raw":
+                # air_ticket_info keeps raw ERP date strings; projected records agree with it.
+                self.assertEqual(self.index.get(emp_id), air_ticket_info(balances, self.histories[emp_id]), emp_id)
+        self.assertEqual(self.index.get("raw")["next_eligible_date"], "2026-01-31")
+        self.assertEqual(self.index.get("raw")["last_claim_date"], "2024-02-01")
+        frame = eligibility_frame(self.balances, self.histories)
+        self.assertEqual(len(frame), len(self.balances))
+
+    def test_range_query_matches_a_scan(self):
+        start, end = date(2025, 6, 1), date(2025, 7, 31)
+        due = self.index.eligible_between(start, end)
+        expected = sorted(
+            (info["next_eligible_date"], emp_id)
+            for emp_id in self.balances
+            for info in [self.index.get(emp_id)]
+            if info.get("next_eligible_date") and start.isoformat() <= info["next_eligible_date"] <= end.isoformat()
+        )
+        self.assertTrue(expected)
+        self.assertEqual([(d["next_eligible_date"], d["emp_id"]) for d in due], expected)
+
+    def test_update_moves_one_employee(self):
+        emp_id = self.index.eligible_between(date(2000, 1, 1), date(2100, 1, 1))[0]["emp_id"]
+        claim = LeaveRecord.from_erp({"LeaveGrid_Ela_FromDate_D": date.today().isoformat(), "Ela_AirTicketReq_N": "1"})
+        size = len(self.index.eligible_between(date(2000, 1, 1), date(2100, 1, 1)))
+
+        info = self.index.update(emp_id, self.balances[emp_id], self.histories[emp_id] + [claim])
+        expected = (date.today() + timedelta(days=730)).isoformat()
+        self.assertEqual(info["next_eligible_date"], expected)
+        due = self.index.eligible_between(expected, expected)
+        self.assertIn(emp_id, [d["emp_id"] for d in due])
+        self.assertEqual(len(self.index.eligible_between(date(2000, 1, 1), date(2100, 1, 1))), size)
+
+        # Raw ERP records with ISO datetimes update like they build.
+        raw = self.index.update("raw", self.balances["raw"], self.histories["raw"])
+        self.assertEqual(raw["next_eligible_date"], "2026-01-31")
+        self.assertEqual(self.index.eligible_between("2026-01-31", "2026-01-31")[-1]["emp_id"], "raw")
+
+        self.index.remove(emp_id)
+        self.assertIsNone(self.index.get(emp_id))
+        self.assertEqual(len(self.index.eligible_between(date(2000, 1, 1), date(2100, 1, 1))), size - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
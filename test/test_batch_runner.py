@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from scripts import test_chatbot_batch as batch
+from leavebot.chatbot.chat_engine import ChatEngine
+
+
+def fake_completion(self, messages, user_input=None):
+    time.sleep(0.05)
+    return f"answer to {messages[-1]['content']}"
+
+
+class TestConcurrentBatchRunner(unittest.TestCase):
+    def test_runs_all_employees_concurrently_and_writes_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            questions = os.path.join(tmp, "questions.txt")
+            with open(questions, "w", encoding="utf-8") as f:
+                f.write("q1\n\nq2\nq3\nq4\n")
+            output = os.path.join(tmp, "results.jsonl")
+            with mock.patch.object(ChatEngine, "stream_completion", fake_completion):
+                report = batch.run_batch_test(
+                    emp_ids=[1, 2], questions_file=questions, workers=8, output=output, verbose=False
+                )
+            with open(output, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual(report["questions"], 8)
+        self.assertEqual(report["errors"], 0)
+        self.assertEqual(len(records), 8)
+        self.assertEqual({(r["emp_id"], r["question"]) for r in records},
+                         {(e, f"q{i}") for e in (1, 2) for i in range(1, 5)})
+        # Eight 50 ms questions on eight workers finish well under the serial 400 ms.
+        self.assertLess(report["wall_time_s"], 0.3)
+        self.assertGreaterEqual(report["latency_p99_s"], report["latency_p50_s"])
+
+    def test_percentile(self):
+        self.assertEqual(batch.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(batch.percentile([1, 2, 3, 4], 99), 4)
+        self.assertEqual(batch.percentile([], 50), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
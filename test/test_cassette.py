@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+
+from leavebot.api import erp_client
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.config import settings
+from leavebot.core import llm_client
+from leavebot.core.cassette import CassetteMiss, use_cassette
+
+
+class LeaveCompletions:
+    """Asks for recent_leaves once, then answers with the tool's result."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        tool_results = [m["content"] for m in kwargs["messages"] if m.get("role") == "tool"]
+        if tool_results:
+            message = SimpleNamespace(content=f"From the ERP: {tool_results[-1]}", tool_calls=None)
+        else:
+            dump = {"id": "c1", "type": "function", "function": {"name": "recent_leaves", "arguments": "{}"}}
+            call = SimpleNamespace(id="c1", type="function", model_dump=lambda: dump,
+                                   function=SimpleNamespace(name="recent_leaves", arguments="{}"))
+            message = SimpleNamespace(content=None, tool_calls=[call])
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def offline(**kwargs):
+    raise AssertionError("network used during replay")
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        settings.load()
+        self.addCleanup(llm_client.set_client, None)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "session.jsonl")
+
+    def ask(self):
+        engine = ChatEngine()
+        engine.emp_id = 7
+        engine.TOOL_MAP["recent_leaves"] = lambda **kwargs: erp_client.erp_request(
+            "GET", "http://erp.test/leaves?emp=7", "test_cassette")
+        return engine.stream_completion([{"role": "user", "content": "When did I last take leave?"}])
+
+    def test_replays_a_recorded_turn_offline(self):
+        completions = LeaveCompletions()
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        response = mock.Mock(status_code=200, json=mock.Mock(return_value=[{"LeaveGrid_Ela_FromDate_D": "2024-05-01"}]))
+        with mock.patch("requests.request", return_value=response), use_cassette(self.path, "record") as cassette:
+            recorded = self.ask()
+        self.assertIn("2024-05-01", recorded)
+        self.assertEqual(cassette.recorded, 3)  # two completions and one ERP call
+
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=offline))))
+        with mock.patch("requests.request", side_effect=offline), use_cassette(self.path, "replay") as cassette:
+            replayed = self.ask()
+        self.assertEqual(replayed, recorded)
+        self.assertEqual((cassette.replayed, cassette.misses), (3, 0))
+
+    def test_erp_errors_replay_as_the_recorded_exception(self):
+        error = requests.HTTPError("404 Client Error")
+        error.response = mock.Mock(status_code=404, headers={})
+        failing = mock.Mock(status_code=404, raise_for_status=mock.Mock(side_effect=error))
+        with mock.patch("requests.request", return_value=failing), use_cassette(self.path, "record"):
+            with self.assertRaises(requests.HTTPError):
+                erp_client.erp_request("GET", "http://erp.test/missing", "test_cassette")
+
+        with mock.patch("requests.request", side_effect=offline), use_cassette(self.path, "replay"):
+            with self.assertRaises(requests.HTTPError) as raised:
+                erp_client.erp_request("GET", "http://erp.test/missing", "test_cassette")
+        self.assertEqual(raised.exception.response.status_code, 404)
+
+    def test_unrecorded_requests_fall_back_or_raise_when_strict(self):
+        response = mock.Mock(status_code=200, json=mock.Mock(return_value={"n": 1}))
+        with mock.patch("requests.request", return_value=response), use_cassette(self.path, "record"):
+            erp_client.erp_request("GET", "http://erp.test/a", "test_cassette")
+
+        with use_cassette(self.path, "replay", strict=True):
+            with self.assertRaises(CassetteMiss):
+                erp_client.erp_request("GET", "http://erp.test/b", "test_cassette")
+        with use_cassette(self.path, "replay") as cassette:
+            self.assertEqual(erp_client.erp_request("GET", "http://erp.test/b", "test_cassette"), {"n": 1})
+            # Exhausted requests keep getting their last response.
+            self.assertEqual(erp_client.erp_request("GET", "http://erp.test/a", "test_cassette"), {"n": 1})
+        self.assertEqual(cassette.misses, 1)
+
+    def test_replay_can_simulate_recorded_latency(self):
+        def slow(*args, **kwargs):
+            time.sleep(0.1)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=[]))
+
+        with mock.patch("requests.request", side_effect=slow), use_cassette(self.path, "record"):
+            erp_client.erp_request("GET", "http://erp.test/slow", "test_cassette")
+
+        for simulate, check in ((False, self.assertLess), (True, self.assertGreaterEqual)):
+            with use_cassette(self.path, "replay", simulate_latency=simulate):
+                start = time.perf_counter()
+                erp_client.erp_request("GET", "http://erp.test/slow", "test_cassette")
+            check(time.perf_counter() - start, 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
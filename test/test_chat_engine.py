@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+from engine_fixtures import patch_engine_fetchers
+from leavebot.api import fetch_leave_balance as balance_api
+from leavebot.chatbot.chat_engine import ChatEngine
+
+
+class TestLazyChatEngine(unittest.TestCase):
+    def setUp(self):
+        self.fakes = patch_engine_fetchers(
+            self, balance=mock.Mock(side_effect=lambda e, lpd, f, t: {"Balance": lpd, "Airticket": "1"})
+        )
+
+    def test_lazy_preload_fetches_nothing(self):
+        engine = ChatEngine()
+        self.assertIsNone(engine.preload_data(7, "2024-01-01", "2024-12-31", lazy=True))
+        for fake in self.fakes.values():
+            fake.assert_not_called()
+
+    def test_balance_tool_fetches_only_requested_type(self):
+        engine = ChatEngine()
+        engine.preload_data(7, "2024-01-01", "2024-12-31", lazy=True)
+        self.assertEqual(engine.route_tool("leave_type_balance", {"leave_code": "SL"}), 12)
+        self.assertEqual(engine.route_tool("leave_type_balance", {"leave_code": "SL"}), 12)
+        self.fakes["fetch_leave_balance"].assert_called_once_with(7, 12, "2024-01-01", "2024-12-31")
+        self.fakes["fetch_leave_history"].assert_not_called()
+
+    def test_air_ticket_stops_at_first_eligible_type(self):
+        engine = ChatEngine()
+        engine.preload_data(7, "2024-01-01", "2024-12-31", lazy=True)
+        self.assertTrue(engine.route_tool("air_ticket_info")["eligible"])
+        self.fakes["fetch_leave_balance"].assert_called_once_with(7, 11, "2024-01-01", "2024-12-31")
+
+    def test_eager_preload_loads_everything(self):
+        engine = ChatEngine()
+        employee, leave_types, history, balances, manager = engine.preload_data(7, "2024-01-01", "2024-12-31")
+        self.assertEqual(set(balances), {11, 12})
+        self.assertEqual(manager["name"], "Test User")
+
+
+class TestBalanceDateRange(unittest.TestCase):
+    def test_equivalent_ranges_normalize_to_one_key(self):
+        self.assertEqual(
+            balance_api.resolve_date_range("01-Jan-2024", "2024-12-31T00:00:00"),
+            ("2024-01-01", "2024-12-31"),
+        )
+
+    def test_missing_range_defaults_to_current_leave_year(self):
+        self.assertEqual(balance_api.resolve_date_range(), balance_api.current_leave_year())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from leavebot.api import erp_client, fetch_employee
+from leavebot.chatbot.chat_engine import ERP_UNAVAILABLE_MESSAGE, MODEL_BUSY_MESSAGE, ChatEngine
+from leavebot.core import circuit_breaker, rate_limit
+from leavebot.core.cache_utils import EMPLOYEE_CACHE, LAST_KNOWN_CACHE, pop_stale_notes
+from leavebot.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_failures_and_recovers_through_half_open(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        time.sleep(0.06)
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()  # only one probe at a time
+        breaker.record_success(0.01)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, slow_call_threshold=1.0)
+        breaker.record_success(latency=2.0)
+        self.assertEqual(breaker.state, OPEN)
+
+
+class TestDegradedMode(unittest.TestCase):
+    def setUp(self):
+        circuit_breaker.reset_breakers()
+        EMPLOYEE_CACHE.clear()
+        LAST_KNOWN_CACHE.clear()
+        pop_stale_notes()
+        self.addCleanup(circuit_breaker.reset_breakers)
+
+    def test_last_known_data_is_served_when_erp_fails(self):
+        with mock.patch.object(fetch_employee, "erp_request", return_value=[{"Emp_ID_N": 3}]):
+            fetch_employee.fetch_employee_details(3)
+        EMPLOYEE_CACHE.clear()
+        with mock.patch.object(fetch_employee, "erp_request", side_effect=requests.ConnectionError("down")):
+            self.assertEqual(fetch_employee.fetch_employee_details(3), [{"Emp_ID_N": 3}])
+        self.assertIn("employee", pop_stale_notes())
+        self.assertNotIn(3, EMPLOYEE_CACHE)
+
+    def test_open_circuit_short_circuits_requests(self):
+        breaker = circuit_breaker.get_breaker("employee_details")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        with mock.patch("requests.request") as request:
+            with self.assertRaises(CircuitOpenError):
+                erp_client.erp_request("POST", "http://erp/x", "employee_details")
+        request.assert_not_called()
+
+    def half_open(self, endpoint):
+        breaker = circuit_breaker.get_breaker(endpoint)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker.opened_at -= breaker.reset_timeout
+        return breaker
+
+    def test_non_failure_probe_releases_half_open_slot(self):
+        breaker = self.half_open("employee_details")
+        error = requests.HTTPError("404 Client Error")
+        error.response = mock.Mock(status_code=404, headers={})
+        missing = mock.Mock(status_code=404, raise_for_status=mock.Mock(side_effect=error))
+        with mock.patch("requests.request", return_value=missing):
+            with self.assertRaises(requests.HTTPError):
+                erp_client.erp_request("POST", "http://erp/x", "employee_details")
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+        healthy = mock.Mock(status_code=200, json=mock.Mock(return_value=[]))
+        with mock.patch("requests.request", return_value=healthy):
+            self.assertEqual(erp_client.erp_request("POST", "http://erp/x", "employee_details"), [])
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_server_errors_and_bad_bodies_reopen_the_circuit(self):
+        for endpoint, response in (
+            ("status_500", mock.Mock(status_code=500, raise_for_status=mock.Mock(
+                side_effect=requests.HTTPError("500", response=mock.Mock(status_code=500, headers={}))))),
+            ("bad_json", mock.Mock(status_code=200, json=mock.Mock(side_effect=ValueError("not JSON")))),
+        ):
+            breaker = self.half_open(endpoint)
+            with mock.patch("requests.request", return_value=response):
+                with self.assertRaises((requests.HTTPError, ValueError)):
+                    erp_client.erp_request("POST", "http://erp/x", endpoint)
+            self.assertEqual(breaker.state, OPEN, endpoint)
+
+    def test_limiter_rejection_releases_half_open_slot(self):
+        breaker = self.half_open("employee_details")
+        with mock.patch("leavebot.core.rate_limit.acquire", side_effect=rate_limit.QueueFullError("full")), \
+                mock.patch("requests.request") as request:
+            with self.assertRaises(rate_limit.QueueFullError):
+                erp_client.erp_request("POST", "http://erp/x", "employee_details")
+        request.assert_not_called()
+        breaker.before_call()  # the probe slot is free again
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+    def test_tool_reports_unavailable_instead_of_raising(self):
+        engine = ChatEngine()
+        engine.preload_data(3, lazy=True)
+        with mock.patch.object(engine, "get_employee", side_effect=CircuitOpenError("employee_details", 30)):
+            self.assertEqual(engine.route_tool("employee_contact"), ERP_UNAVAILABLE_MESSAGE)
+
+    def test_tool_blames_the_limiter_that_rejected_it(self):
+        engine = ChatEngine()
+        engine.preload_data(3, lazy=True)
+        for limiter, message in (("erp", ERP_UNAVAILABLE_MESSAGE), ("openai", MODEL_BUSY_MESSAGE)):
+            rejected = rate_limit.QueueFullError(f"{limiter} limiter queue is full", limiter)
+            with mock.patch.object(engine, "TOOL_MAP", {"search_policy": mock.Mock(side_effect=rejected)}):
+                self.assertEqual(engine.route_tool("search_policy"), message, limiter)
+
+    def test_staleness_notice(self):
+        self.assertEqual(ChatEngine.staleness_notice({}), "")
+        self.assertIn("leave history data is from", ChatEngine.staleness_notice({"leave_history": 0}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import openai
+
+from leavebot.api import erp_client
+from leavebot.chatbot.chat_engine import DEADLINE_MESSAGE, DEADLINE_TOOL_MESSAGE, ChatEngine
+from leavebot.config import settings
+from leavebot.core import llm_client, rate_limit
+from leavebot.core.deadline import DeadlineExceeded, deadline_scope, remaining, timeout_for
+
+
+def tool_call(name):
+    dump = {"id": "c1", "type": "function", "function": {"name": name, "arguments": "{}"}}
+    return SimpleNamespace(id="c1", function=SimpleNamespace(name=name, arguments="{}"), model_dump=lambda: dump)
+
+
+class LoopingCompletions:
+    """Always asks for recent_leaves; with tool_choice="none" it answers, or times out if `hang_on_answer`."""
+
+    def __init__(self, hang_on_answer=False):
+        self.calls = []
+        self.hang_on_answer = hang_on_answer
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs.get("tool_choice") == "none":
+            if self.hang_on_answer:
+                time.sleep(kwargs["timeout"])
+                raise openai.APITimeoutError(request=None)
+            message = SimpleNamespace(content="Your last leave was in May.", tool_calls=None)
+        else:
+            message = SimpleNamespace(content=None, tool_calls=[tool_call("recent_leaves")])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class TestDeadlineScope(unittest.TestCase):
+    def test_scopes_only_shorten_and_expire(self):
+        self.assertIsNone(remaining())
+        self.assertEqual(timeout_for(10), 10)
+        with deadline_scope(5):
+            with deadline_scope(60):
+                self.assertLessEqual(remaining(), 5)
+            self.assertLessEqual(timeout_for(10), 5)
+            with deadline_scope(0.01):
+                time.sleep(0.02)
+                with self.assertRaises(DeadlineExceeded):
+                    timeout_for(10)
+        self.assertIsNone(remaining())
+
+    def test_limiter_wait_past_the_deadline_reports_the_deadline(self):
+        limiter = rate_limit.ConcurrencyLimiter("test", max_concurrency=1)
+        limiter.acquire()
+        with deadline_scope(0.05):
+            with self.assertRaises(DeadlineExceeded):
+                limiter.acquire(remaining())
+        # Without a turn deadline a timed-out wait is still a full queue.
+        with self.assertRaises(rate_limit.QueueFullError):
+            limiter.acquire(0.01)
+
+    def test_erp_timeout_is_capped_at_time_left(self):
+        settings.load()
+        response = mock.Mock(status_code=200, json=mock.Mock(return_value=[]))
+        with mock.patch("requests.request", return_value=response) as request, deadline_scope(2):
+            erp_client.erp_request("GET", "http://erp.test/x", "test_deadline")
+        self.assertLessEqual(request.call_args.kwargs["timeout"], 2)
+
+
+class TestBoundedTurn(unittest.TestCase):
+    def setUp(self):
+        settings.load()
+        self.addCleanup(llm_client.set_client, None)
+        self.engine = ChatEngine()
+        self.engine.emp_id = 7
+        self.tool = mock.Mock(return_value=[{"LeaveGrid_Ela_FromDate_D": "2024-05-01"}])
+        self.engine.TOOL_MAP["recent_leaves"] = self.tool
+
+    def ask(self, completions):
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return self.engine.stream_completion([{"role": "user", "content": "When did I last take leave?"}])
+
+    def test_tool_rounds_are_capped(self):
+        completions = LoopingCompletions()
+        with mock.patch.object(settings, "MAX_TOOL_ROUNDS", 3):
+            answer = self.ask(completions)
+        self.assertEqual(answer, "Your last leave was in May.")
+        self.assertEqual(self.tool.call_count, 3)
+        self.assertEqual([c.get("tool_choice") for c in completions.calls], ["auto", None, None, "none"])
+        self.assertTrue(all(0 < c["timeout"] <= settings.TURN_DEADLINE_S for c in completions.calls))
+
+    def test_near_deadline_skips_tools_and_answers_best_effort(self):
+        self.tool.side_effect = lambda **kw: time.sleep(0.3) or "2024-05-01 Annual Leave"
+        completions = LoopingCompletions(hang_on_answer=True)
+        start = time.monotonic()
+        with mock.patch.object(settings, "TURN_DEADLINE_S", 0.6), \
+                mock.patch.object(settings, "DEADLINE_RESERVE_S", 0.4):
+            answer = self.ask(completions)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(self.tool.call_count, 1)
+        self.assertIn("what I found so far", answer)
+        self.assertIn("2024-05-01 Annual Leave", answer)
+        self.assertNotIn(DEADLINE_TOOL_MESSAGE, answer)
+
+    def test_saturated_openai_limiter_degrades_the_turn(self):
+        completions = LoopingCompletions()
+        with mock.patch.object(llm_client.rate_limit, "acquire",
+                               side_effect=rate_limit.QueueFullError("openai limiter queue is full", "openai")):
+            answer = self.ask(completions)
+        self.assertEqual(answer, DEADLINE_MESSAGE)
+        self.assertEqual(completions.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
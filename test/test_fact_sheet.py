@@ -0,0 +1,88 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from engine_fixtures import LEAVE_TYPES, patch_engine_fetchers
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.core import llm_client
+from leavebot.core.fact_sheet import FACT_SHEET_HEADER, build_fact_sheet
+from scripts.bench_fact_sheet import compare
+
+EMPLOYEE = [{"Emp_ID_N": 7, "Emp_EFullName_V": "Test User", "Emp_EmployeeReportsDesc_V": "Boss"}]
+HISTORY = [
+    {"LeaveGrid_Lvm_ID_N": 1, "LeaveGrid_Lvm_Code_V": "AL", "LeaveGrid_Status": "Approved",
+     "LeaveGrid_Ela_Tot": "3", "LeaveGrid_Ela_FromDate_D": "2024-02-01", "LeaveGrid_Ela_ToDate_D": "2024-02-03"},
+    {"LeaveGrid_Lvm_ID_N": 2, "LeaveGrid_Lvm_Code_V": "SL", "LeaveGrid_Status": "Pending",
+     "LeaveGrid_Ela_Tot": "1", "LeaveGrid_Ela_FromDate_D": "2024-05-01", "LeaveGrid_Ela_ToDate_D": "2024-05-01"},
+]
+
+
+class FakeCompletions:
+    """Answers directly unless the prompt lacks a fact sheet, in which case it asks for a tool first."""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        messages = kwargs["messages"]
+        has_sheet = any(FACT_SHEET_HEADER in str(m.get("content")) for m in messages)
+        has_tool_result = any(m.get("role") == "tool" for m in messages)
+        if has_sheet or has_tool_result:
+            message = SimpleNamespace(content="You have 20 days of AL.", tool_calls=None)
+        else:
+            call = SimpleNamespace(
+                id="call-1",
+                function=SimpleNamespace(name="leave_type_balance", arguments='{"leave_code": "AL"}'),
+                model_dump=lambda: {"id": "call-1", "type": "function",
+                                    "function": {"name": "leave_type_balance", "arguments": '{"leave_code": "AL"}'}},
+            )
+            message = SimpleNamespace(content=None, tool_calls=[call])
+        usage = SimpleNamespace(prompt_tokens=sum(len(str(m.get("content"))) for m in messages) // 4,
+                                completion_tokens=10)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class TestFactSheet(unittest.TestCase):
+    def test_budget_keeps_highest_priority_items(self):
+        sections = [("Balances", ["AL=20", "SL=5"]), ("History", [f"leave {i}" for i in range(200)])]
+        sheet = build_fact_sheet(sections, budget=80)
+        self.assertIn("Balances: AL=20; SL=5", sheet)
+        self.assertIn("leave 0", sheet)
+        self.assertNotIn("leave 199", sheet)
+        self.assertLessEqual(len(sheet) // 4, 80)
+        self.assertEqual(build_fact_sheet(sections, budget=5), "")
+
+
+class TestFactSheetMode(unittest.TestCase):
+    def setUp(self):
+        patch_engine_fetchers(
+            self, employee=EMPLOYEE, leave_types=LEAVE_TYPES, history=HISTORY,
+            balance=mock.Mock(side_effect=lambda e, lpd, f, t: {"Balance": 20 if lpd == 11 else 5}),
+        )
+        self.completions = FakeCompletions()
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=self.completions)))
+        self.addCleanup(llm_client.set_client, None)
+        self.engine = ChatEngine()
+        self.engine.preload_data(7, "2024-01-01", "2024-12-31")
+
+    def test_sheet_contains_session_facts(self):
+        sheet = self.engine.fact_sheet()
+        for fact in ("Test User", "AL=20", "SL=5", "Annual Leave=3", "SL 2024-05-01 (Pending)", "Boss"):
+            self.assertIn(fact, sheet)
+
+    def test_fact_sheet_mode_answers_in_one_call(self):
+        results = compare(self.engine, ["How much annual leave do I have left?"])
+        self.assertEqual(results["tools"]["mean_llm_calls"], 2)
+        self.assertEqual(results["fact_sheet"]["mean_llm_calls"], 1)
+        self.assertEqual(results["fact_sheet"]["errors"], 0)
+
+    def test_compare_uses_the_given_budget(self):
+        compare(self.engine, ["How much annual leave do I have left?"], budget=60)
+        sheet = next(m["content"] for m in self.completions.calls[-1]["messages"] if FACT_SHEET_HEADER in str(m.get("content")))
+        self.assertIn(self.engine.fact_sheet(60), sheet)
+        self.assertNotIn(self.engine.fact_sheet(), sheet)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from leavebot.config import settings
+from leavebot.core import search_embeddings as search
+from leavebot.core.lexical_index import BM25Index, is_confident, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    ("Annual leave (AL) is 30 working days per year.", [1.0, 0.0, 0.0]),
+    ("Sick leave (SL) requires a medical certificate.", [0.0, 1.0, 0.0]),
+    ("Article 79 of the labour law covers annual leave entitlement.", [0.9, 0.1, 0.0]),
+    ("Air tickets are granted every two years.", [0.0, 0.0, 1.0]),
+]
+
+
+class TestLexicalIndex(unittest.TestCase):
+    def test_tokenize_keeps_codes_and_article_numbers(self):
+        self.assertEqual(tokenize("What is AL under Article 79.2?"), ["al", "under", "article", "79.2"])
+
+    def test_bm25_ranks_exact_terms_first(self):
+        index = BM25Index([text for text, _ in CHUNKS])
+        results = index.search("article 79", top_k=3)
+        self.assertEqual(results[0][0], 2)
+        self.assertEqual(results[0][2], 1.0)
+        self.assertTrue(is_confident(results, 1.5))
+        self.assertFalse(is_confident(results, 0))
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([[0, 1, 2], [2, 0]])
+        self.assertEqual([doc for doc, _ in fused], [0, 2, 1])
+
+
+class TestHybridSearch(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "index.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"text": t, "source": "policy.md", "embedding": e} for t, e in CHUNKS], f)
+        settings.load()
+        for name, value in {"DOC_EMBEDDINGS_PATH": path, "POLICY_SEARCH_MODE": "hybrid",
+                            "LEXICAL_FASTPATH_MARGIN": 1.5}.items():
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.embed = mock.Mock(return_value=np.array([1.0, 0.0, 0.0], dtype=np.float32))
+        patcher = mock.patch.object(search, "get_query_embedding", self.embed)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_confident_keyword_query_skips_embedding(self):
+        results = search.search_embeddings("article 79", top_k=1)
+        self.assertEqual(results[0]["method"], "lexical")
+        self.assertIn("Article 79", results[0]["chunk"])
+        self.assertIsNone(results[0]["similarity"])
+        self.embed.assert_not_called()
+
+    def test_ambiguous_query_fuses_both_rankings(self):
+        results = search.search_embeddings("how much leave", top_k=2)
+        self.embed.assert_called_once()
+        self.assertEqual(results[0]["method"], "hybrid")
+        self.assertIn("Annual leave", results[0]["chunk"])
+        self.assertAlmostEqual(results[0]["similarity"], 1.0, places=5)
+
+    def test_embedding_failure_falls_back_to_lexical(self):
+        self.embed.side_effect = TimeoutError("slow")
+        results = search.search_embeddings("how much leave", top_k=2)
+        self.assertEqual({r["method"] for r in results}, {"lexical"})
+
+
+if __name__ == "__main__":
+    unittest.main()
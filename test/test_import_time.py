@@ -0,0 +1,25 @@
+import unittest
+
+from scripts.bench_import_time import heavy_imports, measure_import
+
+# Generous enough for slow CI machines; importing eagerly pulled in openai
+# and numpy and cost roughly 600 ms.
+IMPORT_BUDGET_MS = 250
+MODULE = "leavebot.chatbot.chat_engine"
+
+
+class TestImportTime(unittest.TestCase):
+    def test_chat_engine_import_is_lazy_and_within_budget(self):
+        timings = measure_import(MODULE)
+        self.assertEqual(heavy_imports(timings), [])
+        best = min(measure_import(MODULE)[MODULE][1] for _ in range(2))
+        best = min(best, timings[MODULE][1])
+        self.assertLess(best / 1000, IMPORT_BUDGET_MS)
+
+    def test_settings_do_not_read_env_at_import(self):
+        timings = measure_import("leavebot.config.settings")
+        self.assertNotIn("dotenv", timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
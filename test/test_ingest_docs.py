@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import openai
+
+from leavebot.core import ingest_docs, llm_client, search_embeddings
+
+DIM = 16
+
+
+def fake_vector(text):
+    """Deterministic bag-of-words vector, so similar texts get similar vectors."""
+    vec = [0.0] * DIM
+    for word in text.lower().split():
+        vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % DIM] += 1.0
+    return vec
+
+
+class FakeEmbeddings(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        inputs = body["input"]
+        self.requests.append(len(inputs))
+        payload = json.dumps({
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_vector(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestChunking(unittest.TestCase):
+    def test_chunks_overlap_and_cover_the_stream(self):
+        words = [f"w{i}" for i in range(400)]
+        blocks = [" ".join(words[i:i + 7]) + " " for i in range(0, 400, 7)]
+        chunks = list(ingest_docs.chunk_text(blocks, chunk_size=200, overlap=40))
+        self.assertTrue(all(len(c) <= 200 for c in chunks))
+        self.assertEqual(chunks[-1].split()[-1], "w399")
+        for prev, nxt in zip(chunks, chunks[1:]):
+            self.assertIn(nxt.split()[0], prev.split())
+        seen = {w for c in chunks for w in c.split()}
+        self.assertEqual(seen, set(words))
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        server = HTTPServer(("127.0.0.1", 0), FakeEmbeddings)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        FakeEmbeddings.requests = []
+        llm_client.set_client(
+            openai.OpenAI(api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+        )
+        self.addCleanup(llm_client.set_client, None)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.raw_dir = os.path.join(tmp.name, "raw")
+        os.makedirs(os.path.join(self.raw_dir, "hr"))
+        self.write("hr/annual.md", "Annual leave is thirty days per year for every employee. " * 30)
+        self.write("sick.txt", "Sick leave needs a medical certificate after two days. " * 30)
+        self.write("ignored.bin", "binary")
+        self.output = os.path.join(tmp.name, "policy_index.npz")
+
+    def write(self, name, text):
+        with open(os.path.join(self.raw_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def run_ingest(self):
+        return ingest_docs.ingest(self.raw_dir, self.output, "fake-embed", chunk_size=400, overlap=80,
+                                  batch_size=4, workers=2)
+
+    def test_incremental_ingest_and_search(self):
+        first = self.run_ingest()
+        self.assertEqual(first["documents"], 2)
+        # Repeated text yields identical chunks, which are embedded only once.
+        self.assertEqual(sum(FakeEmbeddings.requests), first["embedded"])
+        self.assertLess(first["embedded"], first["chunks"])
+        self.assertTrue(all(size <= 4 for size in FakeEmbeddings.requests))
+
+        FakeEmbeddings.requests = []
+        self.assertEqual(self.run_ingest()["embedded"], 0)
+        self.assertEqual(FakeEmbeddings.requests, [])
+
+        self.write("sick.txt", "Sick leave is fully paid for fifteen days. " * 30)
+        third = self.run_ingest()
+        self.assertGreater(third["embedded"], 0)
+        self.assertGreater(third["reused"], 0)
+
+        chunks, matrix = search_embeddings.load_index(self.output)
+        self.assertEqual(matrix.shape, (third["chunks"], DIM))
+        self.assertEqual({c["source"] for c in chunks}, {os.path.join("hr", "annual.md"), "sick.txt"})
+
+
+if __name__ == "__main__":
+    unittest.main()
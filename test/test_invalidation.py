@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from engine_fixtures import LEAVE_TYPES, patch_engine_fetchers
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.config import settings
+from leavebot.core import invalidation
+from leavebot.core.cache_utils import (
+    LAST_KNOWN_CACHE,
+    LEAVE_BALANCE_CACHE,
+    LEAVE_HISTORY_CACHE,
+    recall_last_known,
+    remember_last_known,
+)
+from leavebot.core.invalidation import EventLog, InvalidationListener
+from leavebot.core.metrics import CACHE_INVALIDATIONS
+from leavebot.core.snapshot_store import SnapshotStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestInvalidation(unittest.TestCase):
+    def setUp(self):
+        settings.load()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.log = EventLog(os.path.join(tmp.name, "events.sqlite3"))
+        self.listener = InvalidationListener(self.log, interval=0.01)
+        for cache in (LEAVE_HISTORY_CACHE, LEAVE_BALANCE_CACHE, LAST_KNOWN_CACHE):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        CACHE_INVALIDATIONS.clear()
+
+    def test_event_from_another_process_evicts_one_employee(self):
+        LEAVE_HISTORY_CACHE[7] = ["old"]
+        LEAVE_HISTORY_CACHE[8] = ["other"]
+        LEAVE_BALANCE_CACHE[(7, 11, "2024-01-01", "2024-12-31")] = {"Balance": 5}
+        remember_last_known("leave_history", 7, ["old"])
+        remember_last_known("employee", 7, ["profile"])
+        before = invalidation.version(7)
+
+        # Stand-in publisher: the CLI, run as a separate process.
+        subprocess.run(
+            [sys.executable, "-m", "leavebot.core.invalidation", "--db", self.log.path, "publish", "7"],
+            cwd=REPO_ROOT, check=True, capture_output=True,
+        )
+        self.assertEqual(self.listener.poll(), 1)
+
+        self.assertNotIn(7, LEAVE_HISTORY_CACHE)
+        self.assertEqual(LEAVE_HISTORY_CACHE[8], ["other"])
+        self.assertEqual(len(LEAVE_BALANCE_CACHE), 0)
+        self.assertIsNone(recall_last_known("leave_history", 7))
+        self.assertIsNotNone(recall_last_known("employee", 7))
+        self.assertEqual(invalidation.version(7), before + 1)
+        self.assertEqual(CACHE_INVALIDATIONS.value(kind="leave"), 1)
+        self.assertEqual(self.listener.poll(), 0)
+
+    def test_listener_thread_and_http_endpoint(self):
+        server = invalidation.make_invalidation_server(0, log=self.log)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/invalidate"
+
+        def post(payload):
+            request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST")
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+
+        LEAVE_HISTORY_CACHE[21] = ["old"]
+        applied = threading.Event()
+        with mock.patch.object(invalidation, "log_event", lambda *a, **k: applied.set()):
+            self.listener.start()
+            self.addCleanup(self.listener.stop)
+            status, body = post({"emp_ids": [21, 22]})
+            self.assertTrue(applied.wait(2))
+        self.assertEqual((status, len(body["published"])), (202, 2))
+        self.assertNotIn(21, LEAVE_HISTORY_CACHE)
+        last_id = self.log.last_id()
+        for bad in ({"emp_id": 21, "kind": "payroll"}, {"emp_ids": "5469"}, {"emp_ids": [21, "x"]},
+                    {"emp_ids": []}, {"emp_id": None}):
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                post(bad)
+            self.assertEqual(ctx.exception.code, 400, bad)
+        # A string of digits is not split into one event per character.
+        self.assertEqual(self.log.last_id(), last_id)
+
+    def test_engine_and_snapshot_reload_invalidated_data(self):
+        patch_engine_fetchers(self, employee=[{"Emp_ID_N": 31}],
+                              history=mock.Mock(side_effect=[["v1"], ["v2"], ["v3"]]))
+        store = SnapshotStore(os.path.join(self.tmp, "snapshots.sqlite3"))
+        engine = ChatEngine()
+        engine.preload_data(31, lazy=True)
+        self.assertEqual(engine.get_leave_history(), ["v1"])
+        engine.save_snapshot(store, "s1")
+
+        self.log.publish(31)
+        self.listener.poll()
+        self.assertEqual(engine.apply_invalidations(), ["leave"])
+        self.assertEqual(engine.get_leave_history(), ["v2"])
+        self.assertEqual(engine.apply_invalidations(), [])
+        self.assertEqual(engine.leave_types, LEAVE_TYPES)
+
+        resumed = ChatEngine()
+        resumed.resume_from_snapshot(store, 31, "s1", refresh=False)
+        self.assertEqual(resumed.get_leave_history(), ["v3"])
+
+    def test_listener_purges_events_past_the_backfill_window(self):
+        old, recent = self.log.publish(51), self.log.publish(52)
+        with self.log._connect() as conn:
+            conn.execute("UPDATE cache_events SET published_at = published_at - 7200 WHERE id = ?", (old,))
+        plan = self.log._connect().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM cache_events WHERE published_at > 0").fetchall()
+        self.assertIn("cache_events_published_at", str(plan))
+
+        listener = InvalidationListener(self.log, backfill=3600)
+        self.assertEqual(listener.purge(), 1)
+        self.assertEqual([event[0] for event in self.log.after(0)], [recent])
+
+    def test_ttls_come_from_settings(self):
+        with mock.patch.object(settings, "LEAVE_CACHE_TTL_S", 0):
+            LEAVE_HISTORY_CACHE[41] = ["expires at once"]
+        self.assertNotIn(41, LEAVE_HISTORY_CACHE)
+        with mock.patch.object(settings, "LEAVE_CACHE_TTL_S", 86400):
+            LEAVE_HISTORY_CACHE[41] = ["kept"]
+        self.assertIn(41, LEAVE_HISTORY_CACHE)
+
+
+if __name__ == "__main__":
+    unittest.main()
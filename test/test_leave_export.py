@@ -0,0 +1,96 @@
+import csv
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from leavebot.api import leave_export
+
+LEAVE_TYPES = [
+    {"Lvm_ID_N": 1, "Lpd_ID_N": 11, "Lvm_Code_V": "AL", "Lvm_Description_V": "Annual Leave"},
+    {"Lvm_ID_N": 2, "Lpd_ID_N": 12, "Lvm_Code_V": "SL", "Lvm_Description_V": "Sick Leave"},
+]
+
+
+class Interrupted(BaseException):
+    """Stands in for the process being killed mid-export."""
+
+
+def fake_employee_data(stop_at=None):
+    def fetch(emp_id, from_date=None, to_date=None, cgm_id=1):
+        if emp_id == stop_at:
+            raise Interrupted()
+        if emp_id == 3:
+            raise RuntimeError("ERP down")
+        history = [
+            {"LeaveGrid_Lvm_Code_V": "AL", "LeaveGrid_Status": "Approved", "LeaveGrid_Ela_Tot": "2"},
+            {"LeaveGrid_Lvm_Code_V": "SL", "LeaveGrid_Status": "Pending", "LeaveGrid_Ela_Tot": "1"},
+        ]
+        balances = {11: {"Balance": emp_id, "Airticket": "1", "AirTicketPercent": "50"}}
+        return {"Emp_EFullName_V": f"Employee {emp_id}"}, LEAVE_TYPES, balances, history
+
+    return fetch
+
+
+class TestLeaveExport(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def export(self, output, fmt, stop_at=None):
+        with mock.patch.object(leave_export, "fetch_employee_data", fake_employee_data(stop_at)):
+            return leave_export.export_leave_report(iter(range(1, 21)), output, fmt, workers=3, chunk_rows=6)
+
+    def test_csv_rows(self):
+        output = os.path.join(self.tmp, "report.csv")
+        stats = self.export(output, "csv")
+        with open(output, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual((stats["employees"], stats["rows"], stats["failed"]), (20, 38, [3]))
+        self.assertEqual(len(rows), 38)
+        self.assertEqual(rows[0], {
+            "emp_id": "1", "name": "Employee 1", "anniversary": "Unknown", "air_ticket": "Eligible",
+            "leave_code": "AL", "leave": "Annual Leave", "balance": "1.0", "days_taken": "2.0",
+            "pending_applications": "0", "pending_days": "0.0",
+        })
+        self.assertEqual(rows[1]["pending_days"], "1.0")
+        self.assertFalse(os.path.exists(output + ".checkpoint.json"))
+
+    def test_resume_after_interruption_matches_a_full_run(self):
+        for fmt, name in (("csv", "report.csv"), ("parquet", "report.parquet")):
+            full, resumed = os.path.join(self.tmp, "full-" + name), os.path.join(self.tmp, name)
+            self.export(full, fmt)
+            with self.assertRaises(Interrupted):
+                self.export(resumed, fmt, stop_at=15)
+            self.assertTrue(os.path.exists(resumed + ".checkpoint.json"))
+            stats = self.export(resumed, fmt)
+            self.assertGreater(stats["resumed_from"], 0)
+            self.assertEqual(stats["rows"], 38)
+            if fmt == "csv":
+                with open(full, encoding="utf-8") as a, open(resumed, encoding="utf-8") as b:
+                    self.assertEqual(a.read(), b.read())
+            else:
+                import pandas as pd
+
+                self.assertTrue(pd.read_parquet(full).equals(pd.read_parquet(resumed)))
+
+    def test_bounded_map_pulls_lazily_and_keeps_order(self):
+        pulled, lock = [], threading.Lock()
+
+        def items():
+            for i in range(50):
+                with lock:
+                    pulled.append(i)
+                yield i
+
+        seen = []
+        for item, result, error in leave_export.bounded_map(lambda x: x * 2, items(), workers=2):
+            seen.append(result)
+            self.assertLessEqual(len(pulled) - len(seen), 4)
+        self.assertEqual(seen, [i * 2 for i in range(50)])
+
+
+if __name__ == "__main__":
+    unittest.main()
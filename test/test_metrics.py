@@ -0,0 +1,70 @@
+import threading
+import unittest
+import urllib.request
+from unittest import mock
+
+from leavebot.api import fetch_employee
+from leavebot.core import circuit_breaker, metrics
+from leavebot.core.cache_utils import EMPLOYEE_CACHE
+from leavebot.core.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counter_and_histogram_render(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls.", ("tool",))
+        latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        calls.inc(tool="recent_leaves")
+        calls.inc(2, tool="recent_leaves")
+        latency.observe(0.05)
+        latency.observe(0.5)
+
+        self.assertEqual(calls.value(tool="recent_leaves"), 3)
+        self.assertEqual(latency.count(), 2)
+        text = registry.render()
+        self.assertIn('calls_total{tool="recent_leaves"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 2', text)
+
+    def test_wrong_labels_are_rejected(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls.", ("tool",))
+        with self.assertRaises(ValueError):
+            calls.inc(endpoint="x")
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        EMPLOYEE_CACHE.clear()
+        circuit_breaker.reset_breakers()
+        self.addCleanup(circuit_breaker.reset_breakers)
+
+    def test_employee_fetch_records_cache_and_erp_latency(self):
+        response = mock.Mock(status_code=200, json=mock.Mock(return_value=[{"Emp_ID_N": 1}]))
+        with mock.patch("requests.request", return_value=response) as request:
+            fetch_employee.fetch_employee_details(1)
+            fetch_employee.fetch_employee_details(1)
+        request.assert_called_once()
+        self.assertEqual(metrics.ERP_SECONDS.count(endpoint="employee_details"), 1)
+        self.assertEqual(metrics.ERP_ERRORS.value(endpoint="employee_details"), 0)
+        self.assertIn('endpoint="employee_details"', metrics.REGISTRY.render())
+        self.assertEqual(metrics.CACHE_REQUESTS.value(cache="employee", result="miss"), 1)
+        self.assertEqual(metrics.CACHE_REQUESTS.value(cache="employee", result="hit"), 1)
+        self.assertEqual(metrics.cache_hit_ratio("employee"), 0.5)
+
+    def test_scrape_endpoint(self):
+        metrics.TOOL_CALLS.inc(tool="manager_contact")
+        self.assertIsNone(metrics.start_metrics_server(port=0))
+        server = metrics.make_metrics_server(0, host="127.0.0.1")
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.handle_request, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+        thread.join(5)
+        self.assertIn('leavebot_tool_calls_total{tool="manager_contact"} 1', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from leavebot.chatbot import chat_engine
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.config import settings
+from leavebot.core import llm_client
+from leavebot.core.model_cascade import step_problem
+from scripts.bench_model_cascade import compare
+
+DATA_QUESTION = "What is my current leave balance?"
+POLICY_QUESTION = "What are the objectives of the HR manual?"
+
+
+def tool_call(name, arguments):
+    dump = {"id": "c1", "type": "function", "function": {"name": name, "arguments": arguments}}
+    return SimpleNamespace(id="c1", function=SimpleNamespace(name=name, arguments=arguments), model_dump=lambda: dump)
+
+
+class ScriptedCompletions:
+    """Data questions call leave_type_balance, policy questions search_policy; then answer."""
+
+    def __init__(self, small_tool_call=None):
+        self.models = []
+        self.small_tool_call = small_tool_call
+
+    def create(self, **kwargs):
+        model, messages = kwargs["model"], kwargs["messages"]
+        self.models.append(model)
+        question = next(m["content"] for m in messages if m.get("role") == "user")
+        if any(m.get("role") == "tool" for m in messages):
+            message = SimpleNamespace(content="You have 20 days of AL left.", tool_calls=None)
+        elif model == settings.OPENAI_SMALL_MODEL and self.small_tool_call:
+            message = SimpleNamespace(content=None, tool_calls=[self.small_tool_call])
+        elif question == POLICY_QUESTION:
+            message = SimpleNamespace(content=None, tool_calls=[tool_call("search_policy", '{"question": "objectives"}')])
+        else:
+            message = SimpleNamespace(content=None, tool_calls=[tool_call("leave_type_balance", '{"leave_code": "AL"}')])
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=50)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class TestStepChecks(unittest.TestCase):
+    def test_step_problem(self):
+        tools = chat_engine.tools
+        self.assertIsNone(step_problem(SimpleNamespace(tool_calls=[tool_call("leave_type_balance", '{"leave_code": "AL"}')]), tools))
+        self.assertEqual(step_problem(SimpleNamespace(tool_calls=[tool_call("payroll", "{}")]), tools), "unknown_tool")
+        self.assertEqual(step_problem(SimpleNamespace(tool_calls=[tool_call("leave_type_balance", "{")]), tools),
+                         "invalid_arguments")
+        self.assertEqual(step_problem(SimpleNamespace(tool_calls=[tool_call("leave_type_balance", "{}")]), tools),
+                         "missing_argument")
+        self.assertEqual(step_problem(SimpleNamespace(content=" ", tool_calls=None), tools), "empty_answer")
+        self.assertEqual(step_problem(SimpleNamespace(content="I'm not sure about that.", tool_calls=None), tools),
+                         "low_confidence")
+        self.assertIsNone(step_problem(SimpleNamespace(content="You have 20 days.", tool_calls=None), tools))
+
+
+class TestModelCascade(unittest.TestCase):
+    def setUp(self):
+        settings.load()
+        self.addCleanup(llm_client.set_client, None)
+        self.engine = ChatEngine()
+        self.engine.use_cascade = True
+        self.engine.emp_id = 7
+        for name, result in (("leave_type_balance", {"Balance": 20}), ("search_policy", "1. Objectives...")):
+            patcher = mock.patch.dict(self.engine.TOOL_MAP, {name: mock.Mock(return_value=result)})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def ask(self, question, completions):
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return self.engine.stream_completion([{"role": "user", "content": question}])
+
+    def test_data_question_stays_on_small_model(self):
+        completions = ScriptedCompletions()
+        self.ask(DATA_QUESTION, completions)
+        self.assertEqual(completions.models, [settings.OPENAI_SMALL_MODEL] * 2)
+
+    def test_policy_question_uses_large_model(self):
+        completions = ScriptedCompletions()
+        self.ask(POLICY_QUESTION, completions)
+        self.assertEqual(completions.models, [settings.OPENAI_MODEL] * 2)
+
+    def test_policy_tool_escalates_the_answer_step(self):
+        completions = ScriptedCompletions(small_tool_call=tool_call("search_policy", '{"question": "balance rules"}'))
+        self.ask(DATA_QUESTION, completions)
+        self.assertEqual(completions.models, [settings.OPENAI_SMALL_MODEL, settings.OPENAI_MODEL])
+
+    def test_invalid_small_model_step_is_redone_on_large_model(self):
+        completions = ScriptedCompletions(small_tool_call=tool_call("leave_type_balance", "{}"))
+        answer = self.ask(DATA_QUESTION, completions)
+        self.assertEqual(completions.models,
+                         [settings.OPENAI_SMALL_MODEL, settings.OPENAI_MODEL, settings.OPENAI_SMALL_MODEL])
+        self.assertIn("20 days", answer)
+
+    def test_benchmark_reports_cost_and_agreement(self):
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=ScriptedCompletions())))
+        report = compare(self.engine, [DATA_QUESTION, POLICY_QUESTION])
+        self.assertEqual(report["agreement"], 1.0)
+        self.assertLess(report["deltas"]["cost_pct"], -40)
+        self.assertEqual(report["cascade"]["escalated_turns"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
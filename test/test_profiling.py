@@ -0,0 +1,74 @@
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+
+from leavebot.core.profiling import Profiler
+
+
+def busy(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler(unittest.TestCase):
+    def test_nested_blocks_write_pstats_and_collapsed_stacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = io.StringIO()
+            profiler = Profiler(tmp, top_n=5, sample_interval=0.001, stream=out)
+            with profiler.profile("turn"):
+                busy(20)
+                with profiler.profile("tool-recent_leaves"):
+                    busy(20)
+
+            files = sorted(os.listdir(tmp))
+            self.assertEqual(files, [
+                "0001-tool-recent_leaves.collapsed", "0001-tool-recent_leaves.pstats",
+                "0002-turn.collapsed", "0002-turn.pstats",
+            ])
+            # The turn profile includes the tool's calls merged back in.
+            turn_stats = pstats.Stats(os.path.join(tmp, "0002-turn.pstats"))
+            self.assertEqual(turn_stats.stats[next(k for k in turn_stats.stats if k[2] == "busy")][0], 2)
+            with open(os.path.join(tmp, "0002-turn.collapsed"), encoding="utf-8") as f:
+                self.assertIn("busy", f.read())
+            self.assertIn("profile turn", out.getvalue())
+
+    def test_concurrent_threads_share_one_cprofile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = Profiler(tmp, top_n=0, sample_interval=0.001)
+            inside = threading.Barrier(2)
+            errors = []
+
+            def turn(n):
+                try:
+                    with profiler.profile(f"turn{n}"):
+                        inside.wait(2)
+                        busy(20)
+                        with profiler.profile(f"tool{n}"):
+                            busy(10)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=turn, args=(n,)) for n in (1, 2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            files = os.listdir(tmp)
+            self.assertEqual(errors, [])
+            self.assertEqual(sum(name.endswith(".collapsed") for name in files), 4)
+            # Only one thread's turn and tool were traced by cProfile.
+            self.assertEqual(sum(name.endswith(".pstats") for name in files), 2)
+
+            with profiler.profile("after"):
+                busy(5)
+            self.assertIn("0005-after.pstats", os.listdir(tmp))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from leavebot.core import ingest_docs, search_embeddings
+from leavebot.core.quantization import QuantizedMatrix, normalize_rows, quantize, truncate
+from scripts.bench_embedding_index import run, synthetic_vectors
+
+
+class TestQuantization(unittest.TestCase):
+    def setUp(self):
+        self.matrix = normalize_rows(np.random.default_rng(0).normal(size=(300, 64)))
+        self.query = self.matrix[7]
+
+    def test_quantized_scan_is_close_and_rerank_is_exact(self):
+        exact = self.matrix @ self.query
+        for method in ("float16", "int8"):
+            codes, scales = quantize(self.matrix, method)
+            quantized = QuantizedMatrix(codes, scales, self.matrix)
+            self.assertLess(quantized.nbytes, self.matrix.nbytes)
+            np.testing.assert_allclose(quantized @ self.query, exact, atol=0.02)
+            np.testing.assert_allclose(quantized.rerank([7, 3], self.query), exact[[7, 3]], rtol=1e-6)
+
+    def test_truncate_renormalizes(self):
+        short = truncate(self.matrix, 16)
+        self.assertEqual(short.shape, (300, 16))
+        np.testing.assert_allclose(np.linalg.norm(short, axis=1), 1.0, rtol=1e-5)
+
+    def test_int8_index_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.npz")
+            ingest_docs.write_index(path, ["a"] * 300, ["s"] * 300, [str(i) for i in range(300)],
+                                    self.matrix, "m", 64, "int8")
+            self.assertEqual(len(ingest_docs.load_existing(path)), 300)
+            _, matrix = search_embeddings.load_index(path)
+            self.assertIsInstance(matrix, QuantizedMatrix)
+            self.assertEqual(matrix.codes.dtype, np.int8)
+            self.assertEqual(search_embeddings._index_meta, {"model": "m", "dimensions": 64})
+            np.testing.assert_allclose(matrix.rerank([5], self.query), self.matrix[[5]] @ self.query, atol=1e-6)
+
+    def test_benchmark_reports_agreement(self):
+        vectors = synthetic_vectors(200, dim=128, clusters=10)
+        rows = run(vectors, vectors[:20], [None, 64], ["none", "int8"], top_k=5)
+        by_key = {(r["dimensions"], r["method"]): r for r in rows}
+        self.assertEqual(by_key[(128, "none")]["recall"], 1.0)
+        self.assertGreaterEqual(by_key[(128, "int8")]["recall"], 0.9)
+        self.assertLess(by_key[(64, "int8")]["bytes"] * 3, by_key[(64, "none")]["bytes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
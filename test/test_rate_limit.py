@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from leavebot.api import erp_client
+from leavebot.core import rate_limit
+from leavebot.core.rate_limit import (
+    AdaptiveRateLimiter,
+    ConcurrencyLimiter,
+    QueueFullError,
+    RateLimiter,
+    call_with_retries,
+)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket_allows_burst_then_waits(self):
+        limiter = RateLimiter(rate_per_minute=600, burst=2)  # 10 per second
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+
+    def test_acquire_times_out(self):
+        limiter = RateLimiter(rate_per_minute=1, burst=1)
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertFalse(limiter.acquire(timeout=0.01))
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_throttle_halves_rate_and_success_recovers(self):
+        limiter = AdaptiveRateLimiter("test", requests_per_minute=600, recovery_step=0.25)
+        limiter.on_throttle(retry_after=0.01)
+        self.assertEqual(limiter.requests.rate_per_minute, 300)
+        limiter.on_success()
+        limiter.on_success()
+        self.assertEqual(limiter.requests.rate_per_minute, 600)
+
+    def test_full_queue_rejects_immediately(self):
+        limiter = AdaptiveRateLimiter("test", requests_per_minute=60, max_queue=0)
+        start = time.monotonic()
+        with self.assertRaises(QueueFullError) as raised:
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(raised.exception.limiter, "test")
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_slow_responses_shrink_and_fast_ones_grow_the_cap(self):
+        limiter = ConcurrencyLimiter("test", max_concurrency=4, target_latency=1.0)
+        limiter.acquire()
+        limiter.release(latency=5.0)
+        self.assertEqual(limiter.limit, 3.0)
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(latency=0.1)
+        self.assertEqual(limiter.limit, 4.0)
+
+    def test_rejects_when_saturated_and_queue_full(self):
+        limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1)
+        limiter.acquire()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), limiter.release()))
+        waiter.start()
+        while limiter.waiting == 0:
+            time.sleep(0.001)
+        with self.assertRaises(QueueFullError):
+            limiter.acquire()
+        limiter.release()
+        waiter.join(1)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class TestRetries(unittest.TestCase):
+    def test_retry_waits_at_least_retry_after(self):
+        calls = []
+
+        def flaky():
+            calls.append(time.monotonic())
+            if len(calls) < 2:
+                raise RuntimeError("throttled")
+            return "ok"
+
+        result = call_with_retries(flaky, lambda e: (True, 0.05), attempts=3, base_delay=0.001)
+        self.assertEqual(result, "ok")
+        self.assertGreaterEqual(calls[1] - calls[0], 0.05)
+
+    def test_erp_request_retries_503_with_retry_after(self):
+        busy = requests.Response()
+        busy.status_code = 503
+        busy.headers["Retry-After"] = "0.01"
+        ok = requests.Response()
+        ok.status_code = 200
+        ok._content = b'[{"Emp_ID_N": 1}]'
+        rate_limit.configure_concurrency_limit("erp", 4)
+        self.addCleanup(rate_limit.configure_concurrency_limit, "erp", 4)
+        with mock.patch("requests.request", side_effect=[busy, ok]) as request:
+            self.assertEqual(erp_client.erp_request("POST", "http://erp/x", "employee_details"), [{"Emp_ID_N": 1}])
+        self.assertEqual(request.call_count, 2)
+        # Halved by the 503, then one additive step back up.
+        self.assertEqual(rate_limit.get_concurrency_limiter("erp").limit, 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import pickle
+import unittest
+from datetime import date
+
+from leavebot.core.leave_utils import leaves_by_type, recent_leaves, total_leave_taken
+from leavebot.core.schema import LeaveBalance, LeaveRecord, project
+from scripts.bench_record_memory import compare
+
+LEAVE_TYPES = [{"Lvm_ID_N": 1, "Lpd_ID_N": 11, "Lvm_Code_V": "AL", "Lvm_Description_V": "Annual Leave"}]
+RAW_HISTORY = [
+    {
+        "LeaveGrid_Lvm_ID_N": 1,
+        "LeaveGrid_Lvm_Code_V": "AL",
+        "LeaveGrid_Status": "Approved",
+        "LeaveGrid_Ela_Tot": "2.5",
+        "LeaveGrid_Ela_FromDate_D": "2024-03-04T00:00:00",
+        "LeaveGrid_Ela_ToDate_D": "2024-03-06T00:00:00",
+        "LeaveGrid_Unused_V": "x" * 100,
+    },
+    {
+        "LeaveGrid_Lvm_ID_N": 1,
+        "LeaveGrid_Lvm_Code_V": "AL",
+        "LeaveGrid_Status": "Approved",
+        "LeaveGrid_Ela_Tot": "1",
+        "LeaveGrid_Ela_FromDate_D": "05-Jan-2024",
+        "LeaveGrid_Ela_ToDate_D": "",
+    },
+]
+
+
+class TestRecords(unittest.TestCase):
+    def test_projection_parses_once_and_keeps_dict_access(self):
+        rec = project(LeaveRecord, RAW_HISTORY)[0]
+        self.assertEqual(rec.days, 2.5)
+        self.assertEqual(rec.from_date, date(2024, 3, 4))
+        self.assertEqual(rec.get("LeaveGrid_Ela_FromDate_D"), "2024-03-04")
+        self.assertEqual(rec["LeaveGrid_Status"], "Approved")
+        self.assertNotIn("LeaveGrid_Unused_V", rec)
+        self.assertEqual(rec.get("LeaveGrid_Unused_V", "-"), "-")
+        with self.assertRaises(AttributeError):
+            rec.__dict__
+        rec["LeaveGrid_Lvm_Code_V"] = "SL"
+        self.assertEqual(rec.code, "SL")
+
+    def test_records_pickle_and_compare(self):
+        bal = project(LeaveBalance, {"Balance": "4", "Airticket": "1", "Other": 1})
+        self.assertEqual(pickle.loads(pickle.dumps(bal, protocol=5)), bal)
+        self.assertEqual(bal, {"Balance": 4.0, "Airticket": "1"})
+
+    def test_leave_utils_agree_on_raw_and_projected(self):
+        projected = project(LeaveRecord, RAW_HISTORY)
+        for history in (RAW_HISTORY, projected):
+            self.assertEqual(total_leave_taken(history, LEAVE_TYPES, "AL"), 3.5)
+            self.assertEqual(leaves_by_type(history, LEAVE_TYPES), {"Annual Leave": 3.5})
+            self.assertEqual([r["from"] for r in recent_leaves(history)][0], "2024-03-04")
+
+    def test_projection_reduces_memory(self):
+        result = compare(employees=20, records_per_employee=20)
+        self.assertGreater(result["ratio"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
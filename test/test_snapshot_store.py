@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from engine_fixtures import EMPLOYEE, LEAVE_TYPES, patch_engine_fetchers
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.core.snapshot_store import SnapshotStore
+
+ANNUAL_LEAVE = LEAVE_TYPES[:1]
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = SnapshotStore(os.path.join(tmp.name, "snapshots.sqlite3"))
+
+    def test_round_trip_and_expiry(self):
+        state = {"employee": EMPLOYEE, "fetched_lpd_ids": {11}}
+        self.assertGreater(self.store.save(7, "s1", state), 0)
+        saved_at, loaded = self.store.load(7, "s1")
+        self.assertEqual(loaded, state)
+        self.assertIsNone(self.store.load(7, "other"))
+        with mock.patch("leavebot.core.snapshot_store.time.time", return_value=saved_at + 60):
+            self.assertIsNone(self.store.load(7, "s1", max_age=30))
+        self.assertEqual(self.store.delete(7), 1)
+        self.assertIsNone(self.store.load(7, "s1"))
+
+    def test_saving_a_session_purges_expired_ones(self):
+        with mock.patch("leavebot.core.snapshot_store.time.time", return_value=1_000_000.0):
+            self.store.save(7, "abandoned", {"employee": EMPLOYEE})
+        self.store.save(7, "recent", {"employee": EMPLOYEE})
+
+        # A new process (the app's cached store) purges on its first save.
+        engine = ChatEngine()
+        engine.emp_id = 7
+        engine.save_snapshot(SnapshotStore(self.store.path), "current", [])
+        self.assertIsNone(self.store.load(7, "abandoned"))
+        self.assertIsNotNone(self.store.load(7, "recent"))
+        self.assertIsNotNone(self.store.load(7, "current"))
+
+    def test_engine_resumes_without_fetching(self):
+        fakes = patch_engine_fetchers(self, leave_types=ANNUAL_LEAVE)
+        balance = fakes.pop("fetch_leave_balance")
+
+        engine = ChatEngine()
+        engine.preload_data(7, "2024-01-01", "2024-12-31")
+        conversation = [{"role": "user", "content": "hi"}]
+        engine.save_snapshot(self.store, "s1", conversation)
+        for fake in [*fakes.values(), balance]:
+            fake.reset_mock()
+
+        resumed = ChatEngine()
+        self.assertEqual(resumed.resume_from_snapshot(self.store, 7, "s1", refresh=False), conversation)
+        self.assertEqual(resumed.get_leave_balances(), {11: {"Balance": 5, "Lvm_Code_V": "AL"}})
+        self.assertEqual(resumed.get_manager()["name"], "Test User")
+        for fake in [*fakes.values(), balance]:
+            fake.assert_not_called()
+
+        # The freshness check swaps in changed data only.
+        balance.return_value = {"Balance": 4}
+        self.assertEqual(resumed.refresh_loaded(), ["leave_balances"])
+        self.assertEqual(resumed.get_leave_balances(), {11: {"Balance": 4, "Lvm_Code_V": "AL"}})
+        self.assertIsNone(ChatEngine().resume_from_snapshot(self.store, 7, "missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.config import settings
+from leavebot.core import llm_client
+from leavebot.core.metrics import SPECULATIVE_RUNS, SPECULATIVE_WASTED_SECONDS
+
+LEAVE_TYPES = [{"Lvm_ID_N": 1, "Lpd_ID_N": 11, "Lvm_Code_V": "AL", "Lvm_Description_V": "Annual Leave"}]
+QUESTION = "How much annual leave balance do I have left?"
+
+
+class OneToolCompletions:
+    """First call: wait briefly for `started`, then ask for `tool`. Second call: answer."""
+
+    def __init__(self, tool, args, started):
+        self.tool, self.args, self.started = tool, args, started
+        self.saw_tool_running = None
+
+    def create(self, **kwargs):
+        if any(m.get("role") == "tool" for m in kwargs["messages"]):
+            message = SimpleNamespace(content="You have 20 days.", tool_calls=None)
+        else:
+            self.saw_tool_running = self.started.wait(2)
+            dump = {"id": "c1", "type": "function", "function": {"name": self.tool, "arguments": self.args}}
+            call = SimpleNamespace(id="c1", function=SimpleNamespace(name=self.tool, arguments=self.args),
+                                   model_dump=lambda: dump)
+            message = SimpleNamespace(content=None, tool_calls=[call])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestSpeculation(unittest.TestCase):
+    def setUp(self):
+        settings.load()
+        SPECULATIVE_RUNS.clear()
+        SPECULATIVE_WASTED_SECONDS.clear()
+        self.addCleanup(SPECULATIVE_RUNS.clear)
+        self.addCleanup(SPECULATIVE_WASTED_SECONDS.clear)
+        self.addCleanup(llm_client.set_client, None)
+        self.engine = ChatEngine()
+        self.engine.use_speculation = True
+        self.engine.emp_id = 7
+        self.engine.leave_types = LEAVE_TYPES
+        self.started = threading.Event()
+
+        def balance(leave_code=None, **kwargs):
+            self.started.set()
+            return {"leave_code": leave_code, "Balance": 20}
+
+        self.balance = mock.Mock(side_effect=balance)
+        self.engine.TOOL_MAP["leave_type_balance"] = self.balance
+        self.engine.TOOL_MAP["search_policy"] = mock.Mock(return_value="policy")
+        self.engine.TOOL_MAP["total_leave_taken"] = mock.Mock(return_value=3)
+
+    def ask(self, tool, args):
+        completions = OneToolCompletions(tool, args, self.started)
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        answer = self.engine.stream_completion([{"role": "user", "content": QUESTION}])
+        return completions, answer
+
+    def test_predicted_tool_runs_during_first_completion_and_is_reused(self):
+        completions, answer = self.ask("leave_type_balance", '{"leave_code": "AL"}')
+        self.assertEqual(answer, "You have 20 days.")
+        self.assertTrue(completions.saw_tool_running)
+        self.balance.assert_called_once_with(leave_code="AL")
+        self.assertEqual(SPECULATIVE_RUNS.value(tool="leave_type_balance", outcome="hit"), 1)
+
+    def test_unused_run_is_counted_as_waste(self):
+        self.ask("total_leave_taken", "{}")
+        self.assertTrue(wait_for(lambda: SPECULATIVE_RUNS.value(tool="leave_type_balance", outcome="wasted") == 1))
+        self.assertGreater(SPECULATIVE_WASTED_SECONDS.value(tool="leave_type_balance"), 0)
+
+    def test_different_arguments_run_the_tool_again(self):
+        self.ask("leave_type_balance", '{"leave_code": "Annual Leave"}')
+        self.assertEqual(self.balance.call_count, 2)
+        self.assertTrue(wait_for(lambda: SPECULATIVE_RUNS.value(tool="leave_type_balance", outcome="wasted") == 1))
+
+    def test_tools_with_low_hit_rate_stop_being_speculated(self):
+        with mock.patch.object(settings, "SPECULATION_MIN_SAMPLES", 2), \
+                mock.patch.object(settings, "SPECULATION_MIN_HIT_RATE", 0.5):
+            for _ in range(2):
+                self.ask("total_leave_taken", "{}")
+                self.started.clear()
+            self.assertTrue(wait_for(lambda: SPECULATIVE_RUNS.value(tool="leave_type_balance", outcome="wasted") == 2))
+            self.balance.reset_mock()
+            self.started.set()  # nothing to wait for: the tool must not start early
+            self.ask("leave_type_balance", '{"leave_code": "AL"}')
+            self.balance.assert_called_once_with(leave_code="AL")
+            self.assertEqual(SPECULATIVE_RUNS.value(tool="leave_type_balance", outcome="hit"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import unittest
+from datetime import date
+from unittest import mock
+
+from leavebot.api import fetch_team
+from leavebot.chatbot import chat_engine
+from leavebot.chatbot.chat_engine import ChatEngine
+from leavebot.core.cache_utils import EMPLOYEE_CACHE, LEAVE_HISTORY_CACHE, TEAM_CACHE, TEAM_HISTORY_CACHE
+
+LEAVE_TYPES = [{"Lvm_ID_N": 1, "Lpd_ID_N": 11, "Lvm_Code_V": "AL", "Lvm_Description_V": "Annual Leave"}]
+MANAGER_ID = 9
+TODAY = date.today().isoformat()
+
+
+def fake_erp(reports):
+    """Stand-in for erp_request serving direct reports and bulk leave histories."""
+    calls = []
+    lock = threading.Lock()
+
+    def erp_request(method, url, endpoint, timeout=None):
+        with lock:
+            calls.append(endpoint)
+        if endpoint == "direct_reports":
+            return [{"Emp_ID_N": e, "Emp_EFullName_V": f"Member {e}", "LeaveGrid_Noise_V": "x"} for e in reports]
+        ids = url.split("IN (")[1].split(")")[0].split(",")
+        return [
+            {"Emp_ID_N": int(e), "LeaveGrid_Lvm_ID_N": 1, "LeaveGrid_Status": status, "LeaveGrid_Ela_Tot": "2",
+             "LeaveGrid_Lvm_Description_V": "Annual Leave",
+             "LeaveGrid_Ela_FromDate_D": TODAY if status == "Approved" else "2030-01-01",
+             "LeaveGrid_Ela_ToDate_D": TODAY if status == "Approved" else "2030-01-02"}
+            for e in ids
+            for status in ("Approved", "Pending")
+        ]
+
+    return erp_request, calls
+
+
+class TestTeamMode(unittest.TestCase):
+    def setUp(self):
+        for cache in (TEAM_CACHE, EMPLOYEE_CACHE, LEAVE_HISTORY_CACHE, TEAM_HISTORY_CACHE):
+            cache.clear()
+        self.addCleanup(LEAVE_HISTORY_CACHE.clear)
+        self.addCleanup(TEAM_HISTORY_CACHE.clear)
+        self.addCleanup(EMPLOYEE_CACHE.clear)
+        self.addCleanup(TEAM_CACHE.clear)
+        self.erp, self.calls = fake_erp(range(100, 220))
+        patches = [
+            mock.patch.object(fetch_team, "erp_request", self.erp),
+            mock.patch.object(fetch_team, "fetch_leave_types", mock.Mock(return_value=LEAVE_TYPES)),
+            mock.patch.object(fetch_team, "fetch_leave_balance",
+                              mock.Mock(side_effect=lambda e, lpd, f, t: {"Balance": e % 3} if e != 100 else None)),
+            mock.patch.object(chat_engine, "fetch_leave_types", mock.Mock(return_value=LEAVE_TYPES)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.engine = ChatEngine()
+        self.engine.preload_data(MANAGER_ID, lazy=True)
+
+    def test_histories_are_fetched_in_bulk_batches(self):
+        self.engine.route_tool("team_leave_summary")
+        # 120 reports -> one direct-reports call plus ceil(120 / TEAM_BULK_SIZE) history calls.
+        self.assertEqual(self.calls.count("direct_reports"), 1)
+        self.assertEqual(self.calls.count("leave_history"), 3)
+        self.assertIn(150, EMPLOYEE_CACHE)
+        # Mapped with the manager's leave types, so kept out of the reports' own cache.
+        self.assertEqual(len(TEAM_HISTORY_CACHE[150]), 2)
+        self.assertNotIn(150, LEAVE_HISTORY_CACHE)
+
+        self.engine.route_tool("team_pending_leaves")
+        self.assertEqual(len(self.calls), 4)
+
+    def test_team_aggregates(self):
+        summary = self.engine.route_tool("team_leave_summary")
+        self.assertEqual(summary["team_total"], {"Annual Leave": 240.0})
+        self.assertEqual(summary["by_member"]["Member 100"], {"Annual Leave": 2.0})
+
+        pending = self.engine.route_tool("team_pending_leaves", {"status": "pending"})
+        self.assertEqual(len(pending), 120)
+        self.assertEqual(pending[0]["from"], "2030-01-01")
+        self.assertEqual(len(self.engine.route_tool("team_on_leave_today")), 120)
+
+        totals = self.engine.route_tool("team_balance_totals", {"leave_code": "AL"})
+        self.assertEqual(totals["total"], float(sum(e % 3 for e in range(101, 220))))
+        self.assertEqual(totals["missing"], ["Member 100"])
+
+    def test_non_manager_gets_a_clear_answer(self):
+        erp, _ = fake_erp([])
+        with mock.patch.object(fetch_team, "erp_request", erp):
+            engine = ChatEngine()
+            engine.preload_data(MANAGER_ID + 1, lazy=True)
+            self.assertEqual(engine.route_tool("team_pending_leaves"), chat_engine.NO_TEAM_MESSAGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
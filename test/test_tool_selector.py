@@ -0,0 +1,78 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from leavebot.chatbot import chat_engine
+from leavebot.chatbot.chat_engine import TOOL_SELECTOR, ChatEngine
+from leavebot.core import llm_client
+from scripts.bench_tool_selection import EXPECTED_TOOLS, live_report, offline_report
+from scripts.test_chatbot_batch import load_questions
+
+
+class ToolCallingCompletions:
+    """Calls the labelled tool for a question when offered, then answers."""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        messages = kwargs["messages"]
+        offered = [t["function"]["name"] for t in kwargs["tools"]]
+        self.calls.append(offered)
+        question = next(m["content"] for m in messages if m.get("role") == "user")
+        wanted = EXPECTED_TOOLS.get(question)
+        if wanted in offered and not any(m.get("role") == "tool" for m in messages):
+            dump = {"id": "c1", "type": "function", "function": {"name": wanted, "arguments": "{}"}}
+            call = SimpleNamespace(id="c1", function=SimpleNamespace(name=wanted, arguments="{}"),
+                                   model_dump=lambda: dump)
+            message = SimpleNamespace(content=None, tool_calls=[call])
+        else:
+            message = SimpleNamespace(content="done", tool_calls=None)
+        prompt = llm_client.estimate_tokens(messages, kwargs["tools"])
+        usage = SimpleNamespace(prompt_tokens=prompt, completion_tokens=5)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class TestToolSelector(unittest.TestCase):
+    def test_questions_file_tokens_saved_and_recall(self):
+        questions = list(dict.fromkeys(load_questions()))
+        report = offline_report(questions)
+        self.assertGreater(report["tokens_saved_pct"], 50)
+        self.assertEqual(report["misses"], [])
+        self.assertEqual(report["labelled"], len(EXPECTED_TOOLS))
+
+    def test_unmatched_question_gets_full_set(self):
+        self.assertIs(TOOL_SELECTOR.select("xyzzy"), TOOL_SELECTOR.tools)
+        selected = TOOL_SELECTOR.select("Who is my reporting manager?")
+        self.assertIs(selected, TOOL_SELECTOR.select("who is my line manager"))
+        self.assertIn("search_policy", [t["function"]["name"] for t in selected])
+
+
+class TestToolSelectionMode(unittest.TestCase):
+    def setUp(self):
+        self.completions = ToolCallingCompletions()
+        llm_client.set_client(SimpleNamespace(chat=SimpleNamespace(completions=self.completions)))
+        self.addCleanup(llm_client.set_client, None)
+        self.engine = ChatEngine()
+        self.engine.emp_id = 7
+        for name in EXPECTED_TOOLS.values():
+            patcher = mock.patch.dict(self.engine.TOOL_MAP, {name: mock.Mock(return_value="ok")})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_follow_up_reuses_subset(self):
+        self.engine.use_tool_selection = True
+        self.engine.stream_completion([{"role": "user", "content": "Who is my reporting manager?"}])
+        self.assertEqual(len(self.completions.calls), 2)
+        self.assertEqual(self.completions.calls[0], self.completions.calls[1])
+        self.assertIn("manager_contact", self.completions.calls[0])
+        self.assertLess(len(self.completions.calls[0]), len(chat_engine.tools))
+
+    def test_same_tools_called_with_fewer_prompt_tokens(self):
+        report = live_report(self.engine, list(EXPECTED_TOOLS))
+        self.assertEqual(report["tool_agreement"], 1.0)
+        self.assertLess(report["selected"]["mean_prompt_tokens"], report["full"]["mean_prompt_tokens"] * 0.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+
+from leavebot.core import tracing
+from leavebot.core.tracing import FileSpanExporter, span, summarize_trace
+
+
+class TestTracing(unittest.TestCase):
+    def tearDown(self):
+        tracing.set_exporter(None)
+
+    def test_nested_spans_export_as_one_otlp_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            tracing.set_exporter(FileSpanExporter(path))
+            with span("chat.turn") as root:
+                with span("llm.chat_completion") as child:
+                    child.set_attribute("llm.usage.prompt_tokens", 120)
+                    child.set_attribute("llm.usage.completion_tokens", 30)
+                with span("erp.fetch_leave_types") as fetch:
+                    fetch.set_attribute("cache.hit", True)
+
+            with open(path, encoding="utf-8") as f:
+                payload = json.loads(f.readline())
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual({s["name"] for s in spans}, {"chat.turn", "llm.chat_completion", "erp.fetch_leave_types"})
+        self.assertEqual({s["traceId"] for s in spans}, {root.trace_id})
+        children = [s for s in spans if s["name"] != "chat.turn"]
+        self.assertTrue(all(s["parentSpanId"] == root.span_id for s in children))
+
+        summary = summarize_trace(root)
+        self.assertEqual(summary["prompt_tokens"], 120)
+        self.assertEqual(summary["completion_tokens"], 30)
+        self.assertEqual(summary["breakdown"]["erp.fetch_leave_types"]["count"], 1)
+
+    def test_error_is_recorded_on_span(self):
+        with self.assertRaises(ValueError):
+            with span("chat.turn") as root:
+                raise ValueError("boom")
+        self.assertEqual(root.to_otlp()["status"]["code"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()